@@ -1,9 +1,9 @@
 # ai.py
 from typing import Dict, Any
 
-from mistralai import Mistral
-
-from utils import content_to_text, parse_json_maybe
+from llm import chat, json_messages
+from llm_schemas import ACTIONS_SCHEMA
+from utils import parse_json_maybe
 
 
 def build_action_prompt(
@@ -58,19 +58,16 @@ def generate_actions(
     top_p: float = 0.95,
     max_tokens: int = 900
 ) -> Dict[str, Any]:
-    client = Mistral(api_key=api_key)
-    response = client.chat.complete(
+    raw = chat(
+        api_key=api_key,
         model=model,
-        messages=[
-            {"role": "system", "content": "Antworte ausschließlich mit gültigem JSON. Kein Markdown."},
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=max_tokens,
+        messages=json_messages(prompt),
         temperature=temperature,
         top_p=top_p,
+        max_tokens=max_tokens,
+        call_site="actions",
+        schema=ACTIONS_SCHEMA,
     )
-
-    raw = content_to_text(response.choices[0].message.content)
     obj = parse_json_maybe(raw)
 
     # Minimalvalidierung
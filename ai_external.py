@@ -1,105 +1,19 @@
 # ai_external.py
 from __future__ import annotations
-from typing import Dict, Any, List, Tuple, Optional
-from mistralai import Mistral
+from typing import Dict, Any, List, Tuple, Optional, Callable
 
-from utils import content_to_text, parse_json_maybe
+from llm import chat, chat_stream, count_partial, json_messages, parse_or_repair
+from llm_prompt import PromptParts
+from llm_resilience import is_transient
+from llm_routing import route
+from llm_schemas import EXTERNAL_MOVES_SCHEMA, domestic_events_schema
 
+# top-level keys -> value type, checked while streaming (see utils.JSONStreamProbe)
+EXTERNAL_MOVES_STREAM_KEYS = {"global_context": '"', "moves": "["}
+DOMESTIC_EVENTS_STREAM_KEYS = {"events": "{"}
 
-def _chat(client: Mistral, model: str, messages, temperature: float, top_p: float, max_tokens: int) -> str:
-    resp = client.chat.complete(
-        model=model,
-        messages=messages,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        top_p=top_p,
-    )
-    return content_to_text(resp.choices[0].message.content)
 
-
-def _repair_to_valid_json(client: Mistral, model: str, bad_text: str, schema_hint: str) -> Dict[str, Any]:
-    repair_prompt = f"""
-Du bist ein Validator/Formatter. Wandle die folgende Ausgabe in **gültiges JSON** um.
-
-Wichtig:
-- Gib **NUR** JSON zurück (keine Erklärungen, kein Markdown).
-- Nutze **nur** doppelte Anführungszeichen.
-- Keine trailing commas.
-- Schema MUSS exakt passen.
-
-Schema:
-{schema_hint}
-
-Hier ist die zu reparierende Ausgabe:
-{bad_text}
-""".strip()
-
-    fixed_raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Du gibst ausschließlich gültiges JSON zurück. Kein Markdown."},
-            {"role": "user", "content": repair_prompt},
-        ],
-        temperature=0.2,
-        top_p=1.0,
-        max_tokens=1200,
-    )
-    return parse_json_maybe(fixed_raw)
-
-
-def generate_external_moves(
-    *,
-    api_key: str,
-    model: str,
-    round_no: int,
-    eu_state: Dict[str, Any],
-    recent_round_summaries: List[Tuple[int, str]] | None = None,
-    # NEW:
-    craziness_by_actor: Optional[Dict[str, int]] = None,
-    temperature: float = 0.8,
-    top_p: float = 0.95,
-    max_tokens: int = 1200,
-) -> Dict[str, Any]:
-    """
-    Output schema:
-    {
-      "global_context": "1 Zeile",
-      "moves": [
-        {
-          "actor":"Russia",
-          "craziness": 0,
-          "headline":"...",
-          "quote":"...",
-          "modifiers":{
-             "eu_cohesion_delta": 0,
-             "threat_delta": 0,
-             "frontline_delta": 0,
-             "energy_delta": 0,
-             "migration_delta": 0,
-             "disinfo_delta": 0,
-             "trade_war_delta": 0
-          }
-        },
-        {"actor":"USA",...},
-        {"actor":"China",...}
-      ]
-    }
-    """
-    client = Mistral(api_key=api_key)
-
-    memory_str = "Keine."
-    if recent_round_summaries:
-        rev = list(reversed(recent_round_summaries))
-        memory_str = "\n".join([f"- Runde {r}: {s}" for r, s in rev])
-
-    # Default craziness if not provided
-    cb = craziness_by_actor or {}
-    usa_c = int(cb.get("USA", 50))
-    rus_c = int(cb.get("Russia", 50))
-    chi_c = int(cb.get("China", 50))
-
-    schema_hint = """
+EXTERNAL_MOVES_SCHEMA_HINT = """
 {
   "global_context": "1 Zeile",
   "moves": [
@@ -152,16 +66,12 @@ def generate_external_moves(
 }
 """.strip()
 
-    prompt = f"""
+# static part of the external-moves prompt (system message, identical every round)
+EXTERNAL_MOVES_PREFIX = f"""
 Du bist die Weltlage-Engine eines EU-Geopolitik-Spiels.
-Erzeuge für Runde {round_no} GENAU 3 Außenmacht-Züge: USA, China, Russland.
-
-NEU: Crazy-Faktor je Außenmacht
-- USA: {usa_c}/100
-- Russia: {rus_c}/100
-- China: {chi_c}/100
+Erzeuge für die angegebene Runde GENAU 3 Außenmacht-Züge: USA, China, Russland.
 
-Interpretation des Crazy-Faktors (0..100):
+Interpretation des Crazy-Faktors je Außenmacht (0..100, Werte stehen in der Nachricht):
 - 0–30: rational/realpolitisch
 - 31–70: provokativ/unberechenbar
 - 71–100: sehr "wild" / überzogen (aber bitte trotzdem innerhalb geopolitischer Plausibilität: keine Fantasy)
@@ -171,19 +81,6 @@ Ziel:
 - Mehr Innenpolitik/Populismus triggern (migration/disinfo/energy wirken indirekt auf Zustimmung/Stabilität).
 - Mehr Diplomatie/Deals ermöglichen (USA/China-Angebote oder Druck).
 
-Aktueller EU-Status:
-- EU-Kohäsion: {eu_state["cohesion"]}%
-- Threat Level: {eu_state["threat_level"]} / 100
-- Frontline Pressure: {eu_state["frontline_pressure"]} / 100
-- Energy Pressure: {eu_state["energy_pressure"]} / 100
-- Migration Pressure: {eu_state["migration_pressure"]} / 100
-- Disinfo Pressure: {eu_state["disinfo_pressure"]} / 100
-- Trade War Pressure: {eu_state["trade_war_pressure"]} / 100
-- Globaler Kontext: {eu_state["global_context"]}
-
-Memory (letzte Runden):
-{memory_str}
-
 WICHTIG: Quote/Soundbite Regeln
 - Gib pro Move zusätzlich "quote" aus: ein KURZES, fiktives Soundbite (1–2 Sätze).
 - Die Quote ist NUR stilistisch inspiriert von öffentlicher Rhetorik:
@@ -196,7 +93,7 @@ WICHTIG: Quote/Soundbite Regeln
 Regeln:
 - Gib NUR gültiges JSON zurück, kein Markdown.
 - actor muss exakt "USA", "China", "Russia" sein (jeweils einmal).
-- craziness muss exakt den oben genannten Werten entsprechen.
+- craziness muss exakt den angegebenen Crazy-Faktoren entsprechen.
 - headline ist öffentlich (1 Satz).
 - quote ist öffentlich (1–2 Sätze).
 - modifiers sind Ganzzahlen in etwa -12..+12 (eu_cohesion_delta eher -4..+4).
@@ -204,25 +101,136 @@ Regeln:
 - Moves sollen sich unterscheiden und plausible Folgeketten nahelegen.
 
 Schema:
-{schema_hint}
+{EXTERNAL_MOVES_SCHEMA_HINT}
+""".strip()
+
+DOMESTIC_EVENTS_SCHEMA_HINT = """
+{
+  "events": {
+    "Germany": {"craziness": 0, "headline": "...", "details": "..."}
+  }
+}
+""".strip()
+
+# static part of the domestic-events prompt (system message, identical every round)
+DOMESTIC_EVENTS_PREFIX = f"""
+Du bist Nachrichten-Redaktion & Innenpolitik-Simulationsmodul eines EU-Geopolitik-Spiels.
+
+Erzeuge für die angegebene Runde für JEDES Land genau EINE innenpolitische Zeitungsheadline.
+Sprache: Deutsch.
+Headlines kurz (max ~110 Zeichen), details 1–2 Sätze.
+Zusätzlich: "craziness" 0..100 (wie eskalierend/krisenhaft innenpolitisch).
+Berücksichtige EU-/Weltlage, Länderwerte, Memory und die letzten Spieleraktionen (für Konsequenzen/Variation).
+
+Regeln:
+- Nur gültiges JSON zurückgeben (kein Markdown).
+- Keys in events müssen exakt die in der Nachricht genannten Länder sein.
+- Kein Fantasy, aber zugespitzt möglich (Terror/Skandale/Inflation/Proteste/Fake News).
+
+Schema:
+{DOMESTIC_EVENTS_SCHEMA_HINT}
 """.strip()
 
-    raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Antworte ausschließlich mit gültigem JSON. Kein Markdown."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        top_p=top_p,
-        max_tokens=max_tokens,
-    )
-
-    try:
-        obj = parse_json_maybe(raw)
-    except Exception:
-        obj = _repair_to_valid_json(client, model, raw, schema_hint)
+
+def generate_external_moves(
+    *,
+    api_key: str,
+    model: str,
+    round_no: int,
+    eu_state: Dict[str, Any],
+    recent_round_summaries: List[Tuple[int, str]] | None = None,
+    # NEW:
+    craziness_by_actor: Optional[Dict[str, int]] = None,
+    temperature: float = 0.8,
+    top_p: float = 0.95,
+    max_tokens: int = 1200,
+    stream: bool = False,
+    on_text: Optional[Callable[[str, Any], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Output schema:
+    {
+      "global_context": "1 Zeile",
+      "moves": [
+        {
+          "actor":"Russia",
+          "craziness": 0,
+          "headline":"...",
+          "quote":"...",
+          "modifiers":{
+             "eu_cohesion_delta": 0,
+             "threat_delta": 0,
+             "frontline_delta": 0,
+             "energy_delta": 0,
+             "migration_delta": 0,
+             "disinfo_delta": 0,
+             "trade_war_delta": 0
+          }
+        },
+        {"actor":"USA",...},
+        {"actor":"China",...}
+      ]
+    }
+    """
+    memory_str = "Keine."
+    if recent_round_summaries:
+        rev = list(reversed(recent_round_summaries))
+        memory_str = "\n".join([f"- Runde {r}: {s}" for r, s in rev])
+
+    # Default craziness if not provided
+    cb = craziness_by_actor or {}
+    usa_c = int(cb.get("USA", 50))
+    rus_c = int(cb.get("Russia", 50))
+    chi_c = int(cb.get("China", 50))
+
+    prompt = PromptParts(EXTERNAL_MOVES_PREFIX, f"""
+Aktuelle Runde: {round_no}
+
+Crazy-Faktor je Außenmacht:
+- USA: {usa_c}/100
+- Russia: {rus_c}/100
+- China: {chi_c}/100
+
+Aktueller EU-Status:
+- EU-Kohäsion: {eu_state["cohesion"]}%
+- Threat Level: {eu_state["threat_level"]} / 100
+- Frontline Pressure: {eu_state["frontline_pressure"]} / 100
+- Energy Pressure: {eu_state["energy_pressure"]} / 100
+- Migration Pressure: {eu_state["migration_pressure"]} / 100
+- Disinfo Pressure: {eu_state["disinfo_pressure"]} / 100
+- Trade War Pressure: {eu_state["trade_war_pressure"]} / 100
+- Globaler Kontext: {eu_state["global_context"]}
+
+Memory (letzte Runden):
+{memory_str}
+""")
+
+    if stream:
+        raw = chat_stream(
+            api_key=api_key,
+            model=model,
+            messages=json_messages(prompt),
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site="external_moves",
+            schema=EXTERNAL_MOVES_SCHEMA,
+            on_text=on_text,
+            expected_keys=EXTERNAL_MOVES_STREAM_KEYS,
+        )
+    else:
+        raw = chat(
+            api_key=api_key,
+            model=model,
+            messages=json_messages(prompt),
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site="external_moves",
+            schema=EXTERNAL_MOVES_SCHEMA,
+        )
+
+    obj, _used_repair = parse_or_repair(api_key=api_key, model=model, raw=raw, schema_hint=EXTERNAL_MOVES_SCHEMA_HINT, repair_max_tokens=1200, call_site="external_moves", schema=EXTERNAL_MOVES_SCHEMA)
 
     # minimal validate
     moves = obj.get("moves", [])
@@ -262,6 +270,8 @@ def generate_domestic_events(
     temperature: float = 0.85,
     top_p: float = 0.95,
     max_tokens: int = 1400,
+    stream: bool = False,
+    on_text: Optional[Callable[[str, Any], None]] = None,
 ) -> Dict[str, Any]:
     """
     Output schema:
@@ -272,45 +282,38 @@ def generate_domestic_events(
       }
     }
     """
-    client = Mistral(api_key=api_key)
-
     memory_str = "Keine."
     if recent_round_summaries:
         rev = list(reversed(recent_round_summaries))
         memory_str = "\n".join([f"- Runde {r}: {s}" for r, s in rev])
 
     actions_by = recent_actions_by_country or {}
-    actions_lines = []
-    for c in countries:
-        acts = actions_by.get(c, [])[:4]
-        if acts:
-            actions_lines.append(f"- {c}: " + " | ".join(acts))
-    actions_str = "\n".join(actions_lines) if actions_lines else "Keine."
 
-    metrics_lines = []
-    for c in countries:
-        m = countries_metrics.get(c, {})
-        metrics_lines.append(
-            f"- {c}: Mil={m.get('military')}, Sta={m.get('stability')}, Wir={m.get('economy')}, "
-            f"Dip={m.get('diplomatic_influence')}, Zust={m.get('public_approval')}"
-        )
-    metrics_str = "\n".join(metrics_lines)
-
-    schema_hint = """
-{
-  "events": {
-    "Germany": {"craziness": 0, "headline": "...", "details": "..."}
-  }
-}
-""".strip()
-
-    prompt = f"""
-Du bist Nachrichten-Redaktion & Innenpolitik-Simulationsmodul eines EU-Geopolitik-Spiels.
-
-Erzeuge für Runde {round_no} für JEDES Land genau EINE innenpolitische Zeitungsheadline.
-Sprache: Deutsch.
-Headlines kurz (max ~110 Zeichen), details 1–2 Sätze.
-Zusätzlich: "craziness" 0..100 (wie eskalierend/krisenhaft innenpolitisch).
+    def _body(keys: List[str], done: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        actions_lines = []
+        for c in keys:
+            acts = actions_by.get(c, [])[:4]
+            if acts:
+                actions_lines.append(f"- {c}: " + " | ".join(acts))
+        actions_str = "\n".join(actions_lines) if actions_lines else "Keine."
+
+        metrics_lines = []
+        for c in keys:
+            m = countries_metrics.get(c, {})
+            metrics_lines.append(
+                f"- {c}: Mil={m.get('military')}, Sta={m.get('stability')}, Wir={m.get('economy')}, "
+                f"Dip={m.get('diplomatic_influence')}, Zust={m.get('public_approval')}"
+            )
+        metrics_str = "\n".join(metrics_lines)
+
+        done_str = ""
+        if done:
+            done_str = "Bereits erzeugt (nur Kontext, nicht wiederholen):\n" + "\n".join(
+                f"- {c}: {e.get('headline', '')}" for c, e in done.items()
+            ) + "\n\n"
+
+        return f"""
+Aktuelle Runde: {round_no}
 
 Kontext (EU/Weltlage):
 - EU-Kohäsion: {eu_state["cohesion"]}%
@@ -325,42 +328,81 @@ Länderwerte:
 Letzte Runden (Memory):
 {memory_str}
 
-Letzte Spieleraktionen je Land (für Konsequenzen/Variation):
+Letzte Spieleraktionen je Land:
 {actions_str}
 
-Regeln:
-- Nur gültiges JSON zurückgeben (kein Markdown).
-- Keys in events müssen exakt diese Länder sein: {countries}
-- Kein Fantasy, aber zugespitzt möglich (Terror/Skandale/Inflation/Proteste/Fake News).
-
-Schema:
-{schema_hint}
-""".strip()
+{done_str}Keys in events müssen exakt diese Länder sein: {keys}
+"""
+
+    schema = domestic_events_schema(countries)
+    prompt = PromptParts(DOMESTIC_EVENTS_PREFIX, _body(countries))
+
+    if stream:
+        raw = chat_stream(
+            api_key=api_key,
+            model=model,
+            messages=json_messages(prompt),
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site="domestic_events",
+            schema=schema,
+            on_text=on_text,
+            expected_keys=DOMESTIC_EVENTS_STREAM_KEYS,
+        )
+    else:
+        raw = chat(
+            api_key=api_key,
+            model=model,
+            messages=json_messages(prompt),
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site="domestic_events",
+            schema=schema,
+        )
 
-    raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Antworte ausschließlich mit gültigem JSON. Kein Markdown."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        top_p=top_p,
-        max_tokens=max_tokens,
-    )
-
-    try:
-        obj = parse_json_maybe(raw)
-    except Exception:
-        obj = _repair_to_valid_json(client, model, raw, schema_hint)
+    obj, _used_repair = parse_or_repair(api_key=api_key, model=model, raw=raw, schema_hint=DOMESTIC_EVENTS_SCHEMA_HINT, repair_max_tokens=1200, call_site="domestic_events", schema=schema)
 
     if "events" not in obj or not isinstance(obj["events"], dict):
         raise ValueError("Domestic events JSON muss 'events' als Objekt enthalten.")
 
-    # ensure all countries exist
-    for c in countries:
-        if c not in obj["events"]:
-            obj["events"][c] = {"craziness": 25, "headline": "Regierung unter Druck – innenpolitische Lage unklar", "details": ""}
+    # countries the model left out: ask only for those (same static prefix), placeholder as last resort
+    missing = [c for c in countries if not isinstance(obj["events"].get(c), dict)]
+    if not missing:
+        count_partial("domestic_events", "complete")
+    else:
+        count_partial("domestic_events", "keys_missing", len(missing))
+        done = {c: obj["events"][c] for c in countries if c not in missing}
+        r = route("domestic_events_fill")  # own route: the SLO downgrade covers the fill too
+        try:
+            fill_raw = chat(
+                api_key=api_key,
+                model=r["model"],
+                messages=json_messages(PromptParts(DOMESTIC_EVENTS_PREFIX, _body(missing, done))),
+                temperature=r["temperature"],
+                top_p=top_p,
+                max_tokens=min(r["max_tokens"], max(300, r["max_tokens"] * len(missing) // max(1, len(countries)) + 150)),
+                call_site="domestic_events_fill",
+                schema=domestic_events_schema(missing),
+            )
+            fill, _ = parse_or_repair(api_key=api_key, model=r["model"], raw=fill_raw, schema_hint=DOMESTIC_EVENTS_SCHEMA_HINT, repair_max_tokens=600, call_site="domestic_events_fill", schema=domestic_events_schema(missing))
+            events = fill.get("events") if isinstance(fill, dict) else None
+            filled = {c: e for c, e in (events or {}).items() if c in missing and isinstance(e, dict)}
+        except ValueError:  # unusable fill answer -> placeholders
+            filled = {}
+        except Exception as e:
+            # timeout/provider error: placeholders too, a job retry would redo the successful first call
+            if not is_transient(e):
+                count_partial("domestic_events", "fallback")
+                raise
+            filled = {}
+        obj["events"].update(filled)
+        count_partial("domestic_events", "keys_filled", len(filled))
+        count_partial("domestic_events", "filled" if len(filled) == len(missing) else "fallback")
+        for c in missing:
+            if c not in filled:
+                obj["events"][c] = {"craziness": 25, "headline": "Regierung unter Druck – innenpolitische Lage unklar", "details": ""}
 
     # harden
     for c in countries:
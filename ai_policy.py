@@ -0,0 +1,312 @@
+# ai_policy.py
+from __future__ import annotations
+from typing import Dict, Any, List, Tuple, Optional, Callable, Union
+
+from llm import chat, chat_stream, json_messages, parse_or_repair
+from llm_prompt import PromptParts
+from llm_schemas import POLICY_CANDIDATE_SCHEMA, policy_batch_schema
+from logic.helpers import format_external_events
+
+# top-level keys -> value type, checked while streaming (see utils.JSONStreamProbe)
+POLICY_STREAM_KEYS = {"aktion": '"', "folgen": "{"}
+
+
+POLICY_SCHEMA_HINT = """
+{
+  "aktion": "...",
+  "folgen": {
+    "land": {"militär": 0, "stabilität": 0, "wirtschaft": 0, "diplomatie": 0, "öffentliche_zustimmung": 0},
+    "eu": {"kohäsion": 0},
+    "global_context": "..."
+  }
+}
+""".strip()
+
+POLICY_DOMAINS = {
+    "foreign": {
+        "label": "Außenpolitik / Geopolitik / Sicherheit / Diplomatie",
+        "focus": """
+Fokus:
+- Abschreckung, Bündnisse, Sanktionen, Diplomatie, militärische Bereitschaft, internationale Kommunikation.
+- Berücksichtige Threat/Frontline/Energy/Migration/Disinfo/TradeWar-Druck.
+""".strip(),
+    },
+    "domestic": {
+        "label": "Innenpolitik / Gesellschaft / Wirtschaft / Stabilität",
+        "focus": """
+Fokus:
+- Innenpolitische Stabilität, Zustimmung, Reformen, Wirtschaft, Medien, Krisenmanagement, gesellschaftliche Spannungen.
+- Berücksichtige innenpolitisches Event (Headline) stark.
+""".strip(),
+    },
+}
+
+POLICY_BATCH_SCHEMA_HINT = """
+{
+  "kandidaten": [
+    {
+      "aggressivität": 30,
+      "aktion": "...",
+      "folgen": {
+        "land": {"militär": 0, "stabilität": 0, "wirtschaft": 0, "diplomatie": 0, "öffentliche_zustimmung": 0},
+        "eu": {"kohäsion": 0},
+        "global_context": "..."
+      }
+    }
+  ]
+}
+""".strip()
+
+AGGRESSIVENESS_SCALE = """
+Aggressivitätsskala:
+- 0–20: extrem vorsichtig, deeskalierend, risikoscheu
+- 21–40: eher vorsichtig, defensive Politik
+- 41–60: ausgewogen, moderate Risiken
+- 61–80: offensiv, hoher Einsatz, spürbare Risiken
+- 81–100: maximal aggressiv, sehr risikoreich (kann Zustimmung/Stabilität kosten)
+""".strip()
+
+
+def policy_prompt_prefix(domain: str) -> str:
+    """Static part of the policy prompt: the same for every country, round and aggressiveness."""
+    d = POLICY_DOMAINS["foreign" if domain == "foreign" else "domestic"]
+    return f"""
+Du bist eine Simulations-Engine in einem EU-Geopolitik-Spiel.
+
+Erzeuge GENAU EINE öffentliche Aktion für das unten genannte Land.
+Domain: {d["label"]}
+
+{d["focus"]}
+
+{AGGRESSIVENESS_SCALE}
+
+Output Regeln:
+- Gib NUR gültiges JSON zurück (kein Markdown, keine Erklärungen).
+- Die Aktion muss zur angegebenen Aggressivität passen.
+- Folgen sind kleine realistische Ganzzahlen (typisch -12..+12).
+- global_context ist ein kurzer Satz (max 1 Zeile).
+- Achte darauf, dass die Aktion zur Domain passt.
+
+Schema:
+{POLICY_SCHEMA_HINT}
+""".strip()
+
+
+def _policy_context(
+    *,
+    country_display: str,
+    metrics: Dict[str, Any],
+    eu_state: Dict[str, Any],
+    external_events: List[Dict[str, Any]],
+    domestic_headline: str,
+    recent_actions_summary: str,
+) -> str:
+    ext_str = format_external_events(external_events)
+    return f"""
+Kontext:
+- {country_display} Metriken: Militär={metrics["military"]}, Stabilität={metrics["stability"]}, Wirtschaft={metrics["economy"]},
+  Diplomatie={metrics["diplomatic_influence"]}, Öffentliche Zustimmung={metrics["public_approval"]}.
+- Ambition: {metrics["ambition"]}.
+
+EU-/Weltlage:
+- EU-Kohäsion={eu_state["cohesion"]}%
+- Threat Level={eu_state["threat_level"]}/100, Frontline Pressure={eu_state["frontline_pressure"]}/100
+- Energy={eu_state["energy_pressure"]}/100, Migration={eu_state["migration_pressure"]}/100
+- Disinfo={eu_state["disinfo_pressure"]}/100, TradeWar={eu_state["trade_war_pressure"]}/100
+- Globaler Kontext: {eu_state["global_context"]}
+
+Außenmächte-Moves dieser Runde:
+{ext_str}
+
+Innenpolitisches Event (diese Runde, Land):
+- {domestic_headline}
+
+Letzte Aktionen (für Variation, nicht wiederholen):
+{recent_actions_summary}
+""".strip()
+
+
+def build_policy_prompt(
+    *,
+    domain: str,  # "foreign" | "domestic"
+    aggressiveness: int,
+    country_display: str,
+    metrics: Dict[str, Any],
+    eu_state: Dict[str, Any],
+    external_events: List[Dict[str, Any]],
+    domestic_headline: str,
+    recent_actions_summary: str,
+) -> PromptParts:
+    context = _policy_context(
+        country_display=country_display,
+        metrics=metrics,
+        eu_state=eu_state,
+        external_events=external_events,
+        domestic_headline=domestic_headline,
+        recent_actions_summary=recent_actions_summary,
+    )
+    return PromptParts(policy_prompt_prefix(domain), f"""
+Land: {country_display}
+Aggressivität: {aggressiveness}/100
+
+{context}
+""")
+
+
+def policy_batch_prefix(domain: str) -> str:
+    """Static part of the batch prompt (several candidates in one call)."""
+    d = POLICY_DOMAINS["foreign" if domain == "foreign" else "domestic"]
+    return f"""
+Du bist eine Simulations-Engine in einem EU-Geopolitik-Spiel.
+
+Erzeuge für das unten genannte Land GENAU EINE öffentliche Aktion je angegebener Aggressivitätsstufe.
+Domain: {d["label"]}
+
+{d["focus"]}
+
+{AGGRESSIVENESS_SCALE}
+
+Output Regeln:
+- Gib NUR gültiges JSON zurück (kein Markdown, keine Erklärungen).
+- "kandidaten" enthält genau so viele Einträge wie Stufen angegeben sind, in derselben Reihenfolge.
+- "aggressivität" jedes Eintrags ist exakt die jeweilige Stufe.
+- Jede Aktion muss zu ihrer Stufe passen; die Aktionen unterscheiden sich deutlich voneinander.
+- Folgen sind kleine realistische Ganzzahlen (typisch -12..+12).
+- global_context ist ein kurzer Satz (max 1 Zeile).
+- Achte darauf, dass die Aktionen zur Domain passen.
+
+Schema:
+{POLICY_BATCH_SCHEMA_HINT}
+""".strip()
+
+
+def build_policy_batch_prompt(
+    *,
+    domain: str,  # "foreign" | "domestic"
+    aggressiveness_levels: List[int],
+    country_display: str,
+    metrics: Dict[str, Any],
+    eu_state: Dict[str, Any],
+    external_events: List[Dict[str, Any]],
+    domestic_headline: str,
+    recent_actions_summary: str,
+) -> PromptParts:
+    context = _policy_context(
+        country_display=country_display,
+        metrics=metrics,
+        eu_state=eu_state,
+        external_events=external_events,
+        domestic_headline=domestic_headline,
+        recent_actions_summary=recent_actions_summary,
+    )
+    return PromptParts(policy_batch_prefix(domain), f"""
+Land: {country_display}
+Aggressivitätsstufen: {[int(a) for a in aggressiveness_levels]}
+
+{context}
+""")
+
+
+def batch_aggressiveness(center: int, n: int, spread: int = 25) -> List[int]:
+    """n levels evenly spread around center (clamped to 0..100), e.g. 55, 3 -> [30, 55, 80]."""
+    n = max(1, int(n))
+    if n == 1:
+        return [max(0, min(100, int(center)))]
+    lo = max(0, min(100 - 2 * spread, int(center) - spread))
+    hi = min(100, lo + 2 * spread)
+    return [int(round(lo + (hi - lo) * i / (n - 1))) for i in range(n)]
+
+
+def _check_candidate(obj: Dict[str, Any], label: str = "") -> None:
+    if "aktion" not in obj or "folgen" not in obj:
+        raise ValueError(f"{label or 'Policy-JSON'} muss 'aktion' und 'folgen' enthalten.")
+    folgen = obj.get("folgen") or {}
+    if "land" not in folgen or "eu" not in folgen or "global_context" not in folgen:
+        raise ValueError(f"'{label + '.' if label else ''}folgen' muss land/eu/global_context enthalten.")
+
+
+def generate_policy_candidate(
+    *,
+    api_key: str,
+    model: str,
+    prompt: Union[str, PromptParts],
+    temperature: float = 0.85,
+    top_p: float = 0.95,
+    max_tokens: int = 900,
+    stream: bool = False,
+    on_text: Optional[Callable[[str, Any], None]] = None,
+) -> Tuple[Dict[str, Any], str]:
+    """stream=True: on_text(text_so_far, probe) per delta; probe.partial_string("aktion") is the action so far."""
+    if stream:
+        raw = chat_stream(
+            api_key=api_key,
+            model=model,
+            messages=json_messages(prompt),
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site="policy_candidate",
+            schema=POLICY_CANDIDATE_SCHEMA,
+            on_text=on_text,
+            expected_keys=POLICY_STREAM_KEYS,
+        )
+    else:
+        raw = chat(
+            api_key=api_key,
+            model=model,
+            messages=json_messages(prompt),
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site="policy_candidate",
+            schema=POLICY_CANDIDATE_SCHEMA,
+        )
+
+    obj, _used_repair = parse_or_repair(api_key=api_key, model=model, raw=raw, schema_hint=POLICY_SCHEMA_HINT, repair_max_tokens=1200, call_site="policy_candidate", schema=POLICY_CANDIDATE_SCHEMA)
+
+    # validate minimal keys
+    _check_candidate(obj)
+
+    return obj, raw
+
+
+def generate_policy_candidates(
+    *,
+    api_key: str,
+    model: str,
+    prompt: Union[str, PromptParts],
+    aggressiveness_levels: List[int],
+    temperature: float = 0.85,
+    top_p: float = 0.95,
+    max_tokens: int = 2200,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Batch mode: one call for len(aggressiveness_levels) candidates (prompt from
+    build_policy_batch_prompt). Returns the candidates in the order of the levels, each with
+    "aggressivität" set to its requested level.
+    """
+    n = len(aggressiveness_levels)
+    schema = policy_batch_schema(n)
+    raw = chat(
+        api_key=api_key,
+        model=model,
+        messages=json_messages(prompt),
+        temperature=temperature,
+        top_p=top_p,
+        max_tokens=max_tokens,
+        call_site="policy_batch",
+        schema=schema,
+    )
+
+    obj, _used_repair = parse_or_repair(api_key=api_key, model=model, raw=raw, schema_hint=POLICY_BATCH_SCHEMA_HINT, repair_max_tokens=2200, call_site="policy_batch", schema=schema)
+
+    items = obj.get("kandidaten")
+    if not isinstance(items, list) or len(items) < n:
+        got = len(items) if isinstance(items, list) else 0
+        raise ValueError(f"Batch-JSON muss {n} Einträge in 'kandidaten' enthalten, bekommen: {got}")
+    out = []
+    for i, (item, level) in enumerate(zip(items, aggressiveness_levels), start=1):
+        _check_candidate(item, f"kandidaten[{i}]")
+        item["aggressivität"] = int(level)  # the slot gets the level that was asked for
+        out.append(item)
+    return out, raw
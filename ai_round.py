@@ -1,50 +1,60 @@
 # ai_round.py
 from __future__ import annotations
-from typing import Dict, Any, Tuple, List
-from mistralai import Mistral
-from utils import content_to_text, parse_json_maybe
-
+from typing import Dict, Any, Tuple, List, Optional
+import json
+from llm import chat, count_partial, json_messages, parse_or_repair
+from llm_resilience import is_transient
+from llm_routing import route
+from llm_prompt import PromptBuilder, PromptParts, count_tokens, prompt_budget, truncate_text
+from llm_schemas import ACTIONS_SCHEMA, SUMMARY_SCHEMA, resolve_fill_schema, resolve_schema
+
+RESOLVE_SCHEMA_HINT = """
+{
+  "eu": {"kohäsion_delta": 0, "global_context": "..."},
+  "länder": {
+    "Germany": {"militär": 0, "stabilität": 0, "wirtschaft": 0, "diplomatie": 0, "öffentliche_zustimmung": 0}
+  },
+  "notizen": "kurz"
+}
+""".strip()
 
-def _chat(client: Mistral, model: str, messages, temperature: float, top_p: float, max_tokens: int) -> str:
-    resp = client.chat.complete(
-        model=model,
-        messages=messages,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        top_p=top_p,
-    )
-    return content_to_text(resp.choices[0].message.content)
+# static part of the resolve prompt (system message, identical every round)
+RESOLVE_PROMPT_PREFIX = f"""
+Du bist Spielleiter und Simulations-Engine für ein EU-Geopolitik-Spiel.
 
+Aufgabe:
+Berechne das Ergebnis der angegebenen Runde für ALLE Länder gemeinsam.
+Effekte dürfen sich gegenseitig beeinflussen (z.B. Ungarn-Aktion wirkt auf Frankreich).
 
-def _repair_to_valid_json(client: Mistral, model: str, bad_text: str, schema_hint: str) -> Dict[str, Any]:
-    repair_prompt = f"""
-Du bist ein Validator/Formatter. Wandle die folgende Ausgabe in **gültiges JSON** um.
+WICHTIG (Druckmechanik):
+- Hoher Threat/Frontline erhöht Wert von Militär/Abschreckung, aber kann Zustimmung/Stabilität kosten.
+- Hoher Energy/Migration/Disinfo/TradeWar-Druck verstärkt innenpolitische Risiken (Zustimmung/Stabilität) und macht Deals/Diplomatie wichtiger.
+- Nutze Memory für wiederkehrende Konflikte/Kooperationen.
 
-Wichtig:
-- Gib **NUR** JSON zurück (keine Erklärungen, kein Markdown).
-- Nutze **nur** doppelte Anführungszeichen.
-- Keine trailing commas.
-- Schema MUSS exakt passen.
+Output:
+- Gib NUR gültiges JSON zurück (kein Markdown).
+- Gib nur Netto-DELTAS je Land aus (Ganzzahlen, typischerweise -12..+12).
+- Zusätzlich EU-Kohäsions-Delta und neuen global_context (1 Zeile).
+- Als Keys in "länder" die am Ende der Nachricht genannten internen Country-Keys verwenden.
+- Alle Länder müssen enthalten sein.
 
 Schema:
-{schema_hint}
+{RESOLVE_SCHEMA_HINT}
+""".strip()
+
+SUMMARY_SCHEMA_HINT = """{ "summary": "..." }"""
 
-Hier ist die zu reparierende Ausgabe:
-{bad_text}
+# static part of the summary prompt (system message, identical every round)
+SUMMARY_PROMPT_PREFIX = f"""
+Du bist Chronist eines EU-Geopolitik-Spiels.
+Erstelle eine sehr kurze Zusammenfassung der angegebenen Runde als 2–4 Bulletpoints.
+
+Regeln:
+- Gib NUR gültiges JSON zurück, Schema: {SUMMARY_SCHEMA_HINT}
+- "summary" ist ein String mit 2–4 Bulletpoints (jede Zeile beginnt mit "- ").
+- Maximal ~520 Zeichen.
 """.strip()
 
-    fixed_raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Du gibst ausschließlich gültiges JSON zurück. Kein Markdown."},
-            {"role": "user", "content": repair_prompt},
-        ],
-        temperature=0.2,
-        top_p=1.0,
-        max_tokens=1400,
-    )
-    return parse_json_maybe(fixed_raw)
 
 
 def generate_actions_for_country(
@@ -56,18 +66,15 @@ def generate_actions_for_country(
     top_p: float = 0.95,
     max_tokens: int = 900,
 ) -> Tuple[Dict[str, Any], str, bool]:
-    client = Mistral(api_key=api_key)
-
-    raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Antworte ausschließlich mit gültigem JSON. Kein Markdown."},
-            {"role": "user", "content": prompt},
-        ],
+    raw = chat(
+        api_key=api_key,
+        model=model,
+        messages=json_messages(prompt),
         temperature=temperature,
         top_p=top_p,
         max_tokens=max_tokens,
+        call_site="actions",
+        schema=ACTIONS_SCHEMA,
     )
 
     schema_hint = """
@@ -85,12 +92,7 @@ def generate_actions_for_country(
 }
 """.strip()
 
-    used_repair = False
-    try:
-        obj = parse_json_maybe(raw)
-    except Exception:
-        used_repair = True
-        obj = _repair_to_valid_json(client, model, raw, schema_hint)
+    obj, used_repair = parse_or_repair(api_key=api_key, model=model, raw=raw, schema_hint=schema_hint, call_site="actions", schema=ACTIONS_SCHEMA)
 
     for k in ("aggressiv", "moderate", "passiv"):
         if k not in obj:
@@ -120,76 +122,72 @@ def resolve_round_all_countries(
     temperature: float = 0.6,
     top_p: float = 0.95,
     max_tokens: int = 1700,
+    allow_partial: bool = False,  # countries still missing after the fill are left out (caller fills them) instead of raising
 ) -> Dict[str, Any]:
-    client = Mistral(api_key=api_key)
-
-    chosen_actions_block = []
-    for c, variant in locked_choices.items():
-        display = countries_display.get(c, c)
-        text = actions_texts.get(c, {}).get(variant, "")
-        chosen_actions_block.append(f"- {display} ({c}): {variant} -> {text}")
-    chosen_actions_str = "\n".join(chosen_actions_block)
-
-    metrics_block = []
-    for c, m in countries_metrics.items():
-        display = countries_display.get(c, c)
-        metrics_block.append(
-            f"- {display} ({c}): Militär={m['military']}, Stabilität={m['stability']}, Wirtschaft={m['economy']}, "
-            f"Diplomatie={m['diplomatic_influence']}, Zustimmung={m['public_approval']}. Ambition: {m['ambition']}"
-        )
-    metrics_str = "\n".join(metrics_block)
-
-    memory_str = "Keine."
-    if recent_round_summaries:
-        rev = list(reversed(recent_round_summaries))
-        memory_str = "\n".join([f"- Runde {r}: {s}" for r, s in rev])
-
-    external_str = "Keine."
-    if external_events:
+    def _actions_block(max_chars: Optional[int]) -> str:
         lines = []
-        for e in external_events:
-            mods = e.get("modifiers", {})
-            lines.append(f"- {e.get('actor')}: {e.get('headline')} | mods={mods}")
-        external_str = "\n".join(lines)
+        for c, variant in locked_choices.items():
+            display = countries_display.get(c, c)
+            text = actions_texts.get(c, {}).get(variant, "")
+            if max_chars is not None:
+                text = truncate_text(text, max_chars)
+            lines.append(f"- {display} ({c}): {variant} -> {text}")
+        return "Gewählte Aktionen dieser Runde:\n" + "\n".join(lines)
+
+    def _metrics_block(ambition_chars: Optional[int]) -> str:
+        lines = []
+        for c, m in countries_metrics.items():
+            display = countries_display.get(c, c)
+            line = (
+                f"- {display} ({c}): Militär={m['military']}, Stabilität={m['stability']}, Wirtschaft={m['economy']}, "
+                f"Diplomatie={m['diplomatic_influence']}, Zustimmung={m['public_approval']}."
+            )
+            if ambition_chars is None or ambition_chars > 0:
+                ambition = m["ambition"] if ambition_chars is None else truncate_text(m["ambition"], ambition_chars)
+                line += f" Ambition: {ambition}"
+            lines.append(line)
+        return "Aktuelle Länderwerte:\n" + "\n".join(lines)
+
+    def _memory_block(limit: int) -> str:
+        memory_str = "Keine."
+        if recent_round_summaries:
+            rev = list(reversed(recent_round_summaries))[-limit:]
+            memory_str = "\n".join([f"- Runde {r}: {s}" for r, s in rev])
+        return "Story-/Memory-Kontext (letzte Runden):\n" + memory_str
+
+    def _external_block(with_mods: bool) -> str:
+        external_str = "Keine."
+        if external_events:
+            lines = []
+            for e in external_events:
+                line = f"- {e.get('actor')}: {e.get('headline')}"
+                if with_mods:
+                    line += f" | mods={e.get('modifiers', {})}"
+                lines.append(line)
+            external_str = "\n".join(lines)
+        return "Außenmächte-Moves dieser Runde (USA/China/Russia):\n" + external_str
+
+    def _domestic_block(headline_chars: Optional[int]) -> str:
         domestic_str = "Keine."
         if domestic_events:
             lines = []
             for e in domestic_events:
-                lines.append(f"- {e.get('country')}: {e.get('headline')} (crazy={e.get('craziness',0)}/100)")
+                headline = e.get("headline") if headline_chars is None else truncate_text(e.get("headline", ""), headline_chars)
+                lines.append(f"- {e.get('country')}: {headline} (crazy={e.get('craziness', 0)}/100)")
             domestic_str = "\n".join(lines)
-
-    schema_hint = """
-{
-  "eu": {"kohäsion_delta": 0, "global_context": "..."},
-  "länder": {
-    "Germany": {"militär": 0, "stabilität": 0, "wirtschaft": 0, "diplomatie": 0, "öffentliche_zustimmung": 0}
-  },
-  "notizen": "kurz"
-}
-""".strip()
-
-    prompt = f"""
-Du bist Spielleiter und Simulations-Engine für ein EU-Geopolitik-Spiel.
-
-Aufgabe:
-Berechne das Ergebnis der Runde {round_no} für ALLE Länder gemeinsam.
-Effekte dürfen sich gegenseitig beeinflussen (z.B. Ungarn-Aktion wirkt auf Frankreich).
-
-WICHTIG (Druckmechanik):
-- Hoher Threat/Frontline erhöht Wert von Militär/Abschreckung, aber kann Zustimmung/Stabilität kosten.
-- Hoher Energy/Migration/Disinfo/TradeWar-Druck verstärkt innenpolitische Risiken (Zustimmung/Stabilität) und macht Deals/Diplomatie wichtiger.
-- Nutze Memory für wiederkehrende Konflikte/Kooperationen.
-
-Story-/Memory-Kontext (letzte Runden):
-{memory_str}
-
-Außenmächte-Moves dieser Runde (USA/China/Russia):
-{external_str}
-
-Innenpolitische Headlines dieser Runde:
-{domestic_str}
-
-
+        return "Innenpolitische Headlines dieser Runde:\n" + domestic_str
+
+    countries = list(countries_metrics.keys())
+    schema = resolve_schema(countries)
+
+    def _body(call_site: str, keys: List[str], done: Optional[Dict[str, Any]] = None) -> str:
+        # body sections in prompt order; over the token budget the lowest priority is compacted first
+        b = PromptBuilder(call_site, budget=prompt_budget("resolve"), reserved=count_tokens(RESOLVE_PROMPT_PREFIX))
+        b.add("round", f"Aktuelle Runde: {round_no}", required=True)
+        b.add("memory", _memory_block(3), priority=1, variants=[_memory_block(1)], droppable=True)
+        b.add("external", _external_block(True), priority=3, variants=[_external_block(False)])
+        b.add("domestic", _domestic_block(None), priority=2, variants=[_domestic_block(90), _domestic_block(50)])
+        b.add("eu", f"""
 Aktueller EU-Status:
 - Kohäsion={eu_state["cohesion"]}%
 - Threat Level={eu_state["threat_level"]}/100
@@ -199,46 +197,71 @@ Aktueller EU-Status:
 - Disinfo Pressure={eu_state["disinfo_pressure"]}/100
 - Trade War Pressure={eu_state["trade_war_pressure"]}/100
 - Globaler Kontext: {eu_state["global_context"]}
-
-Aktuelle Länderwerte:
-{metrics_str}
-
-Gewählte Aktionen dieser Runde:
-{chosen_actions_str}
-
-Output:
-- Gib NUR gültiges JSON zurück (kein Markdown).
-- Gib nur Netto-DELTAS je Land aus (Ganzzahlen, typischerweise -12..+12).
-- Zusätzlich EU-Kohäsions-Delta und neuen global_context (1 Zeile).
-- Keys in "länder" müssen exakt die internen Country-Keys sein: {list(countries_metrics.keys())}
-- Alle Länder müssen enthalten sein.
-
-Schema:
-{schema_hint}
-""".strip()
-
-    raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Antworte ausschließlich mit gültigem JSON. Kein Markdown."},
-            {"role": "user", "content": prompt},
-        ],
+""", required=True)
+        b.add("metrics", _metrics_block(None), priority=4, variants=[_metrics_block(80), _metrics_block(0)])
+        b.add("actions", _actions_block(None), priority=5, variants=[_actions_block(400), _actions_block(200), _actions_block(100)])
+        if done is not None:
+            b.add("done", "Bereits berechnet (nicht ändern, nur für Wechselwirkungen):\n" + json.dumps(done, ensure_ascii=False, separators=(",", ":")), required=True)
+        b.add("keys", f'Keys in "länder" müssen exakt die internen Country-Keys sein: {keys}', required=True)
+        return b.build()
+
+    raw = chat(
+        api_key=api_key,
+        model=model,
+        messages=json_messages(PromptParts(RESOLVE_PROMPT_PREFIX, _body("resolve", countries))),
         temperature=temperature,
         top_p=top_p,
         max_tokens=max_tokens,
+        call_site="resolve",
+        schema=schema,
     )
 
-    try:
-        obj = parse_json_maybe(raw)
-    except Exception:
-        obj = _repair_to_valid_json(client, model, raw, schema_hint)
+    obj, _used_repair = parse_or_repair(api_key=api_key, model=model, raw=raw, schema_hint=RESOLVE_SCHEMA_HINT, call_site="resolve", schema=schema)
 
     if "eu" not in obj or "länder" not in obj:
         raise ValueError("Resolve-JSON muss 'eu' und 'länder' enthalten.")
-    for c in countries_metrics.keys():
-        if c not in obj["länder"]:
-            raise ValueError(f"Resolve-JSON: fehlendes Land in 'länder': {c}")
+
+    # countries the model left out: ask only for their deltas instead of redoing the whole resolve
+    missing = [c for c in countries if not isinstance(obj["länder"].get(c), dict)]
+    if not missing:
+        count_partial("resolve", "complete")
+        return obj
+    count_partial("resolve", "keys_missing", len(missing))
+    fill_schema = resolve_fill_schema(missing)
+    r = route("resolve_fill")  # own route: the SLO downgrade covers the fill too
+    try:
+        fill_raw = chat(
+            api_key=api_key,
+            model=r["model"],
+            messages=json_messages(PromptParts(RESOLVE_PROMPT_PREFIX, _body("resolve_fill", missing, {
+                "eu": obj["eu"], "länder": {c: obj["länder"][c] for c in countries if c not in missing},
+            }))),
+            temperature=r["temperature"],
+            top_p=top_p,
+            max_tokens=min(r["max_tokens"], max(300, r["max_tokens"] * len(missing) // max(1, len(countries)) + 150)),
+            call_site="resolve_fill",
+            schema=fill_schema,
+        )
+        fill, _ = parse_or_repair(api_key=api_key, model=r["model"], raw=fill_raw, schema_hint=RESOLVE_SCHEMA_HINT, repair_max_tokens=600, call_site="resolve_fill", schema=fill_schema)
+        laender = fill.get("länder") if isinstance(fill, dict) else None
+        filled = {c: d for c, d in (laender or {}).items() if c in missing and isinstance(d, dict)}
+    except ValueError:  # unusable fill answer
+        filled = {}
+    except Exception as e:
+        # timeouts/provider errors: keep the partial answer if the caller fills the rest, else it sees the error
+        if not (allow_partial and is_transient(e)):
+            count_partial("resolve", "fallback")
+            raise
+        filled = {}
+    obj["länder"].update(filled)
+    count_partial("resolve", "keys_filled", len(filled))
+    still_missing = [c for c in missing if c not in filled]
+    if still_missing:
+        count_partial("resolve", "fallback")
+        if allow_partial:
+            return obj
+        raise ValueError(f"Resolve-JSON: fehlende Länder in 'länder': {', '.join(still_missing)}")
+    count_partial("resolve", "filled")
 
     return obj
 
@@ -259,12 +282,12 @@ def generate_round_summary(
     top_p: float = 0.95,
     max_tokens: int = 520,
 ) -> str:
-    client = Mistral(api_key=api_key)
-
-    memory_str = "Keine."
-    if memory_in:
-        rev = list(reversed(memory_in))
-        memory_str = "\n".join([f"- Runde {r}: {s}" for r, s in rev])
+    def _memory_block(limit: int) -> str:
+        memory_str = "Keine."
+        if memory_in:
+            rev = list(reversed(memory_in))[-limit:]
+            memory_str = "\n".join([f"- Runde {r}: {s}" for r, s in rev])
+        return "- Memory (letzte Runden):\n" + memory_str
 
     external_str = "Keine."
     if external_events:
@@ -273,62 +296,51 @@ def generate_round_summary(
             lines.append(f"- {e.get('actor')}: {e.get('headline')}")
         external_str = "\n".join(lines)
 
-    domestic_str = "Keine."
-    if domestic_events:
-        lines = []
-        for e in domestic_events:
-            lines.append(f"- {e.get('country')}: {e.get('headline')} (crazy={e.get('craziness',0)}/100)")
-        domestic_str = "\n".join(lines)
-
-    schema_hint = """{ "summary": "..." }"""
-
-    prompt = f"""
-Du bist Chronist eines EU-Geopolitik-Spiels.
-Erstelle eine sehr kurze Zusammenfassung der Runde {round_no} als 2–4 Bulletpoints.
-
-Inputs:
-- Memory (letzte Runden):
-{memory_str}
-
-- Außenmächte-Moves:
-{external_str}
-
-- Innenpolitische Headlines dieser Runde:
-{domestic_str}
-
+    def _domestic_block(headline_chars: Optional[int]) -> str:
+        domestic_str = "Keine."
+        if domestic_events:
+            lines = []
+            for e in domestic_events:
+                headline = e.get("headline") if headline_chars is None else truncate_text(e.get("headline", ""), headline_chars)
+                lines.append(f"- {e.get('country')}: {headline} (crazy={e.get('craziness',0)}/100)")
+            domestic_str = "\n".join(lines)
+        return "- Innenpolitische Headlines dieser Runde:\n" + domestic_str
+
+    def _actions_block(max_chars: Optional[int]) -> str:
+        lines = chosen_actions_str.splitlines()
+        if max_chars is not None:
+            lines = [truncate_text(line, max_chars) for line in lines]
+        return "- Gewählte Aktionen:\n" + "\n".join(lines)
+
+    b = PromptBuilder("summary", reserved=count_tokens(SUMMARY_PROMPT_PREFIX))
+    b.add("round", f"Aktuelle Runde: {round_no}\n\nInputs:", required=True)
+    b.add("memory", _memory_block(3), priority=1, variants=[_memory_block(1)], droppable=True)
+    b.add("external", "- Außenmächte-Moves:\n" + external_str, priority=3)
+    b.add("domestic", _domestic_block(None), priority=2, variants=[_domestic_block(60)], droppable=True)
+    b.add("eu", f"""
 - EU vorher: Kohäsion={eu_before["cohesion"]}%, Threat={eu_before["threat_level"]}, Frontline={eu_before["frontline_pressure"]},
   Energy={eu_before["energy_pressure"]}, Migration={eu_before["migration_pressure"]}, Disinfo={eu_before["disinfo_pressure"]}, TradeWar={eu_before["trade_war_pressure"]}
 - EU nachher: Kohäsion={eu_after["cohesion"]}%, Threat={eu_after["threat_level"]}, Frontline={eu_after["frontline_pressure"]},
   Energy={eu_after["energy_pressure"]}, Migration={eu_after["migration_pressure"]}, Disinfo={eu_after["disinfo_pressure"]}, TradeWar={eu_after["trade_war_pressure"]}
-
-- Gewählte Aktionen:
-{chosen_actions_str}
-
-- Ergebnis (Deltas):
-{result_obj}
-
-Regeln:
-- Gib NUR gültiges JSON zurück, Schema: {schema_hint}
-- "summary" ist ein String mit 2–4 Bulletpoints (jede Zeile beginnt mit "- ").
-- Maximal ~520 Zeichen.
-""".strip()
-
-    raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Antworte ausschließlich mit gültigem JSON. Kein Markdown."},
-            {"role": "user", "content": prompt},
-        ],
+""", required=True)
+    b.add("actions", _actions_block(None), priority=4, variants=[_actions_block(240), _actions_block(120)])
+    b.add("result", f"- Ergebnis (Deltas):\n{result_obj}", priority=5, variants=[
+        "- Ergebnis (Deltas):\n" + json.dumps(result_obj.get("länder", result_obj), ensure_ascii=False, separators=(",", ":")),
+    ])
+    prompt = PromptParts(SUMMARY_PROMPT_PREFIX, b.build())
+
+    raw = chat(
+        api_key=api_key,
+        model=model,
+        messages=json_messages(prompt),
         temperature=temperature,
         top_p=top_p,
         max_tokens=max_tokens,
+        call_site="summary",
+        schema=SUMMARY_SCHEMA,
     )
 
-    try:
-        obj = parse_json_maybe(raw)
-    except Exception:
-        obj = _repair_to_valid_json(client, model, raw, schema_hint)
+    obj, _used_repair = parse_or_repair(api_key=api_key, model=model, raw=raw, schema_hint=SUMMARY_SCHEMA_HINT, call_site="summary", schema=SUMMARY_SCHEMA)
 
     summary = str(obj.get("summary", "")).strip()
     if not summary:
@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 from typing import Dict, Any, List
-from logic.game_logic import build_action_prompt, apply_external_modifiers_to_eu, decay_pressures
+from logic.game_logic import build_action_prompt
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -14,29 +14,33 @@ from countries import (
     EU_DEFAULT,
     EXTERNAL_CRAZY_BASELINE_RANGES,
 )
-from ui.components import inject_css, VALUE_HELP, compact_kv, metric_with_info
+from ui.components import inject_css, VALUE_HELP, compact_kv, metric_with_info, run_scheduled_rerun
+from ui.gm_perf import render_gm_perf_panel
 from logic.helpers import (
     summarize_recent_actions,
     format_external_events,
     impact_preview_text,
+    progress_from_conditions,
 )
 from ui.panels import (
     render_my_metrics_panel,
     render_news_panel,
     render_public_dashboard,
     render_player_view,
-    _progress_from_conditions,
 )
 
 
 from db import (
     get_conn,
+    release_conn,
     ensure_schema,
     seed_countries_if_missing,
     reset_all_countries,
     load_country_metrics,
     load_all_country_metrics,
     load_recent_history,
+    get_round_turn_history,
+    get_history_rounds,
     get_eu_state,
     set_eu_state,
     get_game_meta,
@@ -151,7 +155,7 @@ if st.session_state.auth is None:
             st.rerun()
 
     st.info("Bitte einloggen. (User werden vom Game Master erstellt.)")
-    conn.close()
+    release_conn(conn)
     st.stop()
 
 auth = st.session_state.auth
@@ -171,7 +175,7 @@ if is_gm and gm_pin:
     entered = st.sidebar.text_input("GM PIN", type="password")
     if entered != gm_pin:
         st.sidebar.warning("PIN erforderlich.")
-        conn.close()
+        release_conn(conn)
         st.stop()
 
 # GM: Spieleransicht simulieren
@@ -208,7 +212,7 @@ elif not is_gm:
 
 if not is_gm and not effective_country:
     st.error("Kein Land zugewiesen. GM muss dir ein Land zuweisen.")
-    conn.close()
+    release_conn(conn)
     st.stop()
 
 # ----------------------------
@@ -299,6 +303,8 @@ if is_gm:
             st.success("Gelöscht.")
             st.rerun()
 
+    render_gm_perf_panel(conn)
+
 # ----------------------------
 # Sidebar: reset (GM only)
 # ----------------------------
@@ -382,7 +388,7 @@ with right:
         if not cond_results:
             st.warning("Für dieses Land sind noch keine Siegbedingungen definiert (countries.py: win_conditions).")
         else:
-            prog = _progress_from_conditions(cond_results)
+            prog = progress_from_conditions(cond_results)
             st.progress(int(prog))
             st.caption(f"{prog:.0f}% der Siegbedingungen erfüllt.")
             if is_winner:
@@ -414,18 +420,8 @@ with center:
         st.write("---")
      # --- NEU: Runden-Historie (Außenmächte + Länderaktionen) ---
     with st.expander("🕰️ Runden-Historie (Außenmächte + Innenpolitik + Aktionen)", expanded=False):
-        # Welche Runden existieren? (aus turn_history UND external_events)
-        cur = conn.cursor()
-        cur.execute("SELECT DISTINCT round FROM turn_history ORDER BY round DESC")
-        rounds_from_turns = [int(r[0]) for r in cur.fetchall()]
-
-        cur.execute("SELECT DISTINCT round FROM external_events ORDER BY round DESC")
-        rounds_from_external = [int(r[0]) for r in cur.fetchall()]
-
-        cur.execute("SELECT DISTINCT round FROM domestic_events ORDER BY round DESC")
-        rounds_from_domestic = [int(r[0]) for r in cur.fetchall()]
-
-        all_rounds = sorted(set(rounds_from_turns + rounds_from_external + rounds_from_domestic), reverse=True)
+        # Welche Runden existieren? (aus turn_history, external_events und domestic_events)
+        all_rounds = get_history_rounds(conn)
 
 
         if not all_rounds:
@@ -451,16 +447,7 @@ with center:
 
                     # 2) Aktionen der Länder dieser Runde (aus turn_history)
                     st.markdown("**🏛️ Länderaktionen**")
-                    cur.execute(
-                        """
-                        SELECT country, action_public, global_context
-                        FROM turn_history
-                        WHERE round = ?
-                        ORDER BY country ASC
-                        """,
-                        (int(r),),
-                    )
-                    rows = cur.fetchall()
+                    rows = get_round_turn_history(conn, r)
                     if not rows:
                         st.caption("Keine Länderaktionen gespeichert (evtl. Runde noch nicht resolved).")
                     else:
@@ -520,12 +507,8 @@ with right:
             phase=phase,
             countries=countries,
             countries_display=countries_display,
-            country_defs=COUNTRY_DEFS,
             external_crazy_baseline_ranges=EXTERNAL_CRAZY_BASELINE_RANGES,
-            apply_external_modifiers_to_eu=apply_external_modifiers_to_eu,
-            decay_pressures=decay_pressures,
-            progress_from_conditions=_progress_from_conditions,
-            evaluate_all_countries=evaluate_all_countries,
         )
 
-conn.close()
+release_conn(conn)
+run_scheduled_rerun()  # job polling (after the connection is back in the pool)
@@ -1,6 +1,6 @@
 # create_gm.py
 from dotenv import load_dotenv
-from db import get_conn, ensure_schema, create_user
+from db import get_conn, release_conn, ensure_schema, create_user
 
 load_dotenv()  # lädt .env aus dem aktuellen Ordner
 
@@ -11,6 +11,6 @@ conn = get_conn()
 ensure_schema(conn)
 
 create_user(conn, username=username, password=password, role="gm", country=None)
-conn.close()
+release_conn(conn)
 
 print("✅ GM user created/updated.")
@@ -1,17 +1,273 @@
 import sqlite3
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional, Callable, Iterator
 import json
 import os
 import base64
 import hashlib
+import threading
+from contextlib import contextmanager
 
 from utils import clamp_int
 
 DB_PATH = "game.db"
 
 
+# -----------------------
+# Connection manager (process-wide, thread-local connections)
+# -----------------------
+# One profile for all connections. Every key can be overridden via env
+# (SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE,
+# SQLITE_CACHE_SIZE_KIB, SQLITE_MAX_IDLE) or via configure_db(...).
+DB_PROFILE: Dict[str, Any] = {
+    "journal_mode": "WAL",            # readers don't block the GM writer
+    "synchronous": "NORMAL",          # safe with WAL, one fsync per checkpoint instead of per commit
+    "busy_timeout_ms": 5000,          # wait instead of "database is locked"
+    "mmap_size": 128 * 1024 * 1024,   # bytes
+    "cache_size_kib": 16 * 1024,      # page cache per connection
+    "max_idle": 8,                    # idle connections kept for reuse
+}
+
+
+def _profile_from_env(base: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(base)
+    for key in out:
+        raw = (os.getenv(f"SQLITE_{key.upper()}") or "").strip()
+        if not raw:
+            continue
+        out[key] = int(raw) if isinstance(base[key], int) else raw.upper()
+    return out
+
+
+class _GameConnection(sqlite3.Connection):
+    """sqlite3 connection that can carry unit-of-work state (see transaction())."""
+    uow_depth = 0
+
+
+class ConnectionManager:
+    """
+    Hands out one connection per thread and keeps released connections idle for reuse.
+    Streamlit runs every rerun in a fresh thread, so reuse happens via the idle pool;
+    connections of finished threads that were never released are reclaimed as well.
+    """
+
+    def __init__(self, path: str, profile: Dict[str, Any]):
+        self.path = path
+        self.profile = dict(profile)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle: List[sqlite3.Connection] = []
+        self._owners: Dict[int, Tuple[threading.Thread, sqlite3.Connection]] = {}
+        # process-level "already done" markers for ensure_schema / seed_countries_if_missing
+        self.schema_ready = False
+        self.seeded: set = set()
+        self._stats = {"opened": 0, "reused": 0, "thread_hits": 0, "released": 0, "reclaimed": 0, "closed": 0}
+
+    def _open(self) -> sqlite3.Connection:
+        p = self.profile
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            timeout=int(p["busy_timeout_ms"]) / 1000.0,
+            factory=_GameConnection,
+        )
+        cur = conn.cursor()
+        cur.execute(f"PRAGMA journal_mode = {p['journal_mode']}")
+        cur.execute(f"PRAGMA synchronous = {p['synchronous']}")
+        cur.execute(f"PRAGMA busy_timeout = {int(p['busy_timeout_ms'])}")
+        cur.execute(f"PRAGMA mmap_size = {int(p['mmap_size'])}")
+        cur.execute(f"PRAGMA cache_size = -{int(p['cache_size_kib'])}")
+        cur.close()
+        self._stats["opened"] += 1
+        return conn
+
+    @staticmethod
+    def _usable(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.total_changes  # raises ProgrammingError on closed connections
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+    @staticmethod
+    def _reset(conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        if isinstance(conn, _GameConnection):
+            conn.uow_depth = 0
+
+    def _reclaim_dead_owners(self) -> None:
+        for key, (thread, conn) in list(self._owners.items()):
+            if thread.is_alive():
+                continue
+            del self._owners[key]
+            if self._usable(conn):
+                self._reset(conn)
+                self._idle.append(conn)
+                self._stats["reclaimed"] += 1
+
+    def acquire(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._usable(conn):
+            with self._lock:
+                self._stats["thread_hits"] += 1
+            return conn
+
+        with self._lock:
+            if not self._idle:
+                self._reclaim_dead_owners()
+            conn = None
+            while self._idle and conn is None:
+                candidate = self._idle.pop()
+                if self._usable(candidate):
+                    conn = candidate
+                    self._stats["reused"] += 1
+            if conn is None:
+                conn = self._open()
+            self._owners[id(conn)] = (threading.current_thread(), conn)
+
+        self._local.conn = conn
+        return conn
+
+    def holds(self) -> bool:
+        """Whether the calling thread already has a connection."""
+        conn = getattr(self._local, "conn", None)
+        return conn is not None and self._usable(conn)
+
+    def release(self, conn: Optional[sqlite3.Connection] = None) -> None:
+        conn = conn or getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        if getattr(self._local, "conn", None) is conn:
+            self._local.conn = None
+
+        with self._lock:
+            self._owners.pop(id(conn), None)
+            if not self._usable(conn):
+                return
+            self._reset(conn)
+            self._stats["released"] += 1
+            if len(self._idle) < int(self.profile["max_idle"]):
+                self._idle.append(conn)
+            else:
+                conn.close()
+                self._stats["closed"] += 1
+
+    def close_all(self) -> None:
+        with self._lock:
+            conns = self._idle + [c for _t, c in self._owners.values()]
+            self._idle = []
+            self._owners = {}
+            for c in conns:
+                if self._usable(c):
+                    c.close()
+                    self._stats["closed"] += 1
+        self._local = threading.local()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["idle"] = len(self._idle)
+            out["in_use"] = len(self._owners)
+        out["path"] = self.path
+        out["journal_mode"] = self.profile["journal_mode"]
+        return out
+
+
+_MANAGER: Optional[ConnectionManager] = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_db_manager() -> ConnectionManager:
+    global _MANAGER
+    if _MANAGER is None:
+        with _MANAGER_LOCK:
+            if _MANAGER is None:
+                _MANAGER = ConnectionManager(DB_PATH, _profile_from_env(DB_PROFILE))
+    return _MANAGER
+
+
+def configure_db(path: Optional[str] = None, **profile_overrides: Any) -> ConnectionManager:
+    """Replace the process-wide manager (other DB file or profile). Closes pooled connections."""
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is not None:
+            _MANAGER.close_all()
+        profile = _profile_from_env(DB_PROFILE)
+        profile.update(profile_overrides)
+        _MANAGER = ConnectionManager(path or DB_PATH, profile)
+    return _MANAGER
+
+
 def get_conn() -> sqlite3.Connection:
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    return get_db_manager().acquire()
+
+
+def release_conn(conn: Optional[sqlite3.Connection] = None) -> None:
+    """Return the calling thread's connection to the pool (instead of conn.close())."""
+    get_db_manager().release(conn)
+
+
+@contextmanager
+def scoped_conn() -> Iterator[sqlite3.Connection]:
+    """
+    Connection for a short read/write from code that may run on any thread (LLM cache,
+    telemetry, routing): reuses the thread's connection if it has one (script, job
+    worker), otherwise acquires one and releases it at the end, so short-lived and pool
+    threads (gm-gen workers, hedged attempts) do not keep connections checked out.
+    """
+    manager = get_db_manager()
+    owned = not manager.holds()
+    conn = manager.acquire()
+    try:
+        yield conn
+    finally:
+        if owned:
+            manager.release(conn)
+
+
+def db_pool_stats() -> Dict[str, Any]:
+    return get_db_manager().stats()
+
+
+# -----------------------
+# Unit of work
+# -----------------------
+def _commit(conn: sqlite3.Connection) -> None:
+    """Helpers commit through this; inside transaction() the commit is deferred to the end."""
+    if getattr(conn, "uow_depth", 0) == 0:
+        conn.commit()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    Batch several helper calls into one write transaction:
+
+        with transaction(conn):
+            set_eu_state(conn, ...)
+            apply_country_deltas_bulk(conn, ...)
+
+    Takes the write lock up front (BEGIN IMMEDIATE), commits once at the end and rolls
+    everything back on error. Nested blocks join the outer transaction. Keep slow work
+    (LLM calls) outside the block — readers are fine with WAL, other writers wait.
+    Requires a connection from get_conn().
+    """
+    depth = conn.uow_depth
+    if depth == 0:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+    conn.uow_depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        conn.uow_depth = depth
+        if depth == 0:
+            conn.rollback()
+        raise
+    conn.uow_depth = depth
+    if depth == 0:
+        conn.commit()
 
 
 def _col_exists(conn: sqlite3.Connection, table: str, col: str) -> bool:
@@ -21,7 +277,11 @@ def _col_exists(conn: sqlite3.Connection, table: str, col: str) -> bool:
     return col in cols
 
 
-def ensure_schema(conn: sqlite3.Connection) -> None:
+# -----------------------
+# Schema migrations (PRAGMA user_version)
+# -----------------------
+def _migration_001_base_schema(conn: sqlite3.Connection) -> None:
+    """Baseline schema. Column probes stay here for DBs created before versioning."""
     cur = conn.cursor()
 
     # Countries
@@ -226,46 +486,208 @@ def ensure_schema(conn: sqlite3.Connection) -> None:
     )
     """)
 
-    conn.commit()
-
     # Seed eu_state & game_meta
-    cur.execute("SELECT 1 FROM eu_state WHERE id = 1")
-    if cur.fetchone() is None:
-        cur.execute("""
-            INSERT INTO eu_state (
-                id, cohesion, global_context,
-                threat_level, frontline_pressure,
-                energy_pressure, migration_pressure, disinfo_pressure, trade_war_pressure
-            )
-            VALUES (1, 75, '', 35, 30, 25, 25, 25, 25)
-        """)
+    cur.execute("""
+        INSERT OR IGNORE INTO eu_state (
+            id, cohesion, global_context,
+            threat_level, frontline_pressure,
+            energy_pressure, migration_pressure, disinfo_pressure, trade_war_pressure
+        )
+        VALUES (1, 75, '', 35, 30, 25, 25, 25, 25)
+    """)
+    # phases: setup -> external_generated -> actions_published -> game_over
+    cur.execute("INSERT OR IGNORE INTO game_meta (id, round, phase) VALUES (1, 1, 'setup')")
+
+
+def _migration_002_round_country_indexes(conn: sqlite3.Connection) -> None:
+    """Secondary indexes for the round-/country-filtered reads (see HOT_QUERIES)."""
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_turn_history_country_round ON turn_history (country, round)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_turn_history_round_country ON turn_history (round, country)")
+
+
+def _migration_003_round_resolution_steps(conn: sqlite3.Connection) -> None:
+    """Checkpoints of the round-resolution pipeline (logic/resolution.py)."""
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS round_resolution_steps (
+        round INTEGER NOT NULL,
+        step TEXT NOT NULL,              -- "resolve" | "summary" | "apply" | "snapshot" | "win_check"
+        output_json TEXT NOT NULL DEFAULT '',
+        ts DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (round, step)
+    )
+    """)
+
+
+def _migration_004_llm_cache(conn: sqlite3.Connection) -> None:
+    """Content-addressed LLM response cache (llm_cache.py)."""
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,            -- sha256 of model + messages + sampling params
+        call_site TEXT NOT NULL DEFAULT '',
+        model TEXT NOT NULL DEFAULT '',
+        response TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,        -- unix time, TTL reference
+        last_used_at REAL NOT NULL,      -- unix time, LRU reference for size eviction
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache (created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used_at ON llm_cache (last_used_at)")
+
+
+def _migration_005_speculative_budget(conn: sqlite3.Connection) -> None:
+    """Per-game counter of speculative candidate generations (logic/speculative.py)."""
+    if not _col_exists(conn, "game_meta", "speculative_calls"):
+        conn.execute("ALTER TABLE game_meta ADD COLUMN speculative_calls INTEGER NOT NULL DEFAULT 0")
+
+
+def _migration_006_jobs(conn: sqlite3.Connection) -> None:
+    """Persistent background jobs for LLM work (logic/jobs.py)."""
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,              -- "gm_generate" | "policy_candidate" | "round_resolution"
+        idem_key TEXT NOT NULL UNIQUE,   -- same key -> same job (double clicks, reruns)
+        status TEXT NOT NULL DEFAULT 'queued',  -- queued | running | done | failed
+        payload_json TEXT NOT NULL DEFAULT '{}',
+        result_json TEXT NOT NULL DEFAULT '',
+        error TEXT NOT NULL DEFAULT '',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 3,
+        created_at REAL NOT NULL,        -- unix time
+        started_at REAL,                 -- first attempt
+        finished_at REAL,
+        run_ms REAL                      -- duration of the last attempt
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+
+
+def _migration_007_llm_calls(conn: sqlite3.Connection) -> None:
+    """One row per LLM call for latency/token telemetry (llm_telemetry.py)."""
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS llm_calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,                -- unix time at the end of the call
+        round INTEGER,                   -- game round the call belongs to (NULL if unknown)
+        call_site TEXT NOT NULL,
+        model TEXT NOT NULL DEFAULT '',
+        prompt_tokens INTEGER NOT NULL DEFAULT 0,
+        completion_tokens INTEGER NOT NULL DEFAULT 0,
+        tokens_estimated INTEGER NOT NULL DEFAULT 0,  -- 1: chars / 4 instead of provider usage
+        latency_ms REAL NOT NULL,
+        ttft_ms REAL,                    -- streamed calls only
+        streamed INTEGER NOT NULL DEFAULT 0,
+        cached INTEGER NOT NULL DEFAULT 0,  -- cache hit or coalesced with an identical call
+        repair TEXT NOT NULL DEFAULT '', -- '' | 'local' | 'llm' | 'failed'
+        error TEXT NOT NULL DEFAULT ''
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_ts ON llm_calls (ts)")
+
+
+def _migration_008_llm_calls_route_index(conn: sqlite3.Connection) -> None:
+    """Recent latencies per call site and model for the routing SLO check (llm_routing.py)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_site_model_ts ON llm_calls (call_site, model, ts)")
+
+
+def _migration_009_job_lease(conn: sqlite3.Connection) -> None:
+    """Lease per running job: only jobs whose worker stopped refreshing it are requeued (logic/jobs.py)."""
+    if not _col_exists(conn, "jobs", "heartbeat_at"):
+        conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+
+# (version, description, fn) — append only, never renumber.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "base schema", _migration_001_base_schema),
+    (2, "round/country indexes", _migration_002_round_country_indexes),
+    (3, "round resolution checkpoints", _migration_003_round_resolution_steps),
+    (4, "llm response cache", _migration_004_llm_cache),
+    (5, "speculative generation budget", _migration_005_speculative_budget),
+    (6, "background jobs", _migration_006_jobs),
+    (7, "llm call telemetry", _migration_007_llm_calls),
+    (8, "llm call latency index per call site/model", _migration_008_llm_calls_route_index),
+    (9, "job lease (heartbeat)", _migration_009_job_lease),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
 
-    cur.execute("SELECT 1 FROM game_meta WHERE id = 1")
-    if cur.fetchone() is None:
-        # phases: setup -> external_generated -> actions_published -> game_over
-        cur.execute("INSERT INTO game_meta (id, round, phase) VALUES (1, 1, 'setup')")
+_SCHEMA_LOCK = threading.Lock()
 
-    conn.commit()
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending migrations, each in its own transaction. Returns applied versions."""
+    applied: List[int] = []
+    for version, _desc, fn in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # re-read inside the write lock: another process may have migrated meanwhile
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            fn(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """
+    Runs migrations at most once per process (per DB manager). Warm reruns return
+    immediately; a restarted process pays one PRAGMA user_version read.
+    """
+    manager = get_db_manager()
+    if manager.schema_ready:
+        return
+    with _SCHEMA_LOCK:
+        if manager.schema_ready:
+            return
+        if get_schema_version(conn) < SCHEMA_VERSION:
+            migrate(conn)
+        manager.schema_ready = True
 
 
 def seed_countries_if_missing(conn: sqlite3.Connection, country_defs: Dict[str, Dict[str, Any]]) -> None:
+    manager = get_db_manager()
+    seed_key = tuple(sorted(country_defs.keys()))
+    if seed_key in manager.seeded:
+        return
+
     cur = conn.cursor()
-    for name, data in country_defs.items():
-        cur.execute("SELECT 1 FROM countries WHERE name = ?", (name,))
-        if cur.fetchone() is None:
-            cur.execute("""
-                INSERT INTO countries (name, military, stability, economy, diplomatic_influence, public_approval, ambition)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                name,
-                int(data["military"]),
-                int(data["stability"]),
-                int(data["economy"]),
-                int(data["diplomatic_influence"]),
-                int(data["public_approval"]),
-                str(data["ambition"]),
-            ))
-    conn.commit()
+    cur.executemany("""
+        INSERT OR IGNORE INTO countries (name, military, stability, economy, diplomatic_influence, public_approval, ambition)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            name,
+            int(data["military"]),
+            int(data["stability"]),
+            int(data["economy"]),
+            int(data["diplomatic_influence"]),
+            int(data["public_approval"]),
+            str(data["ambition"]),
+        )
+        for name, data in country_defs.items()
+    ])
+    _commit(conn)
+    manager.seeded.add(seed_key)
 
 
 def reset_country_to_defaults(conn: sqlite3.Connection, country: str, defaults: Dict[str, Any]) -> None:
@@ -289,7 +711,7 @@ def reset_country_to_defaults(conn: sqlite3.Connection, country: str, defaults:
         country,
     ))
     cur.execute("DELETE FROM turn_history WHERE country = ?", (country,))
-    conn.commit()
+    _commit(conn)
 
 
 def reset_all_countries(conn: sqlite3.Connection, country_defs: Dict[str, Dict[str, Any]]) -> None:
@@ -356,7 +778,7 @@ def set_eu_state(
         clamp_int(int(disinfo_pressure), 0, 100),
         clamp_int(int(trade_war_pressure), 0, 100),
     ))
-    conn.commit()
+    _commit(conn)
 
 
 def get_game_meta(conn: sqlite3.Connection) -> Dict[str, Any]:
@@ -375,7 +797,23 @@ def get_game_meta(conn: sqlite3.Connection) -> Dict[str, Any]:
 def set_game_meta(conn: sqlite3.Connection, round_no: int, phase: str) -> None:
     cur = conn.cursor()
     cur.execute("UPDATE game_meta SET round = ?, phase = ? WHERE id = 1", (int(round_no), str(phase)))
-    conn.commit()
+    _commit(conn)
+
+
+def get_speculative_calls(conn: sqlite3.Connection) -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT speculative_calls FROM game_meta WHERE id = 1")
+    return int(cur.fetchone()[0] or 0)
+
+
+def reserve_speculative_calls(conn: sqlite3.Connection, *, wanted: int, budget: int) -> int:
+    """Atomically take up to `wanted` calls from the per-game budget; returns how many were granted."""
+    with transaction(conn):
+        used = get_speculative_calls(conn)
+        granted = max(0, min(int(wanted), int(budget) - used))
+        if granted:
+            conn.execute("UPDATE game_meta SET speculative_calls = speculative_calls + ? WHERE id = 1", (granted,))
+    return granted
 
 
 def set_game_over(conn: sqlite3.Connection, *, winner_country: str, winner_round: int, reason: str = "win_conditions") -> None:
@@ -388,7 +826,7 @@ def set_game_over(conn: sqlite3.Connection, *, winner_country: str, winner_round
             winner_reason = ?
         WHERE id = 1
     """, (str(winner_country), int(winner_round), str(reason)))
-    conn.commit()
+    _commit(conn)
 
 
 def clear_game_over(conn: sqlite3.Connection) -> None:
@@ -400,7 +838,7 @@ def clear_game_over(conn: sqlite3.Connection) -> None:
             winner_reason = NULL
         WHERE id = 1
     """)
-    conn.commit()
+    _commit(conn)
 
 
 # -----------------------
@@ -428,45 +866,78 @@ def load_country_metrics(conn: sqlite3.Connection, country: str) -> Optional[Dic
 
 
 def load_all_country_metrics(conn: sqlite3.Connection, countries: List[str]) -> Dict[str, Dict[str, Any]]:
-    out: Dict[str, Dict[str, Any]] = {}
-    for c in countries:
-        m = load_country_metrics(conn, c)
-        if m:
-            out[c] = m
-    return out
+    """One query for all countries; result keeps the order of `countries`."""
+    if not countries:
+        return {}
+    cur = conn.cursor()
+    placeholders = ", ".join("?" for _ in countries)
+    cur.execute(f"""
+        SELECT name, military, stability, economy, diplomatic_influence, public_approval, ambition
+        FROM countries
+        WHERE name IN ({placeholders})
+    """, [str(c) for c in countries])
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for row in cur.fetchall():
+        by_name[str(row[0])] = {
+            "name": row[0],
+            "military": int(row[1]),
+            "stability": int(row[2]),
+            "economy": int(row[3]),
+            "diplomatic_influence": int(row[4]),
+            "public_approval": int(row[5]),
+            "ambition": str(row[6]),
+        }
+    return {c: by_name[c] for c in countries if c in by_name}
+
+
+def _delta_values(deltas: Dict[str, Any]) -> Tuple[int, int, int, int, int]:
+    """(militär, stabilität, wirtschaft, diplomatie, öffentliche_zustimmung) from a 'länder' entry."""
+    d = deltas or {}
+    return (
+        int(d.get("militär", 0)),
+        int(d.get("stabilität", 0)),
+        int(d.get("wirtschaft", 0)),
+        int(d.get("diplomatie", 0)),
+        int(d.get("öffentliche_zustimmung", 0)),
+    )
+
+
+# clamping to 0..100 happens in the statement (same bounds as utils.clamp_int)
+_SQL_APPLY_DELTAS = """
+    UPDATE countries SET
+        military = MAX(0, MIN(100, military + ?)),
+        stability = MAX(0, MIN(100, stability + ?)),
+        economy = MAX(0, MIN(100, economy + ?)),
+        diplomatic_influence = MAX(0, MIN(100, diplomatic_influence + ?)),
+        public_approval = MAX(0, MIN(100, public_approval + ?))
+    WHERE name = ?
+"""
 
 
 def apply_country_deltas(conn: sqlite3.Connection, country: str, deltas: Dict[str, Any]) -> None:
-    dm = int(deltas.get("militär", 0))
-    ds = int(deltas.get("stabilität", 0))
-    de = int(deltas.get("wirtschaft", 0))
-    dd = int(deltas.get("diplomatie", 0))
-    dp = int(deltas.get("öffentliche_zustimmung", 0))
+    apply_country_deltas_bulk(conn, {country: deltas})
+
 
+def apply_country_deltas_bulk(conn: sqlite3.Connection, deltas_by_country: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Apply a whole result["länder"] dict ({country: {"militär": .., ...}}) in one
+    statement batch and one commit.
+    """
+    rows = [(*_delta_values(d), str(c)) for c, d in (deltas_by_country or {}).items()]
+    if not rows:
+        return
     cur = conn.cursor()
-    cur.execute("""
-        UPDATE countries SET
-            military = military + ?,
-            stability = stability + ?,
-            economy = economy + ?,
-            diplomatic_influence = diplomatic_influence + ?,
-            public_approval = public_approval + ?
-        WHERE name = ?
-    """, (dm, ds, de, dd, dp, country))
-    conn.commit()
+    cur.executemany(_SQL_APPLY_DELTAS, rows)
+    _commit(conn)
 
-    cur.execute("""
-        SELECT military, stability, economy, diplomatic_influence, public_approval
-        FROM countries WHERE name = ?
-    """, (country,))
-    m, s, e, d, p = cur.fetchone()
 
-    cur.execute("""
-        UPDATE countries SET
-            military = ?, stability = ?, economy = ?, diplomatic_influence = ?, public_approval = ?
-        WHERE name = ?
-    """, (clamp_int(m), clamp_int(s), clamp_int(e), clamp_int(d), clamp_int(p), country))
-    conn.commit()
+_SQL_INSERT_TURN_HISTORY = """
+    INSERT INTO turn_history (
+        country, round, action_public, global_context,
+        delta_military, delta_stability, delta_economy, delta_diplomatic_influence, delta_public_approval
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
 
 def insert_turn_history(
@@ -478,41 +949,80 @@ def insert_turn_history(
     global_context: str,
     deltas: Dict[str, Any],
 ) -> None:
+    insert_turn_history_bulk(
+        conn,
+        round_no=round_no,
+        global_context=global_context,
+        entries=[(country, action_public, deltas)],
+    )
+
+
+def insert_turn_history_bulk(
+    conn: sqlite3.Connection,
+    *,
+    round_no: int,
+    global_context: str,
+    entries: List[Tuple[str, str, Dict[str, Any]]],
+) -> None:
+    """entries: [(country, action_public, deltas), ...] — one commit for the whole round."""
+    rows = [
+        (str(country), int(round_no), str(action_public), str(global_context), *_delta_values(deltas))
+        for country, action_public, deltas in entries
+    ]
+    if not rows:
+        return
     cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO turn_history (
-            country, round, action_public, global_context,
-            delta_military, delta_stability, delta_economy, delta_diplomatic_influence, delta_public_approval
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        country,
-        int(round_no),
-        str(action_public),
-        str(global_context),
-        int(deltas.get("militär", 0)),
-        int(deltas.get("stabilität", 0)),
-        int(deltas.get("wirtschaft", 0)),
-        int(deltas.get("diplomatie", 0)),
-        int(deltas.get("öffentliche_zustimmung", 0)),
-    ))
-    conn.commit()
+    cur.executemany(_SQL_INSERT_TURN_HISTORY, rows)
+    _commit(conn)
+
+
+# ids grow with rounds, so (round, id) is the insertion order and matches idx_turn_history_country_round
+_SQL_RECENT_HISTORY = """
+    SELECT round, action_public,
+           delta_military, delta_stability, delta_economy, delta_diplomatic_influence, delta_public_approval,
+           global_context
+    FROM turn_history
+    WHERE country = ?
+    ORDER BY round DESC, id DESC
+    LIMIT ?
+"""
 
 
 def load_recent_history(conn: sqlite3.Connection, country: str, limit: int = 12) -> List[Tuple]:
     cur = conn.cursor()
-    cur.execute("""
-        SELECT round, action_public,
-               delta_military, delta_stability, delta_economy, delta_diplomatic_influence, delta_public_approval,
-               global_context
-        FROM turn_history
-        WHERE country = ?
-        ORDER BY id DESC
-        LIMIT ?
-    """, (country, int(limit)))
+    cur.execute(_SQL_RECENT_HISTORY, (country, int(limit)))
     return cur.fetchall()
 
 
+_SQL_ROUND_TURN_HISTORY = """
+    SELECT country, action_public, global_context
+    FROM turn_history
+    WHERE round = ?
+    ORDER BY country ASC
+"""
+
+
+def get_round_turn_history(conn: sqlite3.Connection, round_no: int) -> List[Tuple[str, str, str]]:
+    cur = conn.cursor()
+    cur.execute(_SQL_ROUND_TURN_HISTORY, (int(round_no),))
+    return [(str(c), str(a), str(g or "")) for c, a, g in cur.fetchall()]
+
+
+_SQL_HISTORY_ROUNDS = """
+    SELECT round FROM turn_history
+    UNION SELECT round FROM external_events
+    UNION SELECT round FROM domestic_events
+    ORDER BY 1 DESC
+"""
+
+
+def get_history_rounds(conn: sqlite3.Connection) -> List[int]:
+    """All rounds that have turn history, external or domestic events (newest first)."""
+    cur = conn.cursor()
+    cur.execute(_SQL_HISTORY_ROUNDS)
+    return [int(r[0]) for r in cur.fetchall()]
+
+
 # -----------------------
 # Snapshots for dashboard
 # -----------------------
@@ -553,16 +1063,30 @@ def upsert_country_snapshot(
         float(victory_progress),
         1 if is_winner else 0,
     ))
-    conn.commit()
+    _commit(conn)
+
+
+_SQL_COUNTRY_SNAPSHOTS = """
+    SELECT round, country, economy, stability, military, diplomatic_influence, public_approval, victory_progress, is_winner, ts
+    FROM country_snapshots
+    ORDER BY round ASC, country ASC
+"""
 
+_SQL_COUNTRY_SNAPSHOTS_RECENT = """
+    SELECT round, country, economy, stability, military, diplomatic_influence, public_approval, victory_progress, is_winner, ts
+    FROM country_snapshots
+    WHERE round > (SELECT MAX(round) FROM country_snapshots) - ?
+    ORDER BY round ASC, country ASC
+"""
 
-def get_country_snapshots(conn: sqlite3.Connection, *, limit_rounds: int = 50) -> List[Dict[str, Any]]:
+
+def get_country_snapshots(conn: sqlite3.Connection, *, limit_rounds: Optional[int] = None) -> List[Dict[str, Any]]:
+    """All snapshots, or only those of the last `limit_rounds` rounds (index range read)."""
     cur = conn.cursor()
-    cur.execute("""
-        SELECT round, country, economy, stability, military, diplomatic_influence, public_approval, victory_progress, is_winner, ts
-        FROM country_snapshots
-        ORDER BY round ASC, country ASC
-    """)
+    if limit_rounds is None:
+        cur.execute(_SQL_COUNTRY_SNAPSHOTS)
+    else:
+        cur.execute(_SQL_COUNTRY_SNAPSHOTS_RECENT, (int(limit_rounds),))
     rows = cur.fetchall()
     out: List[Dict[str, Any]] = []
     for r in rows:
@@ -592,7 +1116,7 @@ def clear_round_data(conn: sqlite3.Connection, round_no: int) -> None:
     # new tables
     cur.execute("DELETE FROM policy_candidates WHERE round = ?", (int(round_no),))
     cur.execute("DELETE FROM policy_locks WHERE round = ?", (int(round_no),))
-    conn.commit()
+    _commit(conn)
 
 
 def upsert_round_actions(conn: sqlite3.Connection, round_no: int, country: str, actions_obj: Dict[str, Any]) -> None:
@@ -612,7 +1136,7 @@ def upsert_round_actions(conn: sqlite3.Connection, round_no: int, country: str,
                 action_text = excluded.action_text,
                 impact_json = excluded.impact_json
         """, (int(round_no), country, variant, text, impact_json))
-    conn.commit()
+    _commit(conn)
 
 
 def get_round_actions(conn: sqlite3.Connection, round_no: int) -> Dict[str, Dict[str, str]]:
@@ -657,7 +1181,7 @@ def lock_choice(conn: sqlite3.Connection, round_no: int, country: str, variant:
         VALUES (?, ?, ?)
         ON CONFLICT(round, country) DO UPDATE SET locked_variant = excluded.locked_variant, locked_at = CURRENT_TIMESTAMP
     """, (int(round_no), country, str(variant)))
-    conn.commit()
+    _commit(conn)
 
 
 def get_locks(conn: sqlite3.Connection, round_no: int) -> Dict[str, str]:
@@ -688,7 +1212,9 @@ def upsert_policy_candidate(
     aggressiveness: int,
     action_text: str,
     impact: Dict[str, Any] | None = None,
-) -> None:
+    overwrite: bool = True,
+) -> bool:
+    """overwrite=False keeps an existing candidate in the slot; returns whether the row was written."""
     if domain not in ("foreign", "domestic"):
         raise ValueError("domain must be 'foreign' or 'domestic'")
     slot_i = int(slot)
@@ -697,15 +1223,17 @@ def upsert_policy_candidate(
 
     impact_json = json.dumps(impact or {}, ensure_ascii=False)
 
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO policy_candidates (round, country, domain, slot, aggressiveness, action_text, impact_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(round, country, domain, slot) DO UPDATE SET
+    on_conflict = """DO UPDATE SET
             aggressiveness=excluded.aggressiveness,
             action_text=excluded.action_text,
             impact_json=excluded.impact_json,
-            ts=CURRENT_TIMESTAMP
+            ts=CURRENT_TIMESTAMP""" if overwrite else "DO NOTHING"
+
+    cur = conn.cursor()
+    cur.execute(f"""
+        INSERT INTO policy_candidates (round, country, domain, slot, aggressiveness, action_text, impact_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(round, country, domain, slot) {on_conflict}
     """, (
         int(round_no),
         str(country),
@@ -715,7 +1243,16 @@ def upsert_policy_candidate(
         str(action_text),
         str(impact_json),
     ))
-    conn.commit()
+    _commit(conn)
+    return cur.rowcount > 0
+
+
+_SQL_POLICY_CANDIDATES = """
+    SELECT slot, aggressiveness, action_text, impact_json, ts
+    FROM policy_candidates
+    WHERE round = ? AND country = ? AND domain = ?
+    ORDER BY slot ASC
+"""
 
 
 def get_policy_candidates(
@@ -729,12 +1266,7 @@ def get_policy_candidates(
         raise ValueError("domain must be 'foreign' or 'domestic'")
 
     cur = conn.cursor()
-    cur.execute("""
-        SELECT slot, aggressiveness, action_text, impact_json, ts
-        FROM policy_candidates
-        WHERE round = ? AND country = ? AND domain = ?
-        ORDER BY slot ASC
-    """, (int(round_no), str(country), str(domain)))
+    cur.execute(_SQL_POLICY_CANDIDATES, (int(round_no), str(country), str(domain)))
 
     out: List[Dict[str, Any]] = []
     for slot, aggressiveness, action_text, impact_json, ts in cur.fetchall():
@@ -801,16 +1333,19 @@ def lock_policy_slot(
             WHERE round = ? AND country = ?
         """, (slot_i, int(round_no), str(country)))
 
-    conn.commit()
+    _commit(conn)
+
+
+_SQL_POLICY_LOCKS = """
+    SELECT country, locked_foreign_slot, locked_domestic_slot
+    FROM policy_locks
+    WHERE round = ?
+"""
 
 
 def get_policy_locks(conn: sqlite3.Connection, *, round_no: int) -> Dict[str, Dict[str, Optional[int]]]:
     cur = conn.cursor()
-    cur.execute("""
-        SELECT country, locked_foreign_slot, locked_domestic_slot
-        FROM policy_locks
-        WHERE round = ?
-    """, (int(round_no),))
+    cur.execute(_SQL_POLICY_LOCKS, (int(round_no),))
     out: Dict[str, Dict[str, Optional[int]]] = {}
     for country, f, d in cur.fetchall():
         out[str(country)] = {
@@ -839,24 +1374,396 @@ def upsert_round_summary(conn: sqlite3.Connection, round_no: int, summary: str)
         VALUES (?, ?)
         ON CONFLICT(round) DO UPDATE SET summary = excluded.summary, ts = CURRENT_TIMESTAMP
     """, (int(round_no), str(summary)))
-    conn.commit()
+    _commit(conn)
+
+
+_SQL_RECENT_ROUND_SUMMARIES = """
+    SELECT round, summary
+    FROM round_summaries
+    ORDER BY round DESC
+    LIMIT ?
+"""
 
 
 def get_recent_round_summaries(conn: sqlite3.Connection, limit: int = 3) -> List[Tuple[int, str]]:
     cur = conn.cursor()
-    cur.execute("""
-        SELECT round, summary
-        FROM round_summaries
-        ORDER BY round DESC
-        LIMIT ?
-    """, (int(limit),))
+    cur.execute(_SQL_RECENT_ROUND_SUMMARIES, (int(limit),))
     return [(int(r), str(s)) for r, s in cur.fetchall()]
 
 
 def clear_all_round_summaries(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
     cur.execute("DELETE FROM round_summaries")
-    conn.commit()
+    _commit(conn)
+
+
+# -----------------------
+# Round resolution checkpoints
+# -----------------------
+def save_resolution_step(conn: sqlite3.Connection, *, round_no: int, step: str, output: Any) -> None:
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO round_resolution_steps (round, step, output_json)
+        VALUES (?, ?, ?)
+        ON CONFLICT(round, step) DO UPDATE SET output_json = excluded.output_json, ts = CURRENT_TIMESTAMP
+    """, (int(round_no), str(step), json.dumps(output, ensure_ascii=False)))
+    _commit(conn)
+
+
+def get_resolution_steps(conn: sqlite3.Connection, *, round_no: int) -> Dict[str, Any]:
+    """returns: {step: output} for all completed steps of the round"""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT step, output_json
+        FROM round_resolution_steps
+        WHERE round = ?
+    """, (int(round_no),))
+    out: Dict[str, Any] = {}
+    for step, output_json in cur.fetchall():
+        try:
+            out[str(step)] = json.loads(output_json) if output_json else None
+        except Exception:
+            out[str(step)] = None
+    return out
+
+
+def clear_resolution_steps(conn: sqlite3.Connection, round_no: Optional[int] = None) -> None:
+    cur = conn.cursor()
+    if round_no is None:
+        cur.execute("DELETE FROM round_resolution_steps")
+    else:
+        cur.execute("DELETE FROM round_resolution_steps WHERE round = ?", (int(round_no),))
+    _commit(conn)
+
+
+# -----------------------
+# Background jobs
+# -----------------------
+_JOB_COLUMNS = "id, kind, idem_key, status, payload_json, result_json, error, attempts, max_attempts, created_at, started_at, finished_at, run_ms"
+
+_SQL_JOB_BY_KEY = f"SELECT {_JOB_COLUMNS} FROM jobs WHERE idem_key = ?"
+
+
+def _job_row(row: Tuple) -> Dict[str, Any]:
+    (job_id, kind, idem_key, status, payload_json, result_json, error, attempts, max_attempts,
+     created_at, started_at, finished_at, run_ms) = row
+    return {
+        "id": int(job_id),
+        "kind": str(kind),
+        "idem_key": str(idem_key),
+        "status": str(status),
+        "payload": json.loads(payload_json or "{}"),
+        "result": json.loads(result_json) if result_json else None,
+        "error": str(error or ""),
+        "attempts": int(attempts),
+        "max_attempts": int(max_attempts),
+        "created_at": float(created_at),
+        "started_at": float(started_at) if started_at is not None else None,
+        "finished_at": float(finished_at) if finished_at is not None else None,
+        "run_ms": float(run_ms) if run_ms is not None else None,
+    }
+
+
+def create_job(
+    conn: sqlite3.Connection,
+    *,
+    kind: str,
+    idem_key: str,
+    payload: Dict[str, Any],
+    max_attempts: int,
+    now: float,
+) -> Tuple[int, bool]:
+    """Insert a queued job unless idem_key exists. Returns (job_id, created)."""
+    with transaction(conn):
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO jobs (kind, idem_key, status, payload_json, max_attempts, created_at)
+            VALUES (?, ?, 'queued', ?, ?, ?)
+            ON CONFLICT(idem_key) DO NOTHING
+        """, (str(kind), str(idem_key), json.dumps(payload, ensure_ascii=False), int(max_attempts), float(now)))
+        if cur.rowcount:
+            return int(cur.lastrowid), True
+        cur.execute("SELECT id FROM jobs WHERE idem_key = ?", (str(idem_key),))
+        return int(cur.fetchone()[0]), False
+
+
+def requeue_failed_job(conn: sqlite3.Connection, job_id: int, *, payload: Dict[str, Any], max_attempts: int) -> bool:
+    """failed -> queued with the new payload and a fresh attempt budget (manual retry). Returns whether it was requeued."""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE jobs SET status = 'queued', attempts = 0, error = '', payload_json = ?, max_attempts = ?
+        WHERE id = ? AND status = 'failed'
+    """, (json.dumps(payload, ensure_ascii=False), int(max_attempts), int(job_id)))
+    _commit(conn)
+    return cur.rowcount > 0
+
+
+def claim_job(conn: sqlite3.Connection, job_id: int, *, now: float) -> bool:
+    """queued -> running (atomic; only one worker wins). Counts the attempt and starts the lease."""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE jobs
+        SET status = 'running', attempts = attempts + 1, started_at = COALESCE(started_at, ?), heartbeat_at = ?
+        WHERE id = ? AND status = 'queued'
+    """, (float(now), float(now), int(job_id)))
+    _commit(conn)
+    return cur.rowcount > 0
+
+
+def finish_job(conn: sqlite3.Connection, job_id: int, *, result: Any, run_ms: float, now: float) -> None:
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE jobs SET status = 'done', result_json = ?, error = '', run_ms = ?, finished_at = ?
+        WHERE id = ?
+    """, (json.dumps(result, ensure_ascii=False), float(run_ms), float(now), int(job_id)))
+    _commit(conn)
+
+
+def fail_job(conn: sqlite3.Connection, job_id: int, *, error: str, run_ms: float, final: bool, now: float) -> None:
+    """final=False puts the job back into the queue for another attempt."""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE jobs SET status = ?, error = ?, run_ms = ?, finished_at = ?
+        WHERE id = ?
+    """, ("failed" if final else "queued", str(error), float(run_ms), float(now) if final else None, int(job_id)))
+    _commit(conn)
+
+
+def heartbeat_jobs(conn: sqlite3.Connection, job_ids: List[int], *, now: float) -> None:
+    """Refresh the lease of running jobs (called periodically by the worker process that runs them)."""
+    if not job_ids:
+        return
+    cur = conn.cursor()
+    cur.execute(
+        f"UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND id IN ({','.join('?' * len(job_ids))})",
+        (float(now), *(int(j) for j in job_ids)),
+    )
+    _commit(conn)
+
+
+def requeue_stale_jobs(conn: sqlite3.Connection, *, now: float, lease_s: float) -> List[int]:
+    """
+    running -> queued if the lease expired (the process running it died; jobs from before
+    the lease column have none). Returns the ids of all queued jobs.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+        (float(now) - float(lease_s),),
+    )
+    _commit(conn)
+    cur.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at")
+    return [int(r[0]) for r in cur.fetchall()]
+
+
+def get_job(conn: sqlite3.Connection, job_id: int) -> Optional[Dict[str, Any]]:
+    cur = conn.cursor()
+    cur.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (int(job_id),))
+    row = cur.fetchone()
+    return _job_row(row) if row else None
+
+
+def get_job_by_key(conn: sqlite3.Connection, idem_key: str) -> Optional[Dict[str, Any]]:
+    cur = conn.cursor()
+    cur.execute(_SQL_JOB_BY_KEY, (str(idem_key),))
+    row = cur.fetchone()
+    return _job_row(row) if row else None
+
+
+def count_jobs(conn: sqlite3.Connection, *, key_prefix: str, status: str) -> int:
+    """Jobs whose idem_key starts with key_prefix (range scan on the unique index)."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COUNT(1) FROM jobs WHERE idem_key >= ? AND idem_key < ? AND status = ?",
+        (key_prefix, key_prefix + "\uffff", str(status)),
+    )
+    return int(cur.fetchone()[0] or 0)
+
+
+def list_recent_jobs(conn: sqlite3.Connection, *, limit: int = 20) -> List[Dict[str, Any]]:
+    cur = conn.cursor()
+    cur.execute(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY id DESC LIMIT ?", (int(limit),))
+    return [_job_row(r) for r in cur.fetchall()]
+
+
+# -----------------------
+# LLM call telemetry
+# -----------------------
+_SQL_LLM_CALLS_SINCE = """
+    SELECT round, call_site, model, prompt_tokens, completion_tokens, latency_ms, ttft_ms, cached, repair, error
+    FROM llm_calls
+    WHERE ts >= ?
+    ORDER BY ts
+"""
+
+
+def insert_llm_call(
+    conn: sqlite3.Connection,
+    *,
+    round_no: Optional[int],
+    call_site: str,
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    tokens_estimated: bool,
+    latency_ms: float,
+    ttft_ms: Optional[float],
+    streamed: bool,
+    cached: bool,
+    error: str,
+    now: float,
+) -> int:
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO llm_calls (ts, round, call_site, model, prompt_tokens, completion_tokens, tokens_estimated,
+                               latency_ms, ttft_ms, streamed, cached, error)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        float(now),
+        int(round_no) if round_no is not None else None,
+        str(call_site),
+        str(model),
+        int(prompt_tokens),
+        int(completion_tokens),
+        1 if tokens_estimated else 0,
+        float(latency_ms),
+        float(ttft_ms) if ttft_ms is not None else None,
+        1 if streamed else 0,
+        1 if cached else 0,
+        str(error),
+    ))
+    _commit(conn)
+    return int(cur.lastrowid)
+
+
+def set_llm_call_repair(conn: sqlite3.Connection, call_id: int, repair: str) -> None:
+    cur = conn.cursor()
+    cur.execute("UPDATE llm_calls SET repair = ? WHERE id = ?", (str(repair), int(call_id)))
+    _commit(conn)
+
+
+def get_llm_calls(conn: sqlite3.Connection, *, since: float = 0.0) -> List[Dict[str, Any]]:
+    """Calls with ts >= since (unix time), oldest first."""
+    cur = conn.cursor()
+    cur.execute(_SQL_LLM_CALLS_SINCE, (float(since),))
+    return [
+        {
+            "round": int(r) if r is not None else None,
+            "call_site": str(site),
+            "model": str(model),
+            "prompt_tokens": int(pt),
+            "completion_tokens": int(ct),
+            "latency_ms": float(lat),
+            "ttft_ms": float(ttft) if ttft is not None else None,
+            "cached": bool(cached),
+            "repair": str(repair or ""),
+            "error": str(error or ""),
+        }
+        for r, site, model, pt, ct, lat, ttft, cached, repair, error in cur.fetchall()
+    ]
+
+
+_SQL_LLM_CALL_LATENCIES = """
+    SELECT latency_ms
+    FROM llm_calls
+    WHERE call_site = ? AND model = ? AND ts >= ? AND cached = 0 AND error = ''
+    ORDER BY ts DESC
+    LIMIT ?
+"""
+
+
+def get_llm_call_latencies(conn: sqlite3.Connection, *, call_site: str, model: str, since: float, limit: int) -> List[float]:
+    """Latencies (ms) of the last `limit` successful uncached calls since `since`, newest first."""
+    cur = conn.cursor()
+    cur.execute(_SQL_LLM_CALL_LATENCIES, (str(call_site), str(model), float(since), int(limit)))
+    return [float(r[0]) for r in cur.fetchall()]
+
+
+def clear_llm_calls(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.execute("DELETE FROM llm_calls")
+    _commit(conn)
+
+
+# -----------------------
+# LLM response cache
+# -----------------------
+_SQL_LLM_CACHE_GET = """
+    SELECT response, created_at
+    FROM llm_cache
+    WHERE key = ?
+"""
+
+
+def llm_cache_get(conn: sqlite3.Connection, key: str, *, ttl_s: float, now: float) -> Optional[str]:
+    """Cached response for `key` (None if missing or older than ttl_s). Bumps hit stats."""
+    cur = conn.cursor()
+    cur.execute(_SQL_LLM_CACHE_GET, (key,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    response, created_at = row
+    if now - float(created_at) > float(ttl_s):
+        return None
+    cur.execute("UPDATE llm_cache SET hits = hits + 1, last_used_at = ? WHERE key = ?", (float(now), key))
+    _commit(conn)
+    return str(response)
+
+
+def llm_cache_put(conn: sqlite3.Connection, *, key: str, call_site: str, model: str, response: str, now: float) -> None:
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO llm_cache (key, call_site, model, response, size_bytes, created_at, last_used_at, hits)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+        ON CONFLICT(key) DO UPDATE SET
+            response = excluded.response,
+            size_bytes = excluded.size_bytes,
+            created_at = excluded.created_at,
+            last_used_at = excluded.last_used_at
+    """, (key, str(call_site), str(model), response, len(response.encode("utf-8")), float(now), float(now)))
+    _commit(conn)
+
+
+def llm_cache_evict(conn: sqlite3.Connection, *, ttl_s: float, max_bytes: int, max_entries: int, now: float) -> int:
+    """Drops expired entries, then least recently used ones beyond max_bytes / max_entries. Returns rows deleted."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM llm_cache WHERE created_at < ?", (float(now) - float(ttl_s),))
+    deleted = cur.rowcount
+    cur.execute("""
+        DELETE FROM llm_cache
+        WHERE key IN (
+            SELECT key FROM (
+                SELECT key,
+                       SUM(size_bytes) OVER (ORDER BY last_used_at DESC, key) AS running_bytes,
+                       ROW_NUMBER() OVER (ORDER BY last_used_at DESC, key) AS rn
+                FROM llm_cache
+            )
+            WHERE running_bytes > ? OR rn > ?
+        )
+    """, (int(max_bytes), int(max_entries)))
+    deleted += cur.rowcount
+    _commit(conn)
+    return int(deleted)
+
+
+def llm_cache_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """returns: {"entries", "bytes", "hits", "by_call_site": {site: entries}}"""
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hits), 0) FROM llm_cache")
+    entries, size, hits = cur.fetchone()
+    cur.execute("SELECT call_site, COUNT(*) FROM llm_cache GROUP BY call_site ORDER BY call_site")
+    return {
+        "entries": int(entries),
+        "bytes": int(size),
+        "hits": int(hits),
+        "by_call_site": {str(site): int(n) for site, n in cur.fetchall()},
+    }
+
+
+def clear_llm_cache(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.execute("DELETE FROM llm_cache")
+    _commit(conn)
 
 
 # -----------------------
@@ -865,7 +1772,7 @@ def clear_all_round_summaries(conn: sqlite3.Connection) -> None:
 def clear_external_events(conn: sqlite3.Connection, round_no: int) -> None:
     cur = conn.cursor()
     cur.execute("DELETE FROM external_events WHERE round = ?", (int(round_no),))
-    conn.commit()
+    _commit(conn)
 
 
 def upsert_external_event(
@@ -895,17 +1802,20 @@ def upsert_external_event(
         str(quote),
         int(craziness),
     ))
-    conn.commit()
+    _commit(conn)
+
+
+_SQL_EXTERNAL_EVENTS = """
+    SELECT actor, headline, modifiers_json, quote, craziness
+    FROM external_events
+    WHERE round = ?
+    ORDER BY actor ASC
+"""
 
 
 def get_external_events(conn: sqlite3.Connection, round_no: int) -> List[Dict[str, Any]]:
     cur = conn.cursor()
-    cur.execute("""
-        SELECT actor, headline, modifiers_json, quote, craziness
-        FROM external_events
-        WHERE round = ?
-        ORDER BY actor ASC
-    """, (int(round_no),))
+    cur.execute(_SQL_EXTERNAL_EVENTS, (int(round_no),))
     out: List[Dict[str, Any]] = []
     for actor, headline, mj, quote, craziness in cur.fetchall():
         try:
@@ -928,7 +1838,7 @@ def get_external_events(conn: sqlite3.Connection, round_no: int) -> List[Dict[st
 def clear_domestic_events(conn: sqlite3.Connection, round_no: int) -> None:
     cur = conn.cursor()
     cur.execute("DELETE FROM domestic_events WHERE round = ?", (int(round_no),))
-    conn.commit()
+    _commit(conn)
 
 
 def upsert_domestic_event(
@@ -950,17 +1860,20 @@ def upsert_domestic_event(
             craziness = excluded.craziness,
             created_at = strftime('%s','now')
     """, (int(round_no), str(country), str(headline), str(details), int(craziness)))
-    conn.commit()
+    _commit(conn)
+
+
+_SQL_DOMESTIC_EVENTS = """
+    SELECT country, headline, details, craziness, created_at
+    FROM domestic_events
+    WHERE round = ?
+    ORDER BY country ASC
+"""
 
 
 def get_domestic_events(conn: sqlite3.Connection, round_no: int) -> List[Dict[str, Any]]:
     cur = conn.cursor()
-    cur.execute("""
-        SELECT country, headline, details, craziness, created_at
-        FROM domestic_events
-        WHERE round = ?
-        ORDER BY country ASC
-    """, (int(round_no),))
+    cur.execute(_SQL_DOMESTIC_EVENTS, (int(round_no),))
     out: List[Dict[str, Any]] = []
     for country, headline, details, craziness, created_at in cur.fetchall():
         out.append({
@@ -1013,7 +1926,7 @@ def create_user(conn: sqlite3.Connection, *, username: str, password: str, role:
           role=excluded.role,
           country=excluded.country
     """, (username, pw_hash, role, country))
-    conn.commit()
+    _commit(conn)
 
 
 def verify_user(conn: sqlite3.Connection, *, username: str, password: str) -> dict | None:
@@ -1049,12 +1962,15 @@ def list_users(conn: sqlite3.Connection) -> list[dict]:
 def delete_user(conn: sqlite3.Connection, username: str) -> None:
     cur = conn.cursor()
     cur.execute("DELETE FROM users WHERE username=?", (username.strip(),))
-    conn.commit()
+    _commit(conn)
+
+
+_SQL_MAX_SNAPSHOT_ROUND = "SELECT MAX(round) FROM country_snapshots"
 
 
 def get_max_snapshot_round(conn: sqlite3.Connection) -> Optional[int]:
     cur = conn.cursor()
-    cur.execute("SELECT MAX(round) FROM country_snapshots")
+    cur.execute(_SQL_MAX_SNAPSHOT_ROUND)
     r = cur.fetchone()[0]
     return int(r) if r is not None else None
 
@@ -1062,7 +1978,7 @@ def get_max_snapshot_round(conn: sqlite3.Connection) -> Optional[int]:
 def clear_country_snapshots(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
     cur.execute("DELETE FROM country_snapshots")
-    conn.commit()
+    _commit(conn)
 
 
 def clear_all_events_and_history(conn: sqlite3.Connection) -> None:
@@ -1074,4 +1990,56 @@ def clear_all_events_and_history(conn: sqlite3.Connection) -> None:
     cur.execute("DELETE FROM round_locks")
     cur.execute("DELETE FROM policy_candidates")
     cur.execute("DELETE FROM policy_locks")
-    conn.commit()
+    cur.execute("DELETE FROM round_resolution_steps")
+    cur.execute("UPDATE game_meta SET speculative_calls = 0 WHERE id = 1")
+    cur.execute("DELETE FROM jobs WHERE status IN ('done', 'failed')")  # idem keys are per round
+    _commit(conn)
+
+
+# -----------------------
+# Query plan check (hot read paths must not fall back to full table/index scans)
+# -----------------------
+# name -> (sql, sample params, tables allowed to be scanned)
+HOT_QUERIES: Dict[str, Tuple[str, Tuple, Tuple[str, ...]]] = {
+    "load_recent_history": (_SQL_RECENT_HISTORY, ("Germany", 12), ()),
+    "get_round_turn_history": (_SQL_ROUND_TURN_HISTORY, (1,), ()),
+    # every round on purpose: covering-index scans (rounds only), no table reads
+    "get_history_rounds": (_SQL_HISTORY_ROUNDS, (), ("turn_history", "external_events", "domestic_events")),
+    # whole campaign on purpose (dashboard): primary-key order, no sort
+    "get_country_snapshots": (_SQL_COUNTRY_SNAPSHOTS, (), ("country_snapshots",)),
+    "get_country_snapshots_recent": (_SQL_COUNTRY_SNAPSHOTS_RECENT, (50,), ()),
+    "get_max_snapshot_round": (_SQL_MAX_SNAPSHOT_ROUND, (), ()),
+    # INTEGER PRIMARY KEY: rowid order + LIMIT reads only `limit` rows
+    "get_recent_round_summaries": (_SQL_RECENT_ROUND_SUMMARIES, (3,), ("round_summaries",)),
+    "get_external_events": (_SQL_EXTERNAL_EVENTS, (1,), ()),
+    "get_domestic_events": (_SQL_DOMESTIC_EVENTS, (1,), ()),
+    "get_policy_candidates": (_SQL_POLICY_CANDIDATES, (1, "Germany", "foreign"), ()),
+    "get_policy_locks": (_SQL_POLICY_LOCKS, (1,), ()),
+    "llm_cache_get": (_SQL_LLM_CACHE_GET, ("0" * 64,), ()),
+    "get_job_by_key": (_SQL_JOB_BY_KEY, ("round_resolution:1",), ()),
+    "get_llm_calls": (_SQL_LLM_CALLS_SINCE, (0.0,), ()),
+    "get_llm_call_latencies": (_SQL_LLM_CALL_LATENCIES, ("resolve", "mistral-small", 0.0, 50), ()),
+}
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, params: Tuple = ()) -> List[str]:
+    cur = conn.cursor()
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    return [str(r[3]) for r in cur.fetchall()]
+
+
+def find_full_scans(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """
+    Returns {query_name: [offending plan lines]} for HOT_QUERIES that scan a whole table
+    or index (SCAN, with or without USING INDEX) outside their allowed tables. Empty dict == all good.
+    """
+    bad: Dict[str, List[str]] = {}
+    for name, (sql, params, allowed) in HOT_QUERIES.items():
+        for line in explain_query_plan(conn, sql, params):
+            if not line.startswith("SCAN "):
+                continue
+            table = line.split()[1]
+            if table in allowed:
+                continue
+            bad.setdefault(name, []).append(line)
+    return bad
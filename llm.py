@@ -0,0 +1,646 @@
+# llm.py
+"""
+Shared LLM gateway for all call sites (ai.py, ai_external.py, ai_round.py, ui/panels.py).
+
+- pluggable backend (llm_backends.py): Mistral on a pooled keep-alive client by default,
+  record/replay fixtures or synthetic JSON for offline benchmarks
+- per-call timeouts (per call site, overridable per call)
+- one shared JSON repair path: local deterministic repair first, LLM repair only if
+  that fails (counters per call site and path)
+- optional response cache per call site (llm_cache.py)
+- streaming variant (chat_stream) with progressive callback, early abort on schema
+  violations and time-to-first-token
+- latency per call site (TTFT + total) for the GM performance panel
+- provider-native structured output (STRUCTURED_OUTPUT=json_schema|json_object|off) with
+  the schemas from llm_schemas.py; a model that rejects a format falls back to the next
+  weaker one (json_schema -> json_object -> plain text) for the rest of the process
+- process-wide rate limit with a fair per-lane queue and single-flight coalescing of
+  identical in-flight requests (llm_limits.py)
+- resilience policy per call site (llm_resilience.py): deadline, retries with backoff
+  and jitter on transient errors, hedged second request after the call site's p95
+- one telemetry row per call (llm_telemetry.py): tokens, latency, TTFT, repair, error
+- the LLM repair round-trip is routed like any call site (llm_routing.route("repair"))
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Optional, Tuple, Callable, Union
+from collections import deque
+import os
+import threading
+import time
+
+from utils import parse_json_maybe, repair_json_locally, JSONStreamProbe
+from llm_cache import cache_enabled, cache_key, cache_lookup, cache_store
+from llm_backends import DEFAULT_TIMEOUT_S, get_backend, sampling_params
+from llm_limits import SINGLE_FLIGHT, acquire, current_lane
+from llm_telemetry import last_call_id, mark_repair, record_call
+from llm_routing import route
+from llm_prompt import PromptParts
+from llm_resilience import (
+    attempt_timeout,
+    count as count_resilience,
+    deadline_for,
+    is_transient,
+    policy_for,
+    retry_delay,
+    run_with_policy,
+)
+
+CALL_SITE_TIMEOUTS_S: Dict[str, float] = {
+    "external_moves": 60.0,
+    "domestic_events": 60.0,
+    "domestic_events_fill": 45.0,
+    "resolve": 90.0,
+    "resolve_fill": 60.0,
+    "summary": 30.0,
+    "policy_candidate": 45.0,
+    "policy_batch": 75.0,
+    "actions": 60.0,
+    "repair": 30.0,
+}
+
+JSON_SYSTEM_PROMPT = "Antworte ausschließlich mit gültigem JSON. Kein Markdown."
+REPAIR_SYSTEM_PROMPT = "Du gibst ausschließlich gültiges JSON zurück. Kein Markdown."
+
+LATENCY_WINDOW = 200  # recent calls kept per call site
+HEDGE_MIN_SAMPLES = 20  # p95 is not trusted (no hedging) below this many uncached calls
+
+_LATENCIES: Dict[str, deque] = {}
+_LATENCY_LOCK = threading.Lock()
+
+
+STRUCTURED_MODES = ("off", "json_object", "json_schema")
+STRUCTURED_PATHS = ("json_schema", "json_object", "text", "fallback")
+_STRUCTURED_COUNTS: Dict[str, Dict[str, int]] = {}
+_UNSUPPORTED_FORMATS: set = set()  # (model, format type) rejected by the provider
+_STRUCTURED_LOCK = threading.Lock()
+
+
+REPAIR_PATHS = ("clean", "local", "llm", "failed")
+_REPAIR_COUNTS: Dict[str, Dict[str, int]] = {}
+_REPAIR_LOCK = threading.Lock()
+
+
+def _count_repair(call_site: str, path: str) -> None:
+    with _REPAIR_LOCK:
+        c = _REPAIR_COUNTS.setdefault(call_site, {p: 0 for p in REPAIR_PATHS})
+        c[path] += 1
+
+
+def repair_stats() -> Dict[str, Dict[str, int]]:
+    """{call_site: {"clean", "local", "llm", "failed"}}; "local" == LLM round-trips saved."""
+    with _REPAIR_LOCK:
+        return {site: dict(c) for site, c in sorted(_REPAIR_COUNTS.items())}
+
+
+PARTIAL_PATHS = ("complete", "filled", "fallback", "keys_missing", "keys_filled")
+_PARTIAL_COUNTS: Dict[str, Dict[str, int]] = {}
+_PARTIAL_LOCK = threading.Lock()
+
+
+def count_partial(call_site: str, path: str, n: int = 1) -> None:
+    """Multi-entity answers (one entry per country): did every key come back?"""
+    with _PARTIAL_LOCK:
+        c = _PARTIAL_COUNTS.setdefault(call_site, {p: 0 for p in PARTIAL_PATHS})
+        c[path] += n
+
+
+def partial_stats() -> Dict[str, Dict[str, int]]:
+    """
+    {call_site: {"complete", "filled", "fallback", "keys_missing", "keys_filled"}}
+    filled: missing keys were requested in a follow-up call (call site "<site>_fill")
+    instead of redoing the whole call; fallback: the follow-up did not help either.
+    """
+    with _PARTIAL_LOCK:
+        return {site: dict(c) for site, c in sorted(_PARTIAL_COUNTS.items())}
+
+
+def streaming_enabled() -> bool:
+    """LLM_STREAMING=0 turns every chat_stream() into a plain chat()."""
+    return (os.getenv("LLM_STREAMING") or "1").strip() != "0"
+
+
+def _record_latency(call_site: str, *, total_s: float, ttft_s: Optional[float], streamed: bool, cached: bool) -> None:
+    with _LATENCY_LOCK:
+        q = _LATENCIES.setdefault(call_site, deque(maxlen=LATENCY_WINDOW))
+        q.append({"total_s": total_s, "ttft_s": ttft_s, "streamed": streamed, "cached": cached, "ts": time.time()})
+
+
+def latency_stats() -> Dict[str, Dict[str, Any]]:
+    """{call_site: {"n", "avg_total_s", "last_total_s", "avg_ttft_s", "last_ttft_s"}} over uncached calls."""
+    out: Dict[str, Dict[str, Any]] = {}
+    with _LATENCY_LOCK:
+        items = {site: list(q) for site, q in _LATENCIES.items()}
+    for site, rows in sorted(items.items()):
+        live = [r for r in rows if not r["cached"]]
+        if not live:
+            continue
+        ttfts = [r["ttft_s"] for r in live if r["ttft_s"] is not None]
+        out[site] = {
+            "n": len(live),
+            "avg_total_s": sum(r["total_s"] for r in live) / len(live),
+            "last_total_s": live[-1]["total_s"],
+            "avg_ttft_s": (sum(ttfts) / len(ttfts)) if ttfts else None,
+            "last_ttft_s": live[-1]["ttft_s"],
+        }
+    return out
+
+
+def latency_p95(call_site: str, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+    """p95 of the total latency over recent uncached calls, None with fewer than min_samples."""
+    with _LATENCY_LOCK:
+        xs = sorted(r["total_s"] for r in _LATENCIES.get(call_site, ()) if not r["cached"])
+    if len(xs) < max(1, min_samples):
+        return None
+    return xs[min(len(xs) - 1, int(round(0.95 * (len(xs) - 1))))]
+
+
+def structured_mode() -> str:
+    """STRUCTURED_OUTPUT=json_schema (default) | json_object | off."""
+    mode = (os.getenv("STRUCTURED_OUTPUT") or "json_schema").strip().lower()
+    return mode if mode in STRUCTURED_MODES else "json_schema"
+
+
+def _format_type(response_format: Optional[Dict[str, Any]]) -> str:
+    return response_format["type"] if response_format is not None else "text"
+
+
+def structured_formats(model: str, call_site: str, schema: Optional[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    response_format values to try in order, ending with None (plain text). Without a
+    schema the call site did not ask for JSON, so only the text path is used.
+    """
+    formats: List[Optional[Dict[str, Any]]] = []
+    mode = structured_mode()
+    if schema is not None and mode != "off":
+        if mode == "json_schema":
+            formats.append({
+                "type": "json_schema",
+                "json_schema": {"name": call_site, "schema": schema, "strict": True},
+            })
+        formats.append({"type": "json_object"})
+    with _STRUCTURED_LOCK:
+        formats = [f for f in formats if (model, _format_type(f)) not in _UNSUPPORTED_FORMATS]
+    return formats + [None]
+
+
+def _is_format_rejection(exc: Exception) -> bool:
+    """Provider refused the request itself (bad request / validation), not a timeout or 5xx."""
+    status = getattr(exc, "status_code", None)
+    return status in (400, 422) or type(exc).__name__ == "HTTPValidationError"
+
+
+def _reject_format(model: str, call_site: str, response_format: Optional[Dict[str, Any]]) -> None:
+    with _STRUCTURED_LOCK:
+        _UNSUPPORTED_FORMATS.add((model, _format_type(response_format)))
+        c = _STRUCTURED_COUNTS.setdefault(call_site, {p: 0 for p in STRUCTURED_PATHS})
+        c["fallback"] += 1
+
+
+def _count_structured(call_site: str, response_format: Optional[Dict[str, Any]]) -> None:
+    with _STRUCTURED_LOCK:
+        c = _STRUCTURED_COUNTS.setdefault(call_site, {p: 0 for p in STRUCTURED_PATHS})
+        c[_format_type(response_format)] += 1
+
+
+def structured_stats() -> Dict[str, Any]:
+    """{"mode", "unsupported": ["model:type"], "sites": {call_site: {"json_schema", "json_object", "text", "fallback"}}}"""
+    with _STRUCTURED_LOCK:
+        return {
+            "mode": structured_mode(),
+            "unsupported": sorted(f"{m}:{t}" for m, t in _UNSUPPORTED_FORMATS),
+            "sites": {site: dict(c) for site, c in sorted(_STRUCTURED_COUNTS.items())},
+        }
+
+
+def _record_call(
+    call_site: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    text: str,
+    t0: float,
+    *,
+    error: BaseException,
+    streamed: bool = False,
+) -> None:
+    """Telemetry row for a failed call."""
+    record_call(call_site=call_site, model=model, messages=messages, text=text, latency_s=time.perf_counter() - t0,
+                ttft_s=None, streamed=streamed, cached=False, error=f"{type(error).__name__}: {error}"[:500])
+
+
+def _timeout_for(call_site: str, timeout_s: Optional[float]) -> float:
+    if timeout_s is not None:
+        return float(timeout_s)
+    return float(CALL_SITE_TIMEOUTS_S.get(call_site, DEFAULT_TIMEOUT_S))
+
+
+def json_messages(prompt: Union[str, PromptParts]) -> List[Dict[str, str]]:
+    """
+    Standard message pair used by all JSON call sites. For PromptParts the static prefix
+    goes into the system message (a stable, cacheable prefix) and only the body varies.
+    """
+    if isinstance(prompt, PromptParts):
+        return [
+            {"role": "system", "content": f"{JSON_SYSTEM_PROMPT}\n\n{prompt.prefix}"},
+            {"role": "user", "content": prompt.body},
+        ]
+    return [
+        {"role": "system", "content": JSON_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def chat(
+    *,
+    api_key: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    call_site: str = "generic",
+    timeout_s: Optional[float] = None,
+    cache: Optional[bool] = None,
+    schema: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    cache: None = call-site default (see llm_cache.CACHE_CALL_SITES), True/False = per call.
+    schema: JSON Schema of the expected answer (llm_schemas.py) -> provider-native structured output.
+    """
+    t0 = time.perf_counter()
+    formats = structured_formats(model, call_site, schema)
+    key = cache_key(model, messages, sampling_params(temperature, top_p, max_tokens, formats[0]))
+    use_cache = cache_enabled(call_site, cache)
+    hit = cache_lookup(key, call_site=call_site) if use_cache else None
+    if hit is None:
+        leader, flight = SINGLE_FLIGHT.join(key)
+        if not leader:
+            try:
+                hit = SINGLE_FLIGHT.wait(flight)  # identical request already in flight
+            except Exception as e:
+                _record_call(call_site, model, messages, "", t0, error=e)
+                raise
+    if hit is not None:
+        total_s = time.perf_counter() - t0
+        _record_latency(call_site, total_s=total_s, ttft_s=None, streamed=False, cached=True)
+        record_call(call_site=call_site, model=model, messages=messages, text=hit, latency_s=total_s,
+                    ttft_s=None, streamed=False, cached=True)
+        return hit
+
+    try:
+        text = _complete(
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site=call_site,
+            timeout_s=timeout_s,
+            formats=formats,
+        )
+    except BaseException as e:
+        SINGLE_FLIGHT.finish(key, flight, error=e)
+        _record_call(call_site, model, messages, "", t0, error=e)
+        raise
+    SINGLE_FLIGHT.finish(key, flight, result=text)
+    total_s = time.perf_counter() - t0
+    _record_latency(call_site, total_s=total_s, ttft_s=None, streamed=False, cached=False)
+    record_call(call_site=call_site, model=model, messages=messages, text=text, latency_s=total_s,
+                ttft_s=None, streamed=False, cached=False)
+    if use_cache:
+        cache_store(key, call_site=call_site, model=model, response=text)
+    return text
+
+
+def _is_json(text: str) -> bool:
+    """Hedging validator: an unparsable answer counts as invalid instead of raising."""
+    try:
+        return parse_json_maybe(text) is not None
+    except ValueError:  # json.JSONDecodeError is a ValueError
+        return False
+
+
+def _complete(
+    *,
+    api_key: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    call_site: str,
+    timeout_s: Optional[float],
+    formats: List[Optional[Dict[str, Any]]],
+) -> str:
+    """
+    Rate-limited backend call under the call site's resilience policy, walking down the
+    structured-output formats on rejection.
+    """
+    backend = get_backend()
+    lane = current_lane(call_site)  # captured here: hedged attempts run in their own thread
+    deadline = deadline_for(call_site)
+    hedge_after_s = latency_p95(call_site)
+    for response_format in formats:
+        def _attempt(attempt_timeout_s: float, response_format=response_format) -> str:
+            acquire(lane=lane, messages=messages, max_tokens=max_tokens)
+            return backend.complete(
+                api_key=api_key,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                top_p=top_p,
+                max_tokens=max_tokens,
+                call_site=call_site,
+                timeout_s=attempt_timeout_s,
+                response_format=response_format,
+            )
+
+        try:
+            text = run_with_policy(
+                call_site,
+                _attempt,
+                timeout_s=_timeout_for(call_site, timeout_s),
+                deadline=deadline,
+                hedge_after_s=hedge_after_s,
+                valid=_is_json if response_format is not None else None,
+            )
+        except Exception as e:
+            if response_format is None or not _is_format_rejection(e):
+                raise
+            _reject_format(model, call_site, response_format)
+            continue
+        _count_structured(call_site, response_format)
+        return text
+    raise AssertionError("unreachable: the plain-text format is always tried last")
+
+
+def chat_stream(
+    *,
+    api_key: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    call_site: str = "generic",
+    timeout_s: Optional[float] = None,
+    cache: Optional[bool] = None,
+    on_text: Optional[Callable[[str, JSONStreamProbe], None]] = None,
+    expected_keys: Optional[Dict[str, str]] = None,
+    schema: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Like chat(), but consumes the backend stream:
+    - on_text(text_so_far, probe) after every delta (progressive rendering)
+    - expected_keys (see utils.JSONStreamProbe): the stream is closed and ValueError raised
+      as soon as the answer can no longer match the schema
+    - TTFT is recorded next to the total latency
+    - a structured-output rejection is only retried before the first delta arrived
+    Returns the full text (same contract as chat()).
+    """
+    if not streaming_enabled():
+        text = chat(
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site=call_site,
+            timeout_s=timeout_s,
+            cache=cache,
+            schema=schema,
+        )
+        if on_text is not None:
+            probe = JSONStreamProbe(expected_keys or {})
+            if expected_keys:
+                probe.feed(text)
+            on_text(text, probe)
+        return text
+
+    t0 = time.perf_counter()
+    probe = JSONStreamProbe(expected_keys or {})
+    formats = structured_formats(model, call_site, schema)
+    key = cache_key(model, messages, sampling_params(temperature, top_p, max_tokens, formats[0]))
+    use_cache = cache_enabled(call_site, cache)
+    hit = cache_lookup(key, call_site=call_site) if use_cache else None
+    if hit is None:
+        leader, flight = SINGLE_FLIGHT.join(key)
+        if not leader:
+            try:
+                hit = SINGLE_FLIGHT.wait(flight)  # identical request already in flight
+            except Exception as e:
+                _record_call(call_site, model, messages, "", t0, error=e, streamed=True)
+                raise
+    if hit is not None:
+        total_s = time.perf_counter() - t0
+        _record_latency(call_site, total_s=total_s, ttft_s=None, streamed=True, cached=True)
+        record_call(call_site=call_site, model=model, messages=messages, text=hit, latency_s=total_s,
+                    ttft_s=None, streamed=True, cached=True)
+        if on_text is not None:
+            if expected_keys:
+                probe.feed(hit)
+            on_text(hit, probe)
+        return hit
+
+    try:
+        text, ttft_s = _stream(
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site=call_site,
+            timeout_s=timeout_s,
+            formats=formats,
+            probe=probe if expected_keys else None,
+            on_text=on_text,
+            t0=t0,
+        )
+    except BaseException as e:
+        SINGLE_FLIGHT.finish(key, flight, error=e)
+        _record_call(call_site, model, messages, "", t0, error=e, streamed=True)
+        raise
+    SINGLE_FLIGHT.finish(key, flight, result=text)
+    total_s = time.perf_counter() - t0
+    _record_latency(call_site, total_s=total_s, ttft_s=ttft_s, streamed=True, cached=False)
+    record_call(call_site=call_site, model=model, messages=messages, text=text, latency_s=total_s,
+                ttft_s=ttft_s, streamed=True, cached=False)
+    if use_cache:
+        cache_store(key, call_site=call_site, model=model, response=text)
+    return text
+
+
+def _stream(
+    *,
+    api_key: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    call_site: str,
+    timeout_s: Optional[float],
+    formats: List[Optional[Dict[str, Any]]],
+    probe: Optional[JSONStreamProbe],
+    on_text: Optional[Callable[[str, JSONStreamProbe], None]],
+    t0: float,
+) -> Tuple[str, Optional[float]]:
+    """
+    Rate-limited streaming call. Format fallbacks and retries of transient errors (within
+    the call site's deadline) only happen before the first delta; no hedging.
+    """
+    ttft_s: Optional[float] = None
+    text = ""
+    backend = get_backend()
+    lane = current_lane(call_site)
+    policy = policy_for(call_site)
+    deadline = deadline_for(call_site)
+    formats = list(formats)
+    attempt_no = 0
+    count_resilience(call_site, "calls")
+    while formats:
+        response_format = formats[0]
+        attempt_no += 1
+        try:
+            attempt_timeout_s = attempt_timeout(_timeout_for(call_site, timeout_s), deadline)
+        except TimeoutError:
+            count_resilience(call_site, "deadline")
+            raise
+        acquire(lane=lane, messages=messages, max_tokens=max_tokens)
+        deltas = backend.stream(
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site=call_site,
+            timeout_s=attempt_timeout_s,
+            response_format=response_format,
+        )
+        try:
+            for delta in deltas:
+                if ttft_s is None:
+                    ttft_s = time.perf_counter() - t0
+                text += delta
+                if probe is not None:
+                    probe.feed(delta)  # raises on schema violation -> stream closed below
+                if on_text is not None:
+                    on_text(text, probe)
+        except Exception as e:
+            if ttft_s is not None:
+                raise
+            if response_format is not None and _is_format_rejection(e):
+                _reject_format(model, call_site, response_format)
+                formats.pop(0)
+                continue
+            delay = retry_delay(policy, attempt_no, deadline) if is_transient(e) else None
+            if delay is None:
+                if is_transient(e):
+                    count_resilience(call_site, "failed")
+                raise
+            count_resilience(call_site, "retries")
+            time.sleep(delay)
+            continue
+        finally:
+            close = getattr(deltas, "close", None)
+            if close is not None:
+                close()
+        _count_structured(call_site, response_format)
+        return text, ttft_s
+    raise AssertionError("unreachable: the plain-text format is always tried last")
+
+
+def repair_to_valid_json(
+    *,
+    api_key: str,
+    model: str,
+    bad_text: str,
+    schema_hint: str,
+    max_tokens: Optional[int] = None,
+    schema: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    LLM round-trip that turns bad_text into valid JSON. Model, temperature and the default
+    max_tokens come from the "repair" route; `model` is the one that produced bad_text.
+    """
+    r = route("repair")
+    repair_prompt = f"""
+Du bist ein Validator/Formatter. Wandle die folgende Ausgabe in **gültiges JSON** um.
+
+Wichtig:
+- Gib **NUR** JSON zurück (keine Erklärungen, kein Markdown).
+- Nutze **nur** doppelte Anführungszeichen.
+- Keine trailing commas.
+- Schema MUSS exakt passen.
+
+Schema:
+{schema_hint}
+
+Hier ist die zu reparierende Ausgabe:
+{bad_text}
+""".strip()
+
+    fixed_raw = chat(
+        api_key=api_key,
+        model=r["model"],
+        messages=[
+            {"role": "system", "content": REPAIR_SYSTEM_PROMPT},
+            {"role": "user", "content": repair_prompt},
+        ],
+        temperature=r["temperature"],
+        top_p=1.0,
+        max_tokens=int(max_tokens if max_tokens is not None else r["max_tokens"]),
+        call_site="repair",
+        schema=schema,
+    )
+    return parse_json_maybe(fixed_raw)
+
+
+def parse_or_repair(
+    *,
+    api_key: str,
+    model: str,
+    raw: str,
+    schema_hint: str,
+    repair_max_tokens: Optional[int] = None,
+    call_site: str = "generic",
+    schema: Optional[Dict[str, Any]] = None,
+) -> Tuple[Any, bool]:
+    """
+    Parse model output as JSON: as-is -> local repair (utils.repair_json_locally) ->
+    LLM repair round-trip (with the call site's schema as structured output). Returns (obj, used_repair).
+    The telemetry row of the call that produced `raw` (the last one in this thread) gets the path.
+    """
+    call_id = last_call_id()
+    try:
+        obj = parse_json_maybe(raw)
+        _count_repair(call_site, "clean")
+        return obj, False
+    except Exception:
+        pass
+    try:
+        obj = repair_json_locally(raw)
+        _count_repair(call_site, "local")
+        mark_repair(call_id, "local")
+        return obj, True
+    except ValueError:
+        pass
+    try:
+        obj = repair_to_valid_json(
+            api_key=api_key,
+            model=model,
+            bad_text=raw,
+            schema_hint=schema_hint,
+            max_tokens=repair_max_tokens,
+            schema=schema,
+        )
+    except Exception:
+        _count_repair(call_site, "failed")
+        mark_repair(call_id, "failed")
+        raise
+    _count_repair(call_site, "llm")
+    mark_repair(call_id, "llm")
+    return obj, True
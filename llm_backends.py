@@ -0,0 +1,488 @@
+# llm_backends.py
+"""
+Backends behind llm.chat(). Selected once per process via LLM_BACKEND (or set_backend()):
+
+- mistral    (default) Mistral API on a pooled keep-alive httpx client
+- record     like mistral, but appends every request/response to the fixture store
+- replay     serves responses from the fixture store (JSONL), no network
+- synthetic  schema-valid fake JSON per call site with artificial latency, no network
+
+Fixture store (LLM_FIXTURES, default fixtures/llm_fixtures.jsonl), one line per call:
+  {"key", "call_site", "model", "params", "messages", "response", "latency_ms"}
+
+replay looks up the exact request (same key as llm_cache.cache_key). Without an exact
+match it cycles through the recorded responses of the same call site, unless
+LLM_REPLAY_STRICT=1. LLM_REPLAY_LATENCY=1 sleeps for the recorded latency.
+
+synthetic latency: LLM_SYNTHETIC_LATENCY_MS="800" or "resolve=2500,summary=600,*=800",
+plus LLM_SYNTHETIC_JITTER_MS (uniform +/-). Output is seeded from the request, so the
+same prompt gives the same answer.
+
+Token usage reported by the provider is kept per thread for the telemetry (take_usage());
+backends without usage (replay, synthetic) leave it empty and the caller estimates.
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+import ast
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from utils import content_to_text
+from llm_cache import cache_key
+
+# Keep-alive pool shared by all calls of the process
+HTTP_POOL_LIMITS = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 120.0,  # seconds
+}
+HTTP_CONNECT_TIMEOUT_S = 10.0
+DEFAULT_TIMEOUT_S = 60.0
+
+DEFAULT_FIXTURES_PATH = os.path.join("fixtures", "llm_fixtures.jsonl")
+
+_CLIENTS: Dict[str, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+_USAGE = threading.local()
+
+
+def get_client(api_key: str):
+    """Process-wide Mistral client for `api_key` (created on first use)."""
+    client = _CLIENTS.get(api_key)
+    if client is not None:
+        return client
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            import httpx
+            from mistralai import Mistral
+
+            http = httpx.Client(
+                limits=httpx.Limits(**HTTP_POOL_LIMITS),
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT_S, connect=HTTP_CONNECT_TIMEOUT_S),
+            )
+            client = Mistral(api_key=api_key, client=http)
+            _CLIENTS[api_key] = client
+    return client
+
+
+def _set_usage(usage: Any) -> None:
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        _USAGE.value = (int(usage.prompt_tokens or 0), int(usage.completion_tokens or 0))
+
+
+def take_usage() -> Optional[Tuple[int, int]]:
+    """(prompt_tokens, completion_tokens) of this thread's last provider call, then cleared."""
+    value = getattr(_USAGE, "value", None)
+    _USAGE.value = None
+    return value
+
+
+def put_usage(value: Optional[Tuple[int, int]]) -> None:
+    """Hand usage taken in another thread (hedged attempt) to this thread's telemetry."""
+    _USAGE.value = value
+
+
+def sampling_params(temperature: float, top_p: float, max_tokens: int, response_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Everything besides model/messages that changes the answer (cache/fixture key)."""
+    params: Dict[str, Any] = {"temperature": temperature, "top_p": top_p, "max_tokens": max_tokens}
+    if response_format is not None:
+        params["response_format"] = response_format
+    return params
+
+
+class LLMBackend:
+    """Interface: one chat completion -> raw text; stream() yields text deltas."""
+
+    name = "base"
+
+    def complete(
+        self,
+        *,
+        api_key: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        top_p: float,
+        max_tokens: int,
+        call_site: str,
+        timeout_s: float,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """response_format: provider-native JSON mode / schema (None = plain text)."""
+        raise NotImplementedError
+
+    def stream(self, **kwargs: Any) -> Iterator[str]:
+        """Default: no native streaming, the whole completion arrives as one delta."""
+        yield self.complete(**kwargs)
+
+
+def _format_kwargs(response_format: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"response_format": response_format} if response_format is not None else {}
+
+
+class MistralBackend(LLMBackend):
+    name = "mistral"
+
+    def complete(self, *, api_key, model, messages, temperature, top_p, max_tokens, call_site, timeout_s, response_format=None) -> str:
+        resp = get_client(api_key).chat.complete(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            timeout_ms=int(timeout_s * 1000),
+            **_format_kwargs(response_format),
+        )
+        _set_usage(getattr(resp, "usage", None))
+        return content_to_text(resp.choices[0].message.content)
+
+    def stream(self, *, api_key, model, messages, temperature, top_p, max_tokens, call_site, timeout_s, response_format=None) -> Iterator[str]:
+        with get_client(api_key).chat.stream(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            timeout_ms=int(timeout_s * 1000),
+            **_format_kwargs(response_format),
+        ) as events:
+            for event in events:
+                _set_usage(getattr(event.data, "usage", None))  # sent with the last chunk
+                choices = getattr(event.data, "choices", None) or []
+                if not choices:
+                    continue
+                delta = content_to_text(choices[0].delta.content)
+                if delta:
+                    yield delta
+
+
+class RecordingBackend(LLMBackend):
+    """Wraps another backend and appends every call to the fixture store."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, path: str = DEFAULT_FIXTURES_PATH):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _append(self, *, model, messages, temperature, top_p, max_tokens, response_format, call_site, text: str, latency_s: float) -> None:
+        params = sampling_params(temperature, top_p, max_tokens, response_format)
+        line = json.dumps({
+            "key": cache_key(model, messages, params),
+            "call_site": call_site,
+            "model": model,
+            "params": params,
+            "messages": messages,
+            "response": text,
+            "latency_ms": round(latency_s * 1000.0, 1),
+        }, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def complete(self, *, api_key, model, messages, temperature, top_p, max_tokens, call_site, timeout_s, response_format=None) -> str:
+        t0 = time.perf_counter()
+        text = self.inner.complete(
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site=call_site,
+            timeout_s=timeout_s,
+            response_format=response_format,
+        )
+        self._append(
+            model=model, messages=messages, temperature=temperature, top_p=top_p, max_tokens=max_tokens,
+            response_format=response_format, call_site=call_site, text=text, latency_s=time.perf_counter() - t0,
+        )
+        return text
+
+    def stream(self, *, api_key, model, messages, temperature, top_p, max_tokens, call_site, timeout_s, response_format=None) -> Iterator[str]:
+        t0 = time.perf_counter()
+        parts: List[str] = []
+        for delta in self.inner.stream(
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            call_site=call_site,
+            timeout_s=timeout_s,
+            response_format=response_format,
+        ):
+            parts.append(delta)
+            yield delta
+        # only complete streams are recorded (an aborted stream never reaches this line)
+        self._append(
+            model=model, messages=messages, temperature=temperature, top_p=top_p, max_tokens=max_tokens,
+            response_format=response_format, call_site=call_site, text="".join(parts), latency_s=time.perf_counter() - t0,
+        )
+
+
+class ReplayBackend(LLMBackend):
+    """Serves recorded responses from the fixture store."""
+
+    name = "replay"
+
+    def __init__(self, path: str = DEFAULT_FIXTURES_PATH, *, strict: bool = False, replay_latency: bool = False):
+        self.path = path
+        self.strict = strict
+        self.replay_latency = replay_latency
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_site: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"exact": 0, "by_call_site": 0, "miss": 0}
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                self._by_key[str(rec["key"])] = rec
+                self._by_site.setdefault(str(rec.get("call_site", "")), []).append(rec)
+
+    def complete(self, *, api_key, model, messages, temperature, top_p, max_tokens, call_site, timeout_s, response_format=None) -> str:
+        key = cache_key(model, messages, sampling_params(temperature, top_p, max_tokens, response_format))
+        with self._lock:
+            rec = self._by_key.get(key)
+            if rec is not None:
+                self.stats["exact"] += 1
+            elif not self.strict and self._by_site.get(call_site):
+                recs = self._by_site[call_site]
+                i = self._cursor.get(call_site, 0)
+                rec = recs[i % len(recs)]
+                self._cursor[call_site] = i + 1
+                self.stats["by_call_site"] += 1
+            else:
+                self.stats["miss"] += 1
+        if rec is None:
+            raise LookupError(f"Replay: keine Aufzeichnung für call_site={call_site!r} ({self.path}).")
+        if self.replay_latency:
+            time.sleep(float(rec.get("latency_ms", 0) or 0) / 1000.0)
+        return str(rec["response"])
+
+
+# -----------------------
+# Synthetic backend
+# -----------------------
+_EXTERNAL_ACTORS = ("USA", "Russia", "China")
+_LAND_KEYS = ("militär", "stabilität", "wirtschaft", "diplomatie", "öffentliche_zustimmung")
+_MOD_KEYS = (
+    "eu_cohesion_delta", "threat_delta", "frontline_delta", "energy_delta",
+    "migration_delta", "disinfo_delta", "trade_war_delta",
+)
+
+
+def parse_latency_spec(spec: str) -> Dict[str, float]:
+    """"800" -> {"*": 800}; "resolve=2500,*=800" -> {"resolve": 2500, "*": 800} (ms)"""
+    out: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        site, _, ms = part.rpartition("=")
+        out[site.strip() or "*"] = float(ms)
+    return out
+
+
+def _list_after(text: str, marker: str) -> List[str]:
+    """Parses the python list literal the prompts print after `marker`."""
+    idx = text.find(marker)
+    if idx < 0:
+        return []
+    m = re.search(r"\[[^\]]*\]", text[idx:])
+    if not m:
+        return []
+    try:
+        return [str(x) for x in ast.literal_eval(m.group(0))]
+    except (ValueError, SyntaxError):
+        return []
+
+
+def _int_after(text: str, pattern: str, default: int) -> int:
+    m = re.search(pattern, text)
+    return int(m.group(1)) if m else default
+
+
+class SyntheticBackend(LLMBackend):
+    """Schema-valid fake answers for every call site; no network, configurable latency."""
+
+    name = "synthetic"
+
+    STREAM_CHUNK_CHARS = 16
+    STREAM_TTFT_SHARE = 0.3
+
+    def __init__(self, latency_ms: Optional[Dict[str, float]] = None, jitter_ms: float = 0.0, seed: int = 0):
+        self.latency_ms = dict(latency_ms or {"*": 0.0})
+        self.jitter_ms = float(jitter_ms)
+        self.seed = int(seed)
+
+    def _rng(self, model: str, messages: List[Dict[str, str]]) -> random.Random:
+        h = hashlib.sha256(json.dumps([self.seed, model, messages], ensure_ascii=False).encode("utf-8")).hexdigest()
+        return random.Random(int(h[:16], 16))
+
+    def _latency_s(self, call_site: str, rng: random.Random) -> float:
+        base = self.latency_ms.get(call_site, self.latency_ms.get("*", 0.0))
+        ms = base + (rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        return max(0.0, ms) / 1000.0
+
+    def _answer(self, call_site: str, model: str, messages: List[Dict[str, str]]) -> Tuple[str, float]:
+        prompt = "\n\n".join(str(m.get("content", "")) for m in messages)  # static prefix + dynamic body
+        rng = self._rng(model, messages)
+        latency = self._latency_s(call_site, rng)
+        builder = getattr(self, f"_{call_site}", None)
+        obj = builder(prompt, rng) if builder else {}
+        return json.dumps(obj, ensure_ascii=False), latency
+
+    def complete(self, *, api_key, model, messages, temperature, top_p, max_tokens, call_site, timeout_s, response_format=None) -> str:
+        text, latency = self._answer(call_site, model, messages)
+        if latency:
+            time.sleep(latency)
+        return text
+
+    def stream(self, *, api_key, model, messages, temperature, top_p, max_tokens, call_site, timeout_s, response_format=None) -> Iterator[str]:
+        """First delta after STREAM_TTFT_SHARE of the latency, the rest spread evenly."""
+        text, latency = self._answer(call_site, model, messages)
+        chunks = [text[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(text), self.STREAM_CHUNK_CHARS)] or [""]
+        if latency:
+            time.sleep(latency * self.STREAM_TTFT_SHARE)
+        gap = latency * (1.0 - self.STREAM_TTFT_SHARE) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if i and gap:
+                time.sleep(gap)
+            yield chunk
+
+    @staticmethod
+    def _land(rng: random.Random, spread: int = 6) -> Dict[str, int]:
+        return {k: rng.randint(-spread, spread) for k in _LAND_KEYS}
+
+    def _policy(self, rng: random.Random, label: str) -> Dict[str, Any]:
+        return {
+            "aktion": f"[synthetic] {label} #{rng.randint(100, 999)}",
+            "folgen": {
+                "land": self._land(rng),
+                "eu": {"kohäsion": rng.randint(-3, 3)},
+                "global_context": "[synthetic] Reaktion der Partner bleibt verhalten.",
+            },
+        }
+
+    def _external_moves(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        moves = []
+        for actor in _EXTERNAL_ACTORS:
+            cz = _int_after(prompt, rf"- {actor}: (\d+)/100", 50)
+            moves.append({
+                "actor": actor,
+                "craziness": cz,
+                "headline": f"[synthetic] {actor} erhöht den Druck auf Europa (#{rng.randint(100, 999)}).",
+                "quote": f"[synthetic] {actor}: Wir handeln entschlossen.",
+                "modifiers": {k: rng.randint(-4, 6) for k in _MOD_KEYS},
+            })
+        return {"global_context": "[synthetic] Spannungen zwischen den Großmächten nehmen zu.", "moves": moves}
+
+    def _domestic_events(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        countries = _list_after(prompt, "Keys in events müssen exakt diese Länder sein")
+        return {"events": {
+            c: {
+                "craziness": rng.randint(0, 100),
+                "headline": f"[synthetic] Proteste in {c} (#{rng.randint(100, 999)})",
+                "details": "[synthetic] Die Regierung kündigt Gespräche an.",
+            }
+            for c in countries
+        }}
+
+    def _resolve(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        countries = _list_after(prompt, 'Keys in "länder" müssen exakt')
+        return {
+            "eu": {"kohäsion_delta": rng.randint(-4, 4), "global_context": "[synthetic] Europa ringt um eine gemeinsame Linie."},
+            "länder": {c: self._land(rng, 8) for c in countries},
+            "notizen": "[synthetic]",
+        }
+
+    def _resolve_fill(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        return {"länder": self._resolve(prompt, rng)["länder"]}
+
+    def _domestic_events_fill(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        return self._domestic_events(prompt, rng)
+
+    def _summary(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        round_no = _int_after(prompt, r"Aktuelle Runde: (\d+)", 0)
+        return {"summary": f"- [synthetic] Runde {round_no}: Druck von außen steigt.\n- [synthetic] Innenpolitik angespannt."}
+
+    def _policy_candidate(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        aggr = _int_after(prompt, r"Aggressivität: (\d+)/100", 50)
+        return self._policy(rng, f"Aktion (Aggressivität {aggr})")
+
+    def _policy_batch(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        levels = [int(x) for x in _list_after(prompt, "Aggressivitätsstufen:")] or [50]
+        return {"kandidaten": [
+            {"aggressivität": a, **self._policy(rng, f"Aktion (Aggressivität {a})")} for a in levels
+        ]}
+
+    def _actions(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        return {k: self._policy(rng, k) for k in ("aggressiv", "moderate", "passiv")}
+
+    def _repair(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        # synthetic output is always valid; repair only sees foreign text -> best effort
+        return {}
+
+
+# -----------------------
+# Selection
+# -----------------------
+_BACKEND: Optional[LLMBackend] = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def _backend_from_env() -> LLMBackend:
+    name = (os.getenv("LLM_BACKEND") or "mistral").strip().lower()
+    fixtures = (os.getenv("LLM_FIXTURES") or "").strip() or DEFAULT_FIXTURES_PATH
+    if name == "mistral":
+        return MistralBackend()
+    if name == "record":
+        return RecordingBackend(MistralBackend(), fixtures)
+    if name == "replay":
+        return ReplayBackend(
+            fixtures,
+            strict=(os.getenv("LLM_REPLAY_STRICT") or "").strip() == "1",
+            replay_latency=(os.getenv("LLM_REPLAY_LATENCY") or "").strip() == "1",
+        )
+    if name == "synthetic":
+        return SyntheticBackend(
+            latency_ms=parse_latency_spec(os.getenv("LLM_SYNTHETIC_LATENCY_MS") or "0"),
+            jitter_ms=float(os.getenv("LLM_SYNTHETIC_JITTER_MS") or 0),
+            seed=int(os.getenv("LLM_SYNTHETIC_SEED") or 0),
+        )
+    raise ValueError(f"Unbekanntes LLM_BACKEND: {name!r} (mistral|record|replay|synthetic)")
+
+
+def get_backend() -> LLMBackend:
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                _BACKEND = _backend_from_env()
+    return _BACKEND
+
+
+def set_backend(backend: Optional[LLMBackend]) -> None:
+    """Replace the process-wide backend (None = re-read LLM_BACKEND on next call)."""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        _BACKEND = backend
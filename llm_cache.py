@@ -0,0 +1,160 @@
+# llm_cache.py
+"""
+Content-addressed cache for LLM responses (table llm_cache, see db.py).
+
+key = sha256(model + messages + sampling params), so a cached answer is only served for
+a byte-identical request. Entries expire after ttl_s; beyond max_bytes / max_entries
+the least recently used ones are evicted.
+
+Per call site:
+- repair is cached by default (same bad text -> same fix, no creativity wanted)
+- creative call sites (external_moves, domestic_events, resolve, summary, ...) are opt-in:
+  chat(..., cache=True), LLM_CACHE_SITES=external_moves,summary, or LLM_CACHE=all
+  for dev replays of a whole round
+- LLM_CACHE=off disables the cache completely
+
+The cache never breaks a call: DB errors are counted and the request goes to the API.
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from db import scoped_conn, llm_cache_get, llm_cache_put, llm_cache_evict, llm_cache_stats
+
+# Every key can be overridden via env (LLM_CACHE_TTL_S, LLM_CACHE_MAX_BYTES, ...)
+LLM_CACHE_PROFILE: Dict[str, int] = {
+    "ttl_s": 7 * 24 * 3600,
+    "max_bytes": 32 * 1024 * 1024,
+    "max_entries": 5000,
+    "evict_every": 25,  # run eviction every n stores
+}
+
+# call site -> cached by default
+CACHE_CALL_SITES: Dict[str, bool] = {
+    "repair": True,
+    "external_moves": False,
+    "domestic_events": False,
+    "domestic_events_fill": False,
+    "resolve": False,
+    "resolve_fill": False,
+    "summary": False,
+    "policy_candidate": False,
+    "policy_batch": False,
+    "actions": False,
+}
+
+_COUNTER_KEYS = ("hit", "miss", "store", "error")
+_COUNTERS: Dict[str, Dict[str, int]] = {}
+_LOCK = threading.Lock()
+_stores_since_evict = 0
+
+
+def _profile() -> Dict[str, int]:
+    out = dict(LLM_CACHE_PROFILE)
+    for key in out:
+        raw = (os.getenv(f"LLM_CACHE_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = int(raw)
+    return out
+
+
+def _mode() -> str:
+    return (os.getenv("LLM_CACHE") or "default").strip().lower()
+
+
+def _opt_in_sites() -> List[str]:
+    return [s.strip() for s in (os.getenv("LLM_CACHE_SITES") or "").split(",") if s.strip()]
+
+
+def cache_enabled(call_site: str, override: Optional[bool] = None) -> bool:
+    """override (per call) > LLM_CACHE=off/all > LLM_CACHE_SITES > CACHE_CALL_SITES."""
+    mode = _mode()
+    if mode == "off":
+        return False
+    if override is not None:
+        return bool(override)
+    if mode == "all":
+        return True
+    if call_site in _opt_in_sites():
+        return True
+    return bool(CACHE_CALL_SITES.get(call_site, False))
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _count(call_site: str, what: str) -> None:
+    with _LOCK:
+        c = _COUNTERS.setdefault(call_site, {k: 0 for k in _COUNTER_KEYS})
+        c[what] += 1
+
+
+def cache_lookup(key: str, *, call_site: str) -> Optional[str]:
+    try:
+        with scoped_conn() as conn:
+            hit = llm_cache_get(conn, key, ttl_s=_profile()["ttl_s"], now=time.time())
+    except sqlite3.Error:
+        _count(call_site, "error")
+        return None
+    _count(call_site, "hit" if hit is not None else "miss")
+    return hit
+
+
+def cache_store(key: str, *, call_site: str, model: str, response: str) -> None:
+    global _stores_since_evict
+    if not response.strip():
+        return
+    p = _profile()
+    try:
+        with scoped_conn() as conn:
+            now = time.time()
+            llm_cache_put(conn, key=key, call_site=call_site, model=model, response=response, now=now)
+            _count(call_site, "store")
+            with _LOCK:
+                _stores_since_evict += 1
+                due = _stores_since_evict >= int(p["evict_every"])
+                if due:
+                    _stores_since_evict = 0
+            if due:
+                llm_cache_evict(conn, ttl_s=p["ttl_s"], max_bytes=p["max_bytes"], max_entries=p["max_entries"], now=now)
+    except sqlite3.Error:
+        _count(call_site, "error")
+
+
+def cache_counters() -> Dict[str, Dict[str, int]]:
+    """Process-wide hit/miss/store/error counters per call site."""
+    with _LOCK:
+        return {site: dict(c) for site, c in sorted(_COUNTERS.items())}
+
+
+def reset_cache_counters() -> None:
+    with _LOCK:
+        _COUNTERS.clear()
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Counters + table stats for the GM performance panel."""
+    try:
+        with scoped_conn() as conn:
+            table = llm_cache_stats(conn)
+    except sqlite3.Error:
+        table = {"entries": 0, "bytes": 0, "hits": 0, "by_call_site": {}}
+    return {
+        "mode": _mode(),
+        "enabled_sites": sorted(s for s in set(CACHE_CALL_SITES) | set(_opt_in_sites()) if cache_enabled(s)),
+        "counters": cache_counters(),
+        "table": table,
+        "profile": _profile(),
+    }
@@ -0,0 +1,213 @@
+# llm_limits.py
+"""
+Process-wide admission control for LLM requests (used by llm.chat / llm.chat_stream).
+
+Rate limit: two token buckets shared by every thread of the process (all sessions use
+the same API key) —
+- requests per second (bucket size `burst`)
+- tokens per minute; a request costs its estimated prompt tokens + max_tokens
+
+Waiting requests are queued per lane and served round-robin across lanes, so one country
+clicking three times does not push everyone else back. The lane is the country for
+player calls (with lane_scope(country): ...), otherwise the call site.
+
+Single-flight: identical requests (same key as the response cache) that are in flight at
+the same time share one backend call — a double click costs one request.
+
+LLM_RATE_LIMIT=off disables the limiter; every profile key can be overridden via env
+(LLM_RATE_REQUESTS_PER_S, LLM_RATE_TOKENS_PER_MIN, ...).
+"""
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import os
+import threading
+import time
+
+RATE_LIMIT_PROFILE: Dict[str, float] = {
+    "requests_per_s": 4.0,
+    "burst": 8.0,
+    "tokens_per_min": 400_000.0,
+    "max_wait_s": 120.0,  # queueing longer than this raises TimeoutError
+}
+
+CHARS_PER_TOKEN = 4.0  # rough estimate for German prose + JSON
+
+_LANE: ContextVar[Optional[str]] = ContextVar("llm_lane", default=None)
+
+
+def _profile() -> Dict[str, float]:
+    out = dict(RATE_LIMIT_PROFILE)
+    for key in out:
+        raw = (os.getenv(f"LLM_RATE_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = float(raw)
+    return out
+
+
+def limits_enabled() -> bool:
+    return (os.getenv("LLM_RATE_LIMIT") or "on").strip().lower() != "off"
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return int(chars / CHARS_PER_TOKEN) + int(max_tokens)
+
+
+@contextmanager
+def lane_scope(lane: str) -> Iterator[None]:
+    """LLM calls inside the block queue in `lane` (e.g. the player's country)."""
+    token = _LANE.set(str(lane))
+    try:
+        yield
+    finally:
+        _LANE.reset(token)
+
+
+def current_lane(default: str) -> str:
+    return _LANE.get() or default
+
+
+class FairRateLimiter:
+    """Two token buckets + round-robin over per-lane FIFO queues."""
+
+    def __init__(self, profile: Dict[str, float]):
+        self.profile = profile
+        self._cond = threading.Condition()
+        self._req_tokens = float(profile["burst"])
+        self._llm_tokens = float(profile["tokens_per_min"])
+        self._last = time.monotonic()
+        self._lanes: Dict[str, deque] = {}
+        self._turns: deque = deque()  # lanes with waiters, head is served next
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _refill(self, now: float) -> None:
+        p = self.profile
+        dt = now - self._last
+        self._last = now
+        self._req_tokens = min(float(p["burst"]), self._req_tokens + dt * float(p["requests_per_s"]))
+        self._llm_tokens = min(float(p["tokens_per_min"]), self._llm_tokens + dt * float(p["tokens_per_min"]) / 60.0)
+
+    def _wait_needed(self, cost: float) -> float:
+        p = self.profile
+        w_req = max(0.0, (1.0 - self._req_tokens) / float(p["requests_per_s"]))
+        w_tok = max(0.0, (cost - self._llm_tokens) / (float(p["tokens_per_min"]) / 60.0))
+        return max(w_req, w_tok)
+
+    def acquire(self, lane: str, tokens: int) -> float:
+        """Blocks until it is this request's turn and both buckets allow it. Returns seconds waited."""
+        cost = min(float(tokens), float(self.profile["tokens_per_min"]))  # oversized requests still pass eventually
+        ticket = object()
+        t0 = time.monotonic()
+        deadline = t0 + float(self.profile["max_wait_s"])
+        with self._cond:
+            q = self._lanes.setdefault(lane, deque())
+            q.append(ticket)
+            if lane not in self._turns:
+                self._turns.append(lane)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_next = self._turns[0] == lane and q[0] is ticket
+                    wait = self._wait_needed(cost) if is_next else None
+                    if is_next and wait <= 0.0:
+                        self._req_tokens -= 1.0
+                        self._llm_tokens -= cost
+                        break
+                    if now >= deadline:
+                        raise TimeoutError(f"LLM rate limit: waited more than {self.profile['max_wait_s']:g}s (lane {lane})")
+                    self._cond.wait(timeout=min(deadline - now, wait if wait is not None else 0.5))
+            finally:
+                q.remove(ticket)
+                self._turns.remove(lane)
+                if q:
+                    self._turns.append(lane)  # back of the line: next lane's turn
+                else:
+                    del self._lanes[lane]
+                self._cond.notify_all()
+        waited = time.monotonic() - t0
+        with self._cond:
+            s = self._stats.setdefault(lane, {"n": 0, "waited_s": 0.0, "max_wait_s": 0.0})
+            s["n"] += 1
+            s["waited_s"] += waited
+            s["max_wait_s"] = max(s["max_wait_s"], waited)
+        return waited
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": sum(len(q) for q in self._lanes.values()),
+                "lanes": {lane: dict(s) for lane, s in sorted(self._stats.items())},
+            }
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Identical in-flight requests share the leader's result (or exception)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    def join(self, key: str) -> Tuple[bool, _Flight]:
+        """(is_leader, flight). The leader must call finish(); followers wait()."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return False, flight
+            flight = _Flight()
+            self._flights[key] = flight
+            return True, flight
+
+    def finish(self, key: str, flight: _Flight, *, result: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        flight.result, flight.error = result, error
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    @staticmethod
+    def wait(flight: _Flight) -> str:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result or ""
+
+
+_LIMITER: Optional[FairRateLimiter] = None
+_LIMITER_LOCK = threading.Lock()
+SINGLE_FLIGHT = SingleFlight()
+
+
+def get_limiter() -> FairRateLimiter:
+    global _LIMITER
+    if _LIMITER is None:
+        with _LIMITER_LOCK:
+            if _LIMITER is None:
+                _LIMITER = FairRateLimiter(_profile())
+    return _LIMITER
+
+
+def acquire(*, lane: str, messages: List[Dict[str, Any]], max_tokens: int) -> float:
+    """Admission for one backend request. Returns seconds spent waiting (0 if disabled)."""
+    if not limits_enabled():
+        return 0.0
+    return get_limiter().acquire(lane, estimate_tokens(messages, max_tokens))
+
+
+def limits_stats() -> Dict[str, Any]:
+    """{"enabled", "profile", "queued", "lanes": {lane: {"n", "waited_s", "max_wait_s"}}, "coalesced"}"""
+    out: Dict[str, Any] = {"enabled": limits_enabled(), "profile": _profile(), "coalesced": SINGLE_FLIGHT.coalesced}
+    out.update(get_limiter().stats())
+    return out
@@ -0,0 +1,157 @@
+# llm_prompt.py
+"""
+Token-budgeted prompt builder.
+
+A prompt is a list of sections in output order. Each section has a priority and optional
+compact variants (shorter renderings of the same data, from long to short):
+
+    b = PromptBuilder("resolve")
+    b.add("task", task_text, required=True)
+    b.add("memory", memory_full, priority=1, variants=[memory_last_round], droppable=True)
+    b.add("actions", actions_full, priority=5, variants=[actions_240, actions_120])
+    prompt = b.build()
+
+build() renders all sections at full length; while the estimate exceeds the call site's
+budget it steps the lowest-priority section one variant shorter (then drops it, if
+droppable). Ties go to the section further down the prompt. The result only depends on
+the inputs, so the same state always gives the same prompt (cache and replay friendly).
+
+Tokens are estimated locally (chars / llm_limits.CHARS_PER_TOKEN); the final count of
+every prompt is kept per call site (prompt_stats()) next to the provider's count in the
+llm_calls telemetry. Budgets can be overridden via env (LLM_PROMPT_BUDGET_RESOLVE=2500).
+
+Cache-friendly layout: PromptParts(prefix, body) keeps the static part of a template
+(role, instructions, rules, schema: byte-identical for every call) apart from the
+per-round data. llm.json_messages() puts the prefix into the system message and the body
+last, so providers can reuse the cached prefix. tools/check_prompt_prefixes.py verifies
+that the prefixes do not change with the game state. A builder's budget covers both:
+PromptBuilder(call_site, reserved=count_tokens(prefix)).
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Optional
+import os
+import threading
+
+from llm_limits import CHARS_PER_TOKEN
+
+# prompt tokens per call site (the answer's max_tokens come on top, see llm_routing)
+PROMPT_BUDGETS: Dict[str, int] = {
+    "resolve": 3000,
+    "summary": 1600,
+}
+DEFAULT_BUDGET = 4000
+
+_STATS: Dict[str, Dict[str, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def prompt_budget(call_site: str) -> int:
+    raw = (os.getenv(f"LLM_PROMPT_BUDGET_{call_site.upper()}") or "").strip()
+    if raw:
+        return int(raw)
+    return int(PROMPT_BUDGETS.get(call_site, DEFAULT_BUDGET))
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """Cut at the last word boundary before max_chars and mark the cut with '…'."""
+    text = str(text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[: max(1, max_chars - 1)]
+    if " " in cut:
+        cut = cut[: cut.rfind(" ")]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+class PromptParts:
+    """Static prefix (same bytes for every call of a template) + dynamic body."""
+
+    __slots__ = ("prefix", "body")
+
+    def __init__(self, prefix: str, body: str):
+        self.prefix = prefix.strip()
+        self.body = body.strip()
+
+    def __str__(self) -> str:
+        return f"{self.prefix}\n\n{self.body}"
+
+
+class PromptBuilder:
+    def __init__(self, call_site: str, budget: Optional[int] = None, separator: str = "\n\n", reserved: int = 0):
+        """reserved: tokens already taken by a static prefix sent along with the built text."""
+        self.call_site = call_site
+        self.budget = int(budget if budget is not None else prompt_budget(call_site))
+        self.separator = separator
+        self.reserved = int(reserved)
+        self._sections: List[Dict[str, Any]] = []
+
+    def add(
+        self,
+        name: str,
+        text: str,
+        *,
+        priority: int = 0,
+        variants: Optional[List[str]] = None,
+        droppable: bool = False,
+        required: bool = False,
+    ) -> "PromptBuilder":
+        """required: never shortened. Otherwise lower priority is compacted first."""
+        renderings = [str(text).strip()] + [str(v).strip() for v in (variants or [])]
+        if droppable and not required:
+            renderings.append("")
+        self._sections.append({
+            "name": name,
+            "renderings": renderings,
+            "level": 0,
+            "priority": int(priority),
+            "required": bool(required),
+        })
+        return self
+
+    def _render(self) -> str:
+        parts = [s["renderings"][s["level"]] for s in self._sections]
+        return self.separator.join(p for p in parts if p)
+
+    def build(self) -> str:
+        for s in self._sections:
+            s["level"] = 0
+        prompt = self._render()
+        compactions: List[str] = []
+        while self.reserved + count_tokens(prompt) > self.budget:
+            candidates = [
+                (s["priority"], -i, s)
+                for i, s in enumerate(self._sections)
+                if not s["required"] and s["level"] < len(s["renderings"]) - 1
+            ]
+            if not candidates:
+                break  # over budget with everything compacted: send as is
+            _prio, _pos, section = min(candidates, key=lambda c: (c[0], c[1]))
+            section["level"] += 1
+            compactions.append(f"{section['name']}:{section['level']}")
+            prompt = self._render()
+        self._record(self.reserved + count_tokens(prompt), compactions)
+        return prompt
+
+    def _record(self, tokens: int, compactions: List[str]) -> None:
+        with _LOCK:
+            s = _STATS.setdefault(self.call_site, {"n": 0, "compacted": 0, "over_budget": 0, "tokens_sum": 0})
+            s["n"] += 1
+            s["tokens_sum"] += tokens
+            s["compacted"] += 1 if compactions else 0
+            s["over_budget"] += 1 if tokens > self.budget else 0
+            s["last_tokens"] = tokens
+            s["budget"] = self.budget
+            s["last_compactions"] = list(compactions)
+
+
+def prompt_stats() -> Dict[str, Dict[str, Any]]:
+    """{call_site: {"n", "budget", "last_tokens", "avg_tokens", "compacted", "over_budget", "last_compactions"}}"""
+    with _LOCK:
+        out = {site: dict(s) for site, s in sorted(_STATS.items())}
+    for s in out.values():
+        s["avg_tokens"] = s.pop("tokens_sum") / s["n"] if s["n"] else 0.0
+    return out
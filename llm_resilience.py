@@ -0,0 +1,227 @@
+# llm_resilience.py
+"""
+Resilience policy per call site for single LLM requests (used by llm.chat / llm.chat_stream).
+
+- deadline: wall-clock budget for the whole call including retries and format fallbacks;
+  every attempt's timeout is capped by what is left of it
+- retries: transient errors (timeouts, connection errors, 408/429/5xx) are retried with
+  exponential backoff and full jitter; other errors (bad request, replay miss) are not
+- hedging: if an attempt is still running after the call site's p95 latency, a second
+  identical request is sent and the first valid answer wins (non-streaming calls only;
+  the losing request finishes in the background and is discarded)
+
+The resolve call gets the most patience (long deadline, more retries, hedging); a player's
+policy candidate fails fast, the player can simply click again.
+
+Every key can be overridden via env, per call site (LLM_POLICY_RESOLVE_ATTEMPTS=5) or for
+all call sites (LLM_POLICY_ATTEMPTS=1). LLM_HEDGING=off disables hedging.
+"""
+from __future__ import annotations
+from typing import Dict, Callable, Optional
+import os
+import queue
+import random
+import threading
+import time
+
+from llm_backends import put_usage, take_usage
+
+DEFAULT_POLICY: Dict[str, float] = {
+    "deadline_s": 90.0,
+    "attempts": 2,  # including the first one
+    "backoff_s": 1.0,  # 1s, 2s, 4s, ... (full jitter: uniform 0..backoff)
+    "max_backoff_s": 8.0,
+    "hedge": 0,
+    "hedge_min_s": 4.0,  # never hedge earlier than this, even if p95 is lower
+}
+
+CALL_SITE_POLICIES: Dict[str, Dict[str, float]] = {
+    "resolve": {"deadline_s": 180.0, "attempts": 4, "hedge": 1, "hedge_min_s": 8.0},
+    "external_moves": {"deadline_s": 120.0, "attempts": 3, "hedge": 1},
+    "domestic_events": {"deadline_s": 120.0, "attempts": 3, "hedge": 1},
+    "resolve_fill": {"deadline_s": 90.0, "attempts": 3},
+    "domestic_events_fill": {"deadline_s": 60.0, "attempts": 2},
+    "summary": {"deadline_s": 60.0, "attempts": 3},
+    "policy_candidate": {"deadline_s": 60.0, "attempts": 2, "backoff_s": 0.5},
+    "policy_batch": {"deadline_s": 90.0, "attempts": 2, "backoff_s": 0.5},
+    "actions": {"deadline_s": 90.0, "attempts": 2},
+    "repair": {"deadline_s": 45.0, "attempts": 2, "backoff_s": 0.5},
+}
+
+TRANSIENT_STATUS = (408, 409, 425, 429, 500, 502, 503, 504)
+_TRANSIENT_NAMES = ("Timeout", "ConnectError", "RemoteProtocolError", "ReadError", "NetworkError")
+
+MIN_ATTEMPT_S = 1.0  # an attempt with less time left than this is not started
+
+STAT_KEYS = ("calls", "retries", "hedged", "hedge_won", "deadline", "failed")
+_STATS: Dict[str, Dict[str, int]] = {}
+_LOCK = threading.Lock()
+
+
+def policy_for(call_site: str) -> Dict[str, float]:
+    out = dict(DEFAULT_POLICY)
+    out.update(CALL_SITE_POLICIES.get(call_site, {}))
+    for key in out:
+        for env in (f"LLM_POLICY_{key.upper()}", f"LLM_POLICY_{call_site.upper()}_{key.upper()}"):
+            raw = (os.getenv(env) or "").strip()
+            if raw:
+                out[key] = float(raw)
+    return out
+
+
+def hedging_enabled() -> bool:
+    return (os.getenv("LLM_HEDGING") or "on").strip().lower() != "off"
+
+
+def count(call_site: str, key: str, n: int = 1) -> None:
+    with _LOCK:
+        c = _STATS.setdefault(call_site, {k: 0 for k in STAT_KEYS})
+        c[key] += n
+
+
+def resilience_stats() -> Dict[str, Dict[str, int]]:
+    """{call_site: {"calls", "retries", "hedged", "hedge_won", "deadline", "failed"}}"""
+    with _LOCK:
+        return {site: dict(c) for site, c in sorted(_STATS.items())}
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Worth another attempt: timeouts, dropped connections, rate limits and server errors."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return int(status) in TRANSIENT_STATUS
+    name = type(exc).__name__
+    return any(part in name for part in _TRANSIENT_NAMES)
+
+
+def deadline_for(call_site: str) -> float:
+    """Monotonic deadline for a call starting now."""
+    return time.monotonic() + float(policy_for(call_site)["deadline_s"])
+
+
+def attempt_timeout(timeout_s: float, deadline: float) -> float:
+    """Per-attempt timeout capped by the deadline; raises TimeoutError if too little is left."""
+    left = deadline - time.monotonic()
+    if left < MIN_ATTEMPT_S:
+        raise TimeoutError(f"LLM deadline exceeded ({left:.1f}s left)")
+    return min(float(timeout_s), left)
+
+
+def retry_delay(policy: Dict[str, float], attempt_no: int, deadline: float) -> Optional[float]:
+    """Backoff before attempt attempt_no + 1, or None if no attempt is left (count or time)."""
+    if attempt_no >= int(policy["attempts"]):
+        return None
+    cap = min(float(policy["max_backoff_s"]), float(policy["backoff_s"]) * (2 ** (attempt_no - 1)))
+    delay = random.uniform(0.0, cap)
+    if time.monotonic() + delay + MIN_ATTEMPT_S > deadline:
+        return None
+    return delay
+
+
+def _usable(valid: Callable[[str], bool], text: str) -> bool:
+    """A validator that raises counts the answer as invalid, it must not fail the call."""
+    try:
+        return bool(valid(text))
+    except Exception:  # noqa: BLE001
+        return False
+
+
+def _hedged(
+    call_site: str,
+    attempt: Callable[[float], str],
+    *,
+    timeout_s: float,
+    hedge_after_s: float,
+    valid: Callable[[str], bool],
+) -> str:
+    """
+    Primary request, plus a second one after hedge_after_s; first valid answer wins.
+    Provider usage is per thread, so the winner's usage is handed to the caller's thread.
+    """
+    results: "queue.Queue[tuple]" = queue.Queue()
+
+    def _one(tag: str) -> None:
+        try:
+            text = attempt(timeout_s)
+            results.put((tag, text, None, take_usage()))
+        except BaseException as e:  # noqa: BLE001 - handed to the caller
+            results.put((tag, None, e, take_usage()))
+
+    threading.Thread(target=_one, args=("primary",), daemon=True, name=f"llm-{call_site}").start()
+    running = 1
+    try:
+        first = results.get(timeout=hedge_after_s)
+    except queue.Empty:
+        count(call_site, "hedged")
+        threading.Thread(target=_one, args=("hedge",), daemon=True, name=f"llm-{call_site}-hedge").start()
+        running = 2
+        first = results.get()
+    running -= 1
+
+    tag, text, error, usage = first
+    if error is None and (_usable(valid, text) or running == 0):
+        if tag == "hedge":
+            count(call_site, "hedge_won")
+        put_usage(usage)
+        return text
+    if running == 0:
+        raise error
+    # first one failed or is unusable: take the other one if it does better
+    tag2, text2, error2, usage2 = results.get()
+    if error2 is None and (_usable(valid, text2) or error is not None):
+        if tag2 == "hedge":
+            count(call_site, "hedge_won")
+        put_usage(usage2)
+        return text2
+    if error is None:
+        put_usage(usage)
+        return text
+    raise error2 if error2 is not None else error
+
+
+def run_with_policy(
+    call_site: str,
+    attempt: Callable[[float], str],
+    *,
+    timeout_s: float,
+    deadline: float,
+    hedge_after_s: Optional[float] = None,
+    valid: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    attempt(timeout_s) performs one backend request. Transient errors are retried within
+    the deadline; hedge_after_s (e.g. the call site's p95) enables hedging if the policy
+    allows it.
+    """
+    policy = policy_for(call_site)
+    hedge = bool(policy["hedge"]) and hedging_enabled() and hedge_after_s is not None
+    attempt_no = 0
+    count(call_site, "calls")
+    while True:
+        attempt_no += 1
+        try:
+            t = attempt_timeout(timeout_s, deadline)
+        except TimeoutError:
+            count(call_site, "deadline")
+            raise
+        try:
+            if hedge:
+                return _hedged(
+                    call_site,
+                    attempt,
+                    timeout_s=t,
+                    hedge_after_s=max(float(hedge_after_s), float(policy["hedge_min_s"])),
+                    valid=valid or (lambda text: bool(text.strip())),
+                )
+            return attempt(t)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            delay = retry_delay(policy, attempt_no, deadline)
+            if delay is None:
+                count(call_site, "failed")  # retries or time used up
+                raise
+            count(call_site, "retries")
+            time.sleep(delay)
@@ -0,0 +1,142 @@
+# llm_routing.py
+"""
+Model routing per call site: model, max_tokens, temperature and a latency SLO (p95).
+
+    r = route("resolve")
+    resolve_round_all_countries(..., model=r["model"], max_tokens=r["max_tokens"], temperature=r["temperature"])
+
+Auto-downgrade: when the p95 latency of the routed model (measured from the llm_calls
+telemetry, last `window` successful uncached calls) exceeds the call site's SLO, the call
+site switches to its fallback_model for hold_s. Afterwards the primary model is tried
+again and judged only on calls made after the switch back.
+
+Every route key can be overridden via env (LLM_ROUTE_RESOLVE_MODEL=mistral-large-latest,
+LLM_ROUTE_SUMMARY_MAX_TOKENS=400, ...); profile keys via LLM_ROUTING_<KEY>
+(LLM_ROUTING_AUTO_DOWNGRADE=0 disables the downgrade).
+"""
+from __future__ import annotations
+from typing import Dict, Any, Optional
+import os
+import sqlite3
+import threading
+import time
+
+from db import get_llm_call_latencies, scoped_conn
+from llm_telemetry import percentile
+
+DEFAULT_MODEL = "mistral-small"
+FAST_MODEL = "ministral-8b-latest"
+
+ROUTES: Dict[str, Dict[str, Any]] = {
+    "external_moves": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 1200, "temperature": 0.8, "slo_p95_s": 25.0},
+    "domestic_events": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 1400, "temperature": 0.85, "slo_p95_s": 25.0},
+    "resolve": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 1700, "temperature": 0.6, "slo_p95_s": 40.0},
+    # fills of a partial answer (only the missing countries; max_tokens scaled down per country)
+    "resolve_fill": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 1700, "temperature": 0.6, "slo_p95_s": 40.0},
+    "domestic_events_fill": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 1400, "temperature": 0.85, "slo_p95_s": 25.0},
+    "summary": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 520, "temperature": 0.4, "slo_p95_s": 12.0},
+    "policy_candidate": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 900, "temperature": 0.85, "slo_p95_s": 15.0},
+    "policy_batch": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 2200, "temperature": 0.85, "slo_p95_s": 30.0},
+    "repair": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 1400, "temperature": 0.2, "slo_p95_s": 12.0},
+    "actions": {"model": DEFAULT_MODEL, "fallback_model": FAST_MODEL, "max_tokens": 900, "temperature": 0.9, "slo_p95_s": 25.0},
+}
+
+ROUTING_PROFILE: Dict[str, float] = {
+    "auto_downgrade": 1,
+    "window": 50,  # recent calls of the primary model considered
+    "min_samples": 20,  # fewer calls -> no judgement yet
+    "hold_s": 600.0,  # stay on the fallback model this long
+    "check_every_s": 15.0,  # p95 is re-read from the DB at most this often per call site
+}
+
+_STATE: Dict[str, Dict[str, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def _profile() -> Dict[str, float]:
+    out = dict(ROUTING_PROFILE)
+    for key in out:
+        raw = (os.getenv(f"LLM_ROUTING_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = float(raw)
+    return out
+
+
+def _base_route(call_site: str) -> Dict[str, Any]:
+    if call_site not in ROUTES:
+        raise KeyError(f"no route for call site {call_site!r} (add it to llm_routing.ROUTES)")
+    out = dict(ROUTES[call_site])
+    for key, default in list(out.items()):
+        raw = (os.getenv(f"LLM_ROUTE_{call_site.upper()}_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = type(default)(raw)
+    return out
+
+
+def _measured_p95_s(call_site: str, model: str, since: float, profile: Dict[str, float]) -> Optional[float]:
+    try:
+        with scoped_conn() as conn:
+            latencies = get_llm_call_latencies(conn, call_site=call_site, model=model, since=since, limit=int(profile["window"]))
+    except sqlite3.Error:
+        return None
+    if len(latencies) < int(profile["min_samples"]):
+        return None
+    return percentile(latencies, 95) / 1000.0
+
+
+def route(call_site: str) -> Dict[str, Any]:
+    """{"model", "max_tokens", "temperature", "slo_p95_s", "downgraded"} for the next call."""
+    base = _base_route(call_site)
+    out = {
+        "model": base["model"],
+        "max_tokens": int(base["max_tokens"]),
+        "temperature": float(base["temperature"]),
+        "slo_p95_s": float(base["slo_p95_s"]),
+        "downgraded": False,
+    }
+    profile = _profile()
+    fallback = base.get("fallback_model") or ""
+    if not profile["auto_downgrade"] or not fallback or fallback == base["model"]:
+        return out
+
+    now = time.time()
+    with _LOCK:
+        state = _STATE.setdefault(call_site, {"until": 0.0, "since": 0.0, "checked": 0.0, "p95_s": None, "downgrades": 0})
+        if state["until"] and now >= state["until"]:
+            state["since"], state["until"] = state["until"], 0.0  # back to primary, judge fresh calls only
+        due = not state["until"] and now - state["checked"] >= float(profile["check_every_s"])
+        if due:
+            state["checked"] = now
+    if due:
+        p95_s = _measured_p95_s(call_site, base["model"], state["since"], profile)
+        with _LOCK:
+            state["p95_s"] = p95_s
+            if p95_s is not None and p95_s > out["slo_p95_s"]:
+                state["until"] = now + float(profile["hold_s"])
+                state["downgrades"] += 1
+    with _LOCK:
+        downgraded = bool(state["until"])
+    if downgraded:
+        out["model"] = fallback
+        out["downgraded"] = True
+    return out
+
+
+def routing_stats() -> Dict[str, Dict[str, Any]]:
+    """{call_site: {"model", "fallback_model", "slo_p95_s", "p95_s", "downgraded", "downgrades"}} for the GM panel."""
+    out: Dict[str, Dict[str, Any]] = {}
+    now = time.time()
+    with _LOCK:
+        states = {site: dict(s) for site, s in _STATE.items()}
+    for site in ROUTES:
+        base = _base_route(site)
+        s = states.get(site) or {}
+        out[site] = {
+            "model": base["model"],
+            "fallback_model": base.get("fallback_model") or "",
+            "slo_p95_s": float(base["slo_p95_s"]),
+            "p95_s": s.get("p95_s"),
+            "downgraded": bool(s.get("until")) and now < float(s.get("until") or 0.0),
+            "downgrades": int(s.get("downgrades") or 0),
+        }
+    return out
@@ -0,0 +1,97 @@
+# llm_schemas.py
+"""
+JSON Schemas for the structured LLM answers (provider-native structured output).
+
+The schema_hint strings in the prompts stay as they are (readable example for the model
+and for the repair prompt); these schemas are what the provider enforces when
+STRUCTURED_OUTPUT=json_schema (see llm.structured_format). Country keys are dynamic,
+so the per-country schemas are built per call.
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Iterable
+
+
+def _obj(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Closed object, every property required (what strict schema modes expect)."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties.keys()),
+        "additionalProperties": False,
+    }
+
+
+def _ints(keys: Iterable[str]) -> Dict[str, Any]:
+    return _obj({k: {"type": "integer"} for k in keys})
+
+
+_STR = {"type": "string"}
+_INT = {"type": "integer"}
+
+COUNTRY_DELTA_KEYS = ("militär", "stabilität", "wirtschaft", "diplomatie", "öffentliche_zustimmung")
+EXTERNAL_MODIFIER_KEYS = (
+    "eu_cohesion_delta",
+    "threat_delta",
+    "frontline_delta",
+    "energy_delta",
+    "migration_delta",
+    "disinfo_delta",
+    "trade_war_delta",
+)
+
+FOLGEN_SCHEMA: Dict[str, Any] = _obj({
+    "land": _ints(COUNTRY_DELTA_KEYS),
+    "eu": _ints(("kohäsion",)),
+    "global_context": _STR,
+})
+
+POLICY_CANDIDATE_SCHEMA: Dict[str, Any] = _obj({
+    "aktion": _STR,
+    "folgen": FOLGEN_SCHEMA,
+})
+
+def policy_batch_schema(n: int) -> Dict[str, Any]:
+    """n candidates in one answer, one per requested aggressiveness level (in order)."""
+    item = _obj({"aggressivität": _INT, "aktion": _STR, "folgen": FOLGEN_SCHEMA})
+    return _obj({"kandidaten": {"type": "array", "minItems": int(n), "maxItems": int(n), "items": item}})
+
+
+ACTIONS_SCHEMA: Dict[str, Any] = _obj({
+    variant: POLICY_CANDIDATE_SCHEMA for variant in ("aggressiv", "moderate", "passiv")
+})
+
+EXTERNAL_MOVES_SCHEMA: Dict[str, Any] = _obj({
+    "global_context": _STR,
+    "moves": {
+        "type": "array",
+        "minItems": 3,
+        "maxItems": 3,
+        "items": _obj({
+            "actor": {"type": "string", "enum": ["USA", "China", "Russia"]},
+            "craziness": _INT,
+            "headline": _STR,
+            "quote": _STR,
+            "modifiers": _ints(EXTERNAL_MODIFIER_KEYS),
+        }),
+    },
+})
+
+SUMMARY_SCHEMA: Dict[str, Any] = _obj({"summary": _STR})
+
+
+def domestic_events_schema(countries: List[str]) -> Dict[str, Any]:
+    event = _obj({"craziness": _INT, "headline": _STR, "details": _STR})
+    return _obj({"events": _obj({c: event for c in countries})})
+
+
+def resolve_fill_schema(countries: List[str]) -> Dict[str, Any]:
+    """Follow-up for countries missing in a resolve answer: only their deltas."""
+    return _obj({"länder": _obj({c: _ints(COUNTRY_DELTA_KEYS) for c in countries})})
+
+
+def resolve_schema(countries: List[str]) -> Dict[str, Any]:
+    return _obj({
+        "eu": _obj({"kohäsion_delta": _INT, "global_context": _STR}),
+        "länder": _obj({c: _ints(COUNTRY_DELTA_KEYS) for c in countries}),
+        "notizen": _STR,
+    })
@@ -0,0 +1,168 @@
+# llm_telemetry.py
+"""
+Per-call LLM telemetry (table llm_calls, see db.py): one row per chat()/chat_stream() call
+with call site, model, prompt/completion tokens, latency, TTFT, repair path and error.
+
+- tokens come from the provider's usage when the backend reports it (llm_backends.take_usage),
+  otherwise they are estimated (chars / 4) and flagged as such
+- the round is taken from round_scope(round_no) around the work (set per background job),
+  so latencies can be compared per round
+- parse_or_repair() marks the row of the call it parsed with the repair path it needed
+- a cache hit or a call coalesced with an identical one is recorded with cached=1 and is
+  left out of the latency percentiles
+
+Telemetry never breaks a call: DB errors are counted and swallowed. LLM_TELEMETRY=off
+disables it.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional
+import os
+import sqlite3
+import threading
+import time
+
+from db import scoped_conn, insert_llm_call, set_llm_call_repair, get_llm_calls
+from llm_backends import take_usage
+from llm_limits import CHARS_PER_TOKEN, estimate_tokens
+
+PERCENTILES = (50, 95, 99)
+
+_ROUND: ContextVar[Optional[int]] = ContextVar("llm_round", default=None)
+_LAST_CALL: ContextVar[Optional[int]] = ContextVar("llm_last_call", default=None)
+_ERRORS = 0
+_LOCK = threading.Lock()
+
+
+def telemetry_enabled() -> bool:
+    return (os.getenv("LLM_TELEMETRY") or "on").strip().lower() != "off"
+
+
+@contextmanager
+def round_scope(round_no: Optional[int]) -> Iterator[None]:
+    """LLM calls inside the block are attributed to round_no."""
+    token = _ROUND.set(int(round_no) if round_no is not None else None)
+    try:
+        yield
+    finally:
+        _ROUND.reset(token)
+
+
+def _db_error() -> None:
+    global _ERRORS
+    with _LOCK:
+        _ERRORS += 1
+
+
+def record_call(
+    *,
+    call_site: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    text: str,
+    latency_s: float,
+    ttft_s: Optional[float],
+    streamed: bool,
+    cached: bool,
+    error: str = "",
+) -> Optional[int]:
+    """Insert one llm_calls row; returns its id (None if disabled or the insert failed)."""
+    usage = take_usage()
+    if not telemetry_enabled():
+        return None
+    if usage is not None and not cached:
+        prompt_tokens, completion_tokens = usage
+        estimated = False
+    else:
+        prompt_tokens = estimate_tokens(messages, 0)
+        completion_tokens = int(len(text or "") / CHARS_PER_TOKEN)
+        estimated = True
+    try:
+        with scoped_conn() as conn:
+            call_id = insert_llm_call(
+                conn,
+                round_no=_ROUND.get(),
+                call_site=call_site,
+                model=model,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                tokens_estimated=estimated,
+                latency_ms=latency_s * 1000.0,
+                ttft_ms=ttft_s * 1000.0 if ttft_s is not None else None,
+                streamed=streamed,
+                cached=cached,
+                error=error,
+                now=time.time(),
+            )
+    except sqlite3.Error:
+        _db_error()
+        return None
+    _LAST_CALL.set(call_id)
+    return call_id
+
+
+def last_call_id() -> Optional[int]:
+    """Id of the row recorded last in this thread/context."""
+    return _LAST_CALL.get()
+
+
+def mark_repair(call_id: Optional[int], path: str) -> None:
+    if call_id is None or not telemetry_enabled():
+        return
+    try:
+        with scoped_conn() as conn:
+            set_llm_call_repair(conn, call_id, path)
+    except sqlite3.Error:
+        _db_error()
+
+
+def percentile(xs: List[float], q: float) -> Optional[float]:
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q / 100.0 * (len(xs) - 1))))]
+
+
+def _summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    live = [r for r in rows if not r["cached"] and not r["error"]]
+    latencies = [r["latency_ms"] for r in live]
+    ttfts = [r["ttft_ms"] for r in live if r["ttft_ms"] is not None]
+    out: Dict[str, Any] = {
+        "n": len(rows),
+        "live": len(live),
+        "cached": sum(1 for r in rows if r["cached"]),
+        "errors": sum(1 for r in rows if r["error"]),
+        "repairs": sum(1 for r in rows if r["repair"] in ("local", "llm")),
+        "avg_prompt_tokens": (sum(r["prompt_tokens"] for r in live) / len(live)) if live else 0.0,
+        "avg_completion_tokens": (sum(r["completion_tokens"] for r in live) / len(live)) if live else 0.0,
+        "max_completion_tokens": max((r["completion_tokens"] for r in live), default=0),
+    }
+    for q in PERCENTILES:
+        out[f"p{q}_ms"] = percentile(latencies, q)
+        out[f"ttft_p{q}_ms"] = percentile(ttfts, q)
+    return out
+
+
+def telemetry_summary(conn, *, since: float = 0.0) -> Dict[str, Any]:
+    """
+    {"by_call_site": {site: stats}, "by_round": {round: {site: stats}}, "db_errors"};
+    stats: n, live, cached, errors, repairs, avg/max tokens, p50/p95/p99 latency and TTFT (ms).
+    """
+    rows = get_llm_calls(conn, since=since)
+    by_site: Dict[str, List[Dict[str, Any]]] = {}
+    by_round: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
+    for r in rows:
+        by_site.setdefault(r["call_site"], []).append(r)
+        if r["round"] is not None:
+            by_round.setdefault(r["round"], {}).setdefault(r["call_site"], []).append(r)
+    with _LOCK:
+        errors = _ERRORS
+    return {
+        "by_call_site": {site: _summarize(rs) for site, rs in sorted(by_site.items())},
+        "by_round": {
+            rnd: {site: _summarize(rs) for site, rs in sorted(sites.items())}
+            for rnd, sites in sorted(by_round.items(), reverse=True)
+        },
+        "db_errors": errors,
+    }
@@ -103,3 +103,22 @@ def decay_pressures(eu: Dict[str, Any]) -> Dict[str, Any]:
     out["disinfo_pressure"] = out["disinfo_pressure"] - 3
     out["trade_war_pressure"] = out["trade_war_pressure"] - 3
     return out
+
+
+EU_NUMERIC_KEYS = (
+    "cohesion",
+    "threat_level",
+    "frontline_pressure",
+    "energy_pressure",
+    "migration_pressure",
+    "disinfo_pressure",
+    "trade_war_pressure",
+)
+
+
+def clamp_eu_state(eu: Dict[str, Any]) -> Dict[str, Any]:
+    """EU state as it reads back after db.set_eu_state (all values clamped to 0..100)."""
+    out = dict(eu)
+    for k in EU_NUMERIC_KEYS:
+        out[k] = max(0, min(100, int(out[k])))
+    return out
@@ -1,74 +1,25 @@
 import random
-from typing import Dict, Any, List, Callable
+from typing import Dict, Any, List
 
 import streamlit as st
 
 from db import (
     get_external_events,
     get_domestic_events,
-    get_recent_round_summaries,
     get_eu_state,
-    set_eu_state,
-    clear_external_events,
-    upsert_external_event,
-    clear_domestic_events,
-    upsert_domestic_event,
     set_game_meta,
     get_policy_locks,
-    get_policy_candidates,
     all_policies_locked,
-    load_all_country_metrics,
-    apply_country_deltas,
-    insert_turn_history,
-    upsert_round_summary,
-    upsert_country_snapshot,
-    get_max_snapshot_round,
-    clear_round_data,
-    set_game_over,
+    get_resolution_steps,
+    clear_resolution_steps,
+    count_jobs,
+    get_job_by_key,
 )
 
-from ai_external import generate_external_moves, generate_domestic_events
-from ai_round import resolve_round_all_countries, generate_round_summary
-
-
-def _auto_modifiers_from_craziness(actor: str, craziness: int) -> Dict[str, int]:
-    """
-    Deterministic mapping: craziness (0..100) -> pressure deltas.
-    Keeps GM UI simple; still gives a transparent preview.
-    """
-    c = max(0, min(100, int(craziness)))
-    s = round((c - 50) / 10)  # approx -5..+5
-
-    if actor == "Russia":
-        return {
-            "eu_cohesion_delta": -max(0, s),
-            "threat_delta": max(0, s + 1),
-            "frontline_delta": max(0, s),
-            "energy_delta": max(0, s),
-            "migration_delta": max(0, s - 1),
-            "disinfo_delta": max(0, s + 1),
-            "trade_war_delta": max(0, s - 1),
-        }
-    if actor == "China":
-        return {
-            "eu_cohesion_delta": -max(0, s - 1),
-            "threat_delta": max(0, s - 1),
-            "frontline_delta": max(0, s - 2),
-            "energy_delta": max(0, s - 1),
-            "migration_delta": max(0, s - 2),
-            "disinfo_delta": max(0, s),
-            "trade_war_delta": max(0, s + 1),
-        }
-    # USA
-    return {
-        "eu_cohesion_delta": -max(0, s - 2),
-        "threat_delta": max(0, s - 1),
-        "frontline_delta": max(0, s - 1),
-        "energy_delta": max(0, s - 2),
-        "migration_delta": max(0, s - 2),
-        "disinfo_delta": max(0, s - 2),
-        "trade_war_delta": max(0, s),
-    }
+from logic.jobs import enqueue_job, job_is_active, job_snapshot, poll_interval_s
+from logic.speculative import start_speculative_candidates
+from logic.resolution import RESOLVE_STEPS, RESOLVE_STEP_LABELS, next_resolution_step
+from ui.components import schedule_rerun
 
 
 def _render_external_preview(ext_events: List[Dict[str, Any]]) -> None:
@@ -121,12 +72,7 @@ def render_gm_controls(
     phase: str,
     countries: List[str],
     countries_display: Dict[str, str],
-    country_defs: Dict[str, Dict[str, Any]],
     external_crazy_baseline_ranges: Dict[str, tuple],
-    apply_external_modifiers_to_eu: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]],
-    decay_pressures: Callable[[Dict[str, Any]], Dict[str, Any]],
-    progress_from_conditions: Callable[[Any], float],
-    evaluate_all_countries,  # may be None
 ) -> None:
     """
     GM flow (clean):
@@ -135,6 +81,9 @@ def render_gm_controls(
        No manual edits; only preview after generation.
     2) GM starts player phase
     3) GM resolves once all players locked both domains
+
+    Generation and resolve run as background jobs (logic/jobs.py); this view only enqueues
+    and polls, and re-attaches to a running job after a rerun or browser refresh.
     """
 
     with st.expander("🎛️ Game Master Steuerung (sequenziell)", expanded=False):
@@ -199,97 +148,71 @@ def render_gm_controls(
             st.caption("Keine manuellen Edits: nach Generierung gibt’s nur Preview.")
 
         gen_disabled = inputs_disabled or (not api_key)
-        if st.button("🤖 Jetzt generieren (KI)", disabled=gen_disabled, use_container_width=True, key=f"gm_gen_all_{round_no}"):
-            with st.spinner("KI generiert Außenmächte und Innenpolitik..."):
-                recent_summaries = get_recent_round_summaries(conn, limit=3)
-
-                # --- External moves ---
-                craziness_by_actor = {"USA": int(usa_c), "Russia": int(rus_c), "China": int(chi_c)}
-                moves_obj = generate_external_moves(
-                    api_key=api_key,
-                    model="mistral-small",
-                    round_no=round_no,
-                    eu_state=eu_before,
-                    recent_round_summaries=recent_summaries,
-                    craziness_by_actor=craziness_by_actor,
-                    temperature=0.8,
-                    top_p=0.95,
-                    max_tokens=1200,
-                )
+        gen_parallel = st.checkbox(
+            "Parallel generieren",
+            value=True,
+            disabled=gen_disabled,
+            help="Außenmächte und Innenpolitik gleichzeitig anfragen (EU-Druck nach Außenmächten wird lokal aus den Craziness-Werten berechnet).",
+            key=f"gm_gen_parallel_{round_no}",
+        )
+        gen_stream = st.checkbox(
+            "Live-Fortschritt (Streaming)",
+            value=True,
+            disabled=gen_disabled,
+            help="Antworten werden gestreamt; ungültige JSON-Antworten werden früh abgebrochen.",
+            key=f"gm_gen_stream_{round_no}",
+        )
+        # one job per generation; the key counts finished runs, so "generate again" is a new job
+        # while double clicks / reruns during a run attach to the running one
+        gen_prefix = f"gm_generate:{round_no}:"
+        gen_done = count_jobs(conn, key_prefix=gen_prefix, status="done")
+        gen_key = gen_prefix + str(gen_done)
+        gen_job = get_job_by_key(conn, gen_key)
+        gen_running = job_is_active(gen_job)
 
-                # Write external events (but override/ensure modifiers from craziness for transparency & consistency)
-                clear_external_events(conn, round_no)
-                moves_clean = []
-                for m in moves_obj.get("moves", []) or []:
-                    actor = m.get("actor", "")
-                    cz = int(m.get("craziness", craziness_by_actor.get(actor, 50)) or 0)
-                    mods = _auto_modifiers_from_craziness(actor, cz)
-                    moves_clean.append({
-                        "actor": actor,
-                        "headline": m.get("headline", ""),
-                        "quote": m.get("quote", ""),
-                        "craziness": cz,
-                        "modifiers": mods,
-                    })
-                    upsert_external_event(
-                        conn,
-                        round_no,
-                        actor=actor,
-                        headline=m.get("headline", ""),
-                        modifiers=mods,
-                        quote=m.get("quote", ""),
-                        craziness=cz,
-                    )
-
-                # Apply external modifiers to EU state (preview will show before/after)
-                global_context = str(moves_obj.get("global_context", eu_before.get("global_context", "")) or "")
-                eu_after = apply_external_modifiers_to_eu(eu_before, {"moves": moves_clean, "global_context": global_context})
-                set_eu_state(
-                    conn,
-                    cohesion=eu_after["cohesion"],
-                    global_context=eu_after["global_context"],
-                    threat_level=eu_after["threat_level"],
-                    frontline_pressure=eu_after["frontline_pressure"],
-                    energy_pressure=eu_after["energy_pressure"],
-                    migration_pressure=eu_after["migration_pressure"],
-                    disinfo_pressure=eu_after["disinfo_pressure"],
-                    trade_war_pressure=eu_after["trade_war_pressure"],
+        if st.button(
+            "🤖 Jetzt generieren (KI)",
+            disabled=gen_disabled or gen_running,
+            use_container_width=True,
+            key=f"gm_gen_all_{round_no}",
+        ) or gen_running:
+            gen_job_id = gen_job["id"] if gen_running else enqueue_job(
+                conn,
+                kind="gm_generate",
+                idem_key=gen_key,
+                payload={
+                    "round_no": int(round_no),
+                    "countries": list(countries),
+                    "craziness_by_actor": {"USA": int(usa_c), "Russia": int(rus_c), "China": int(chi_c)},
+                    "dom_baseline": int(dom_baseline),
+                    "concurrent": bool(gen_parallel),
+                    "stream": bool(gen_stream),
+                },
+                api_key=api_key,
+            )
+            gen_job, progress = job_snapshot(conn, gen_job_id)
+            if job_is_active(gen_job):
+                chars = progress.get("chars") or {}
+                st.info("⏳ KI generiert Außenmächte und Innenpolitik (Hintergrund-Job)...")
+                st.caption(
+                    f"📡 Außenmächte: {chars.get('external_moves', 0)} Zeichen | "
+                    f"Innenpolitik: {chars.get('domestic_events', 0)} Zeichen"
+                    + (f" • Versuch {gen_job['attempts']}/{gen_job['max_attempts']}" if gen_job["attempts"] > 1 else "")
                 )
+                schedule_rerun(poll_interval_s())
+            elif gen_job["status"] == "done":
+                st.rerun()
 
-                # --- Domestic events ---
-                clear_domestic_events(conn, round_no)
-                all_metrics = load_all_country_metrics(conn, countries)
-
-                # optional: pass baseline via temperature influence; simplest: tweak temperature a bit
-                temp_dom = 0.75 + (float(dom_baseline) / 100.0) * 0.25  # 0.75..1.0
-
-                dom_obj = generate_domestic_events(
-                    api_key=api_key,
-                    model="mistral-small",
-                    round_no=round_no,
-                    eu_state=get_eu_state(conn),
-                    countries=countries,
-                    countries_metrics=all_metrics,
-                    recent_round_summaries=recent_summaries,
-                    recent_actions_by_country={},  # keep simple; not needed for GM
-                    temperature=temp_dom,
-                    top_p=0.95,
-                    max_tokens=1400,
-                )
+        if gen_job and gen_job["status"] == "failed":
+            st.error(f"Generierung fehlgeschlagen ({gen_job['attempts']} Versuche): {gen_job['error']}")
 
-                for c in countries:
-                    e = (dom_obj.get("events", {}) or {}).get(c, {}) or {}
-                    upsert_domestic_event(
-                        conn,
-                        round_no,
-                        c,
-                        e.get("headline", ""),
-                        details=e.get("details", ""),
-                        craziness=int(e.get("craziness", 0) or 0),
-                    )
-
-                set_game_meta(conn, round_no, "external_generated")
-            st.rerun()
+        last_done = get_job_by_key(conn, gen_prefix + str(gen_done - 1)) if gen_done else None
+        if last_done:
+            res = last_done["result"] or {}
+            st.caption(
+                f"⏱️ Letzte Generierung: {res.get('elapsed_s', 0.0):.1f}s "
+                f"({'parallel' if res.get('concurrent') else 'sequenziell'}, Job gesamt {(last_done['finished_at'] - last_done['created_at']):.1f}s)"
+            )
 
         # ---------------------
         # Preview after generation (read-only)
@@ -340,6 +263,8 @@ def render_gm_controls(
             key=f"gm_publish_{round_no}",
         ):
             set_game_meta(conn, round_no, "actions_published")
+            # first option per country/domain is prepared in the background (budgeted)
+            start_speculative_candidates(conn, api_key=api_key, round_no=round_no, countries=countries)
             st.rerun()
 
         # ---------------------
@@ -359,188 +284,51 @@ def render_gm_controls(
             st.caption(f"Locked: {ready}/{len(countries)} Länder (Außen+Innen)")
 
         resolve_disabled = not (phase == "actions_published" and have_all_locks)
-        if st.button("🧮 Ergebnis der Runde kalkulieren", disabled=resolve_disabled, use_container_width=True, key=f"gm_resolve_{round_no}"):
-            with st.spinner("KI kalkuliert Gesamtergebnis der Runde..."):
-                recent_summaries = get_recent_round_summaries(conn, limit=3)
-                eu_before_resolve = get_eu_state(conn)
-                ext_events = get_external_events(conn, round_no)
-                dom_events = get_domestic_events(conn, round_no)
-                locks_now = get_policy_locks(conn, round_no=round_no)
-                all_metrics = load_all_country_metrics(conn, countries)
-
-                actions_texts: Dict[str, Dict[str, str]] = {}
-                locked_choices: Dict[str, str] = {}
-                chosen_actions_lines: List[str] = []
-
-                def _get_candidate_text(country: str, domain: str, slot: int) -> str:
-                    candidates = get_policy_candidates(conn, round_no=round_no, country=country, domain=domain)
-                    cand = next((x for x in candidates if int(x.get("slot")) == int(slot)), None)
-                    return str((cand or {}).get("action_text", ""))
-
-                for c in countries:
-                    ls = locks_now.get(c) or {}
-                    f_slot = int(ls.get("foreign") or 0)
-                    d_slot = int(ls.get("domestic") or 0)
-
-                    f_text = _get_candidate_text(c, "foreign", f_slot)
-                    d_text = _get_candidate_text(c, "domestic", d_slot)
-
-                    combined = f"[Außenpolitik | Option {f_slot}]\n{f_text}\n\n[Innenpolitik | Option {d_slot}]\n{d_text}".strip()
-
-                    actions_texts[c] = {"chosen": combined}
-                    locked_choices[c] = "chosen"
-                    chosen_actions_lines.append(f"- {countries_display.get(c, c)}: Außen {f_slot} / Innen {d_slot}")
-
-                chosen_actions_str = "\n".join(chosen_actions_lines)
-
-                result = resolve_round_all_countries(
-                    api_key=api_key,
-                    model="mistral-small",
-                    round_no=round_no,
-                    eu_state=eu_before_resolve,
-                    countries_metrics=all_metrics,
-                    countries_display=countries_display,
-                    actions_texts=actions_texts,
-                    locked_choices=locked_choices,
-                    recent_round_summaries=recent_summaries,
-                    external_events=ext_events,
-                    domestic_events=dom_events,
-                    temperature=0.6,
-                    top_p=0.95,
-                    max_tokens=1700,
-                )
 
-                eu_after = dict(eu_before_resolve)
-                eu_after["cohesion"] = eu_before_resolve["cohesion"] + int(result["eu"].get("kohäsion_delta", 0))
-                eu_after["global_context"] = str(result["eu"].get("global_context", eu_before_resolve["global_context"]))
-                eu_after = decay_pressures(eu_after)
-
-                set_eu_state(
-                    conn,
-                    cohesion=eu_after["cohesion"],
-                    global_context=eu_after["global_context"],
-                    threat_level=eu_after["threat_level"],
-                    frontline_pressure=eu_after["frontline_pressure"],
-                    energy_pressure=eu_after["energy_pressure"],
-                    migration_pressure=eu_after["migration_pressure"],
-                    disinfo_pressure=eu_after["disinfo_pressure"],
-                    trade_war_pressure=eu_after["trade_war_pressure"],
-                )
+        # Checkpoints of an earlier (failed) attempt -> resume instead of starting over
+        steps_done = get_resolution_steps(conn, round_no=round_no)
+        resume_at = next_resolution_step(steps_done) if steps_done else None
+        resolve_label = "🧮 Ergebnis der Runde kalkulieren"
+        if resume_at:
+            st.warning(
+                "Vorheriger Versuch abgebrochen. Gespeichert: "
+                + ", ".join(RESOLVE_STEP_LABELS[s] for s in RESOLVE_STEPS if s in steps_done)
+            )
+            resolve_label = f"🔁 Fortsetzen ab: {RESOLVE_STEP_LABELS[resume_at]}"
 
-                # Baseline snapshot (round_no-1) if needed
-                all_metrics_before = load_all_country_metrics(conn, countries)
-                eu_before_for_progress = get_eu_state(conn)
-                max_snap = get_max_snapshot_round(conn)
-                need_baseline = (max_snap is None) and (round_no >= 1)
-
-                if need_baseline:
-                    if evaluate_all_countries is not None:
-                        win_eval_before = evaluate_all_countries(
-                            all_country_metrics=all_metrics_before,
-                            eu_state=eu_before_for_progress,
-                            country_defs=country_defs,
-                        )
-                        for c in countries:
-                            res = win_eval_before.get(c, {})
-                            progress_before = progress_from_conditions(res.get("results") or [])
-                            upsert_country_snapshot(
-                                conn,
-                                round_no=round_no - 1,
-                                country=c,
-                                metrics=all_metrics_before[c],
-                                victory_progress=progress_before,
-                                is_winner=bool(res.get("is_winner")),
-                            )
-                    else:
-                        for c in countries:
-                            upsert_country_snapshot(
-                                conn,
-                                round_no=round_no - 1,
-                                country=c,
-                                metrics=all_metrics_before[c],
-                                victory_progress=0.0,
-                                is_winner=False,
-                            )
-
-                # Apply deltas + history
-                for c in countries:
-                    d = result["länder"].get(c) or {}
-                    apply_country_deltas(conn, c, d)
-
-                    chosen_action_text = actions_texts[c]["chosen"]
-                    insert_turn_history(
-                        conn,
-                        country=c,
-                        round_no=round_no,
-                        action_public=chosen_action_text,
-                        global_context=eu_after["global_context"],
-                        deltas=d,
-                    )
-
-                eu_after_fresh = get_eu_state(conn)
-
-                summary_text = generate_round_summary(
-                    api_key=api_key,
-                    model="mistral-small",
-                    round_no=round_no,
-                    memory_in=recent_summaries,
-                    eu_before=eu_before_resolve,
-                    eu_after=eu_after_fresh,
-                    external_events=ext_events,
-                    domestic_events=dom_events,
-                    chosen_actions_str=chosen_actions_str,
-                    result_obj=result,
-                    temperature=0.4,
-                    top_p=0.95,
-                    max_tokens=520,
-                )
-                upsert_round_summary(conn, round_no, summary_text)
-
-                # Snapshots + win check
-                winners: List[str] = []
-                all_metrics_now = load_all_country_metrics(conn, countries)
-                eu_now = get_eu_state(conn)
-
-                if evaluate_all_countries is not None:
-                    win_eval = evaluate_all_countries(
-                        all_country_metrics=all_metrics_now,
-                        eu_state=eu_now,
-                        country_defs=country_defs,
-                    )
-                    for c in countries:
-                        res = win_eval.get(c, {})
-                        is_winner_now = bool(res.get("is_winner"))
-                        progress = progress_from_conditions(res.get("results") or [])
-                        upsert_country_snapshot(
-                            conn,
-                            round_no=round_no,
-                            country=c,
-                            metrics=all_metrics_now[c],
-                            victory_progress=progress,
-                            is_winner=is_winner_now,
-                        )
-                        if is_winner_now:
-                            winners.append(c)
-                else:
-                    for c in countries:
-                        upsert_country_snapshot(
-                            conn,
-                            round_no=round_no,
-                            country=c,
-                            metrics=all_metrics_now[c],
-                            victory_progress=0.0,
-                            is_winner=False,
-                        )
-
-                # Clean round-specific choice data (candidates/locks) for this round
-                clear_round_data(conn, round_no)
-
-                if winners:
-                    set_game_over(conn, winner_country=winners[0], winner_round=round_no, reason="win_conditions")
-                else:
-                    set_game_meta(conn, round_no + 1, "setup")
-
-            st.success("Runde aufgelöst.")
+        resolve_key = f"round_resolution:{round_no}"
+        resolve_job = get_job_by_key(conn, resolve_key)
+        resolve_running = job_is_active(resolve_job)
+
+        if st.button(
+            resolve_label,
+            disabled=resolve_disabled or resolve_running,
+            use_container_width=True,
+            key=f"gm_resolve_{round_no}",
+        ) or resolve_running:
+            # a failed job is requeued under the same key and resumes at its checkpoint
+            resolve_job_id = resolve_job["id"] if resolve_running else enqueue_job(
+                conn,
+                kind="round_resolution",
+                idem_key=resolve_key,
+                payload={"round_no": int(round_no), "countries": list(countries)},
+                api_key=api_key,
+            )
+            resolve_job, progress = job_snapshot(conn, resolve_job_id)
+            if job_is_active(resolve_job):
+                st.info("⏳ KI kalkuliert Gesamtergebnis der Runde (Hintergrund-Job)...")
+                step = progress.get("step")
+                if step:
+                    st.caption(f"{RESOLVE_STEP_LABELS[step]}" + (" (aus Checkpoint)" if progress.get("reused") else " …"))
+                schedule_rerun(poll_interval_s())
+            elif resolve_job["status"] == "done":
+                st.rerun()
+
+        if resolve_job and resolve_job["status"] == "failed":
+            st.error(f"Resolve fehlgeschlagen ({resolve_job['attempts']} Versuche): {resolve_job['error']}")
+
+        if resume_at and st.button("🗑️ Checkpoints verwerfen (neu kalkulieren)", use_container_width=True, key=f"gm_resolve_reset_{round_no}"):
+            clear_resolution_steps(conn, round_no)
             st.rerun()
 
         st.caption("Flow: GM KI-Generierung → Spieler generieren/locken → Resolve")
@@ -0,0 +1,277 @@
+# logic/gm_generation.py
+"""
+GM step 1: external moves (USA/China/Russia) + domestic headlines via AI.
+
+The domestic prompt only needs the EU pressures *after* the external moves. Those follow
+deterministically from the craziness sliders (auto_modifiers_from_craziness), so in
+concurrent mode both LLM calls run at the same time and the GM waits for the slower one
+instead of the sum of both.
+
+With stream=True both answers are streamed; on_progress({call_site: chars_received})
+is called on the calling thread (Streamlit widgets must not be touched from the workers).
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Dict, Any, List, Callable, Optional
+import threading
+import time
+
+from db import (
+    get_eu_state,
+    get_recent_round_summaries,
+    load_all_country_metrics,
+    set_eu_state,
+    clear_external_events,
+    upsert_external_event,
+    clear_domestic_events,
+    upsert_domestic_event,
+    set_game_meta,
+    transaction,
+)
+from logic.game_logic import apply_external_modifiers_to_eu as _apply_external_modifiers_to_eu, clamp_eu_state
+from logic.jobs import job_handler
+from ai_external import generate_external_moves, generate_domestic_events
+from llm_routing import route
+
+EXTERNAL_ACTORS = ("USA", "Russia", "China")
+
+
+def auto_modifiers_from_craziness(actor: str, craziness: int) -> Dict[str, int]:
+    """
+    Deterministic mapping: craziness (0..100) -> pressure deltas.
+    Keeps GM UI simple; still gives a transparent preview.
+    """
+    c = max(0, min(100, int(craziness)))
+    s = round((c - 50) / 10)  # approx -5..+5
+
+    if actor == "Russia":
+        return {
+            "eu_cohesion_delta": -max(0, s),
+            "threat_delta": max(0, s + 1),
+            "frontline_delta": max(0, s),
+            "energy_delta": max(0, s),
+            "migration_delta": max(0, s - 1),
+            "disinfo_delta": max(0, s + 1),
+            "trade_war_delta": max(0, s - 1),
+        }
+    if actor == "China":
+        return {
+            "eu_cohesion_delta": -max(0, s - 1),
+            "threat_delta": max(0, s - 1),
+            "frontline_delta": max(0, s - 2),
+            "energy_delta": max(0, s - 1),
+            "migration_delta": max(0, s - 2),
+            "disinfo_delta": max(0, s),
+            "trade_war_delta": max(0, s + 1),
+        }
+    # USA
+    return {
+        "eu_cohesion_delta": -max(0, s - 2),
+        "threat_delta": max(0, s - 1),
+        "frontline_delta": max(0, s - 1),
+        "energy_delta": max(0, s - 2),
+        "migration_delta": max(0, s - 2),
+        "disinfo_delta": max(0, s - 2),
+        "trade_war_delta": max(0, s),
+    }
+
+
+def _clean_moves(moves_obj: Dict[str, Any], craziness_by_actor: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Override/ensure modifiers from craziness for transparency & consistency."""
+    moves_clean = []
+    for m in moves_obj.get("moves", []) or []:
+        actor = m.get("actor", "")
+        cz = int(m.get("craziness", craziness_by_actor.get(actor, 50)) or 0)
+        moves_clean.append({
+            "actor": actor,
+            "headline": m.get("headline", ""),
+            "quote": m.get("quote", ""),
+            "craziness": cz,
+            "modifiers": auto_modifiers_from_craziness(actor, cz),
+        })
+    return moves_clean
+
+
+def generate_gm_inputs(
+    *,
+    conn,
+    api_key: str,
+    round_no: int,
+    eu_before: Dict[str, Any],
+    countries: List[str],
+    craziness_by_actor: Dict[str, int],
+    dom_baseline: int,
+    concurrent: bool = True,
+    apply_external_modifiers_to_eu: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]] = _apply_external_modifiers_to_eu,
+    stream: bool = False,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Runs both LLM calls (no DB writes). DB reads happen on the calling thread only.
+
+    returns: {"moves": [...], "eu_after": {...}, "dom_events": {country: {...}}, "elapsed_s": float, "concurrent": bool}
+    """
+    t0 = time.perf_counter()
+    recent_summaries = get_recent_round_summaries(conn, limit=3)
+    all_metrics = load_all_country_metrics(conn, countries)
+
+    # optional: pass baseline via temperature influence; simplest: tweak temperature a bit
+    temp_dom = 0.75 + (float(dom_baseline) / 100.0) * 0.25  # 0.75..1.0
+
+    progress: Dict[str, int] = {"external_moves": 0, "domestic_events": 0}
+    progress_lock = threading.Lock()
+    caller = threading.get_ident()
+
+    def _on_text(call_site: str) -> Callable[[str, Any], None]:
+        def _cb(text: str, _probe: Any) -> None:
+            with progress_lock:
+                progress[call_site] = len(text)
+                snapshot = dict(progress)
+            if on_progress is not None and threading.get_ident() == caller:
+                on_progress(snapshot)
+        return _cb
+
+    def _external() -> Dict[str, Any]:
+        r = route("external_moves")
+        return generate_external_moves(
+            api_key=api_key,
+            model=r["model"],
+            round_no=round_no,
+            eu_state=eu_before,
+            recent_round_summaries=recent_summaries,
+            craziness_by_actor=craziness_by_actor,
+            temperature=r["temperature"],
+            top_p=0.95,
+            max_tokens=r["max_tokens"],
+            stream=stream,
+            on_text=_on_text("external_moves") if stream else None,
+        )
+
+    def _domestic(eu_for_prompt: Dict[str, Any]) -> Dict[str, Any]:
+        r = route("domestic_events")  # temperature stays driven by the GM's baseline slider
+        return generate_domestic_events(
+            api_key=api_key,
+            model=r["model"],
+            round_no=round_no,
+            eu_state=eu_for_prompt,
+            countries=countries,
+            countries_metrics=all_metrics,
+            recent_round_summaries=recent_summaries,
+            recent_actions_by_country={},  # keep simple; not needed for GM
+            temperature=temp_dom,
+            top_p=0.95,
+            max_tokens=r["max_tokens"],
+            stream=stream,
+            on_text=_on_text("domestic_events") if stream else None,
+        )
+
+    if concurrent:
+        # Pressures after the external moves, computed locally (global_context stays the old one)
+        local_moves = [
+            {"actor": a, "modifiers": auto_modifiers_from_craziness(a, craziness_by_actor.get(a, 50))}
+            for a in EXTERNAL_ACTORS
+        ]
+        eu_for_domestic = clamp_eu_state(apply_external_modifiers_to_eu(eu_before, {"moves": local_moves}))
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="gm-gen") as pool:
+            # copy_context: the workers keep the caller's LLM lane / telemetry round
+            fut_ext = pool.submit(copy_context().run, _external)
+            fut_dom = pool.submit(copy_context().run, _domestic, eu_for_domestic)
+            pending = {fut_ext, fut_dom}
+            while pending:
+                _done, pending = wait(pending, timeout=0.25)
+                if on_progress is not None:
+                    with progress_lock:
+                        snapshot = dict(progress)
+                    on_progress(snapshot)
+            moves_obj = fut_ext.result()
+            dom_obj = fut_dom.result()
+        moves_clean = _clean_moves(moves_obj, craziness_by_actor)
+    else:
+        moves_obj = _external()
+        moves_clean = _clean_moves(moves_obj, craziness_by_actor)
+
+    # EU state after external modifiers (preview will show before/after)
+    global_context = str(moves_obj.get("global_context", eu_before.get("global_context", "")) or "")
+    eu_after = clamp_eu_state(
+        apply_external_modifiers_to_eu(eu_before, {"moves": moves_clean, "global_context": global_context})
+    )
+
+    if not concurrent:
+        dom_obj = _domestic(eu_after)
+
+    return {
+        "moves": moves_clean,
+        "eu_after": eu_after,
+        "dom_events": dom_obj.get("events", {}) or {},
+        "elapsed_s": time.perf_counter() - t0,
+        "concurrent": bool(concurrent),
+    }
+
+
+def write_gm_inputs(conn, *, round_no: int, countries: List[str], gen: Dict[str, Any]) -> None:
+    """Persist the output of generate_gm_inputs in one transaction."""
+    eu_after = gen["eu_after"]
+    with transaction(conn):
+        clear_external_events(conn, round_no)
+        for m in gen["moves"]:
+            upsert_external_event(
+                conn,
+                round_no,
+                actor=m["actor"],
+                headline=m["headline"],
+                modifiers=m["modifiers"],
+                quote=m["quote"],
+                craziness=m["craziness"],
+            )
+        set_eu_state(
+            conn,
+            cohesion=eu_after["cohesion"],
+            global_context=eu_after["global_context"],
+            threat_level=eu_after["threat_level"],
+            frontline_pressure=eu_after["frontline_pressure"],
+            energy_pressure=eu_after["energy_pressure"],
+            migration_pressure=eu_after["migration_pressure"],
+            disinfo_pressure=eu_after["disinfo_pressure"],
+            trade_war_pressure=eu_after["trade_war_pressure"],
+        )
+
+        clear_domestic_events(conn, round_no)
+        for c in countries:
+            e = gen["dom_events"].get(c, {}) or {}
+            upsert_domestic_event(
+                conn,
+                round_no,
+                c,
+                e.get("headline", ""),
+                details=e.get("details", ""),
+                craziness=int(e.get("craziness", 0) or 0),
+            )
+
+        set_game_meta(conn, round_no, "external_generated")
+
+
+@job_handler("gm_generate")
+def run_gm_generate_job(conn, payload: Dict[str, Any], ctx) -> Dict[str, Any]:
+    """
+    Background job (logic/jobs.py): generate + write. payload {"round_no", "countries",
+    "craziness_by_actor", "dom_baseline", "concurrent", "stream"}; streamed characters per
+    call site are published as progress {"chars": {...}}.
+    """
+    round_no = int(payload["round_no"])
+    countries = list(payload["countries"])
+    gen = generate_gm_inputs(
+        conn=conn,
+        api_key=ctx.api_key,
+        round_no=round_no,
+        eu_before=get_eu_state(conn),
+        countries=countries,
+        craziness_by_actor={k: int(v) for k, v in payload["craziness_by_actor"].items()},
+        dom_baseline=int(payload["dom_baseline"]),
+        concurrent=bool(payload.get("concurrent", True)),
+        stream=bool(payload.get("stream", False)),
+        on_progress=lambda chars: ctx.progress(chars=chars),
+    )
+    write_gm_inputs(conn, round_no=round_no, countries=countries, gen=gen)
+    return {"elapsed_s": gen["elapsed_s"], "concurrent": gen["concurrent"]}
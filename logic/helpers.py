@@ -10,6 +10,17 @@ def summarize_recent_actions(rows) -> str:
     return " | ".join(items)
 
 
+def progress_from_conditions(cond_results) -> float:
+    try:
+        total = len(cond_results)
+        if total <= 0:
+            return 0.0
+        ok = sum(1 for r in cond_results if getattr(r, "ok", False))
+        return round(ok / total * 100.0, 2)
+    except Exception:
+        return 0.0
+
+
 def format_external_events(events: List[Dict[str, Any]]) -> str:
     if not events:
         return "Keine."
@@ -0,0 +1,222 @@
+# logic/jobs.py
+"""
+Background jobs for LLM work: persistent job table (db.jobs) + in-process worker pool.
+
+The Streamlit script only enqueues a job and polls its row, so a browser refresh or a
+rerun in the middle of a 20-second resolve no longer loses the work:
+
+    job_id = enqueue_job(conn, kind="round_resolution", idem_key=f"round_resolution:{r}", payload={...})
+    job, progress = job_snapshot(conn, job_id)   # status: queued | running | done | failed
+
+- polling never blocks the script: one read per run, the page renders the progress and
+  reruns after poll_interval_s while the job is active (ui.components.schedule_rerun)
+
+- idem_key: enqueueing an existing key returns the existing job (double clicks, reruns,
+  a second browser tab); a failed job is requeued with a fresh attempt budget
+- retries: a failing attempt is requeued with exponential backoff until max_attempts
+- timing per job: created_at, started_at (first attempt), finished_at, run_ms (last attempt)
+- progress: handlers may publish a small dict (ctx.progress) that pollers read via
+  job_progress(); it lives in memory only
+- lease: a heartbeat thread refreshes heartbeat_at of the jobs this process runs; when
+  the pool starts, only "running" jobs whose lease expired (lease_s without a heartbeat:
+  the process running them died) are requeued, jobs of other live processes are left alone
+- LLM calls of a job are attributed to payload["round_no"] in the telemetry
+  (llm_telemetry.round_scope)
+
+Handlers are registered per kind with @job_handler("kind") in the module that owns the
+work (logic/gm_generation.py, logic/resolution.py, logic/speculative.py) and receive
+(conn, payload, ctx). Payloads are JSON; the API key is passed in memory, never stored.
+
+Every profile key can be overridden via env (JOBS_WORKERS, JOBS_MAX_ATTEMPTS, ...).
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional, Set, Tuple
+import importlib
+import os
+import threading
+import time
+
+from db import (
+    get_conn,
+    release_conn,
+    create_job,
+    requeue_failed_job,
+    claim_job,
+    finish_job,
+    fail_job,
+    heartbeat_jobs,
+    requeue_stale_jobs,
+    get_job,
+)
+from llm_telemetry import round_scope
+
+JOB_PROFILE: Dict[str, float] = {
+    "workers": 4,
+    "max_attempts": 3,
+    "retry_backoff_s": 2.0,  # 2s, 4s, 8s, ...
+    "poll_interval_s": 0.5,  # UI rerun interval while a job is active
+    "lease_s": 60.0,  # a running job without a heartbeat for this long counts as orphaned
+}
+
+# modules that register handlers (imported before the first job runs)
+HANDLER_MODULES = ("logic.gm_generation", "logic.resolution", "logic.speculative")
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_HANDLERS: Dict[str, Callable[..., Any]] = {}
+_API_KEYS: Dict[int, str] = {}
+_PROGRESS: Dict[int, Dict[str, Any]] = {}
+_RUNNING: Set[int] = set()  # jobs this process runs (heartbeat)
+_LOCK = threading.Lock()
+_POOL: Optional[ThreadPoolExecutor] = None
+
+
+class JobContext:
+    """Passed to handlers: job id, API key, and a progress dict pollers can read."""
+
+    def __init__(self, job_id: int, api_key: str):
+        self.job_id = job_id
+        self.api_key = api_key
+
+    def progress(self, **values: Any) -> None:
+        with _LOCK:
+            _PROGRESS.setdefault(self.job_id, {}).update(values)
+
+
+def job_handler(kind: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    def _register(fn: Callable[..., Any]) -> Callable[..., Any]:
+        _HANDLERS[kind] = fn
+        return fn
+    return _register
+
+
+def _profile() -> Dict[str, float]:
+    out = dict(JOB_PROFILE)
+    for key in out:
+        raw = (os.getenv(f"JOBS_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = type(JOB_PROFILE[key])(raw)
+    return out
+
+
+def _pool(conn) -> ThreadPoolExecutor:
+    """Process-wide pool; on first use, jobs left behind by an earlier process are resumed."""
+    global _POOL
+    with _LOCK:
+        if _POOL is not None:
+            return _POOL
+        _POOL = ThreadPoolExecutor(max_workers=max(1, int(_profile()["workers"])), thread_name_prefix="jobs")
+        pool = _POOL
+    threading.Thread(target=_heartbeat_loop, daemon=True, name="jobs-heartbeat").start()
+    for name in HANDLER_MODULES:
+        importlib.import_module(name)
+    for job_id in requeue_stale_jobs(conn, now=time.time(), lease_s=_profile()["lease_s"]):
+        pool.submit(_run, job_id)
+    return pool
+
+
+def _heartbeat_loop() -> None:
+    """Refreshes the lease of the running jobs of this process, a few times per lease."""
+    while True:
+        time.sleep(max(1.0, _profile()["lease_s"] / 3.0))
+        with _LOCK:
+            job_ids = sorted(_RUNNING)
+        if not job_ids:
+            continue
+        conn = get_conn()
+        try:
+            heartbeat_jobs(conn, job_ids, now=time.time())
+        except Exception:  # noqa: BLE001 - e.g. database locked; the next beat retries
+            pass
+        finally:
+            release_conn(conn)
+
+
+def enqueue_job(
+    conn,
+    *,
+    kind: str,
+    idem_key: str,
+    payload: Dict[str, Any],
+    api_key: Optional[str] = None,
+    max_attempts: Optional[int] = None,
+) -> int:
+    """Create (or reuse, by idem_key) a job and hand it to the worker pool. Returns the job id."""
+    pool = _pool(conn)
+    attempts = int(max_attempts if max_attempts is not None else _profile()["max_attempts"])
+    job_id, created = create_job(conn, kind=kind, idem_key=idem_key, payload=payload, max_attempts=attempts, now=time.time())
+    if not created and not requeue_failed_job(conn, job_id, payload=payload, max_attempts=attempts):
+        return job_id  # queued/running/done: nothing to start
+    with _LOCK:
+        if api_key:
+            _API_KEYS[job_id] = api_key
+        _PROGRESS.pop(job_id, None)
+    pool.submit(_run, job_id)
+    return job_id
+
+
+def _resubmit_later(job_id: int, delay_s: float) -> None:
+    timer = threading.Timer(delay_s, lambda: _POOL.submit(_run, job_id))
+    timer.daemon = True
+    timer.start()
+
+
+def _forget(job_id: int) -> None:
+    with _LOCK:
+        _API_KEYS.pop(job_id, None)
+        _PROGRESS.pop(job_id, None)
+
+
+def _run(job_id: int) -> None:
+    conn = get_conn()
+    claimed = False
+    try:
+        if not claim_job(conn, job_id, now=time.time()):
+            return  # another worker has it, or it is no longer queued
+        claimed = True
+        with _LOCK:
+            _RUNNING.add(job_id)
+        job = get_job(conn, job_id)
+        with _LOCK:
+            api_key = _API_KEYS.get(job_id) or (os.getenv("MISTRAL_API_KEY") or "").strip()
+        ctx = JobContext(job_id, api_key)
+        t0 = time.perf_counter()
+        try:
+            handler = _HANDLERS[job["kind"]]
+            with round_scope(job["payload"].get("round_no")):
+                result = handler(conn, job["payload"], ctx)
+        except Exception as e:
+            run_ms = (time.perf_counter() - t0) * 1000.0
+            final = job["attempts"] >= job["max_attempts"] or job["kind"] not in _HANDLERS
+            fail_job(conn, job_id, error=f"{type(e).__name__}: {e}", run_ms=run_ms, final=final, now=time.time())
+            if not final:
+                _resubmit_later(job_id, _profile()["retry_backoff_s"] * (2 ** (job["attempts"] - 1)))
+                return
+            _forget(job_id)
+            return
+        finish_job(conn, job_id, result=result, run_ms=(time.perf_counter() - t0) * 1000.0, now=time.time())
+        _forget(job_id)
+    finally:
+        if claimed:
+            with _LOCK:
+                _RUNNING.discard(job_id)
+        release_conn(conn)
+
+
+def job_progress(job_id: int) -> Dict[str, Any]:
+    with _LOCK:
+        return dict(_PROGRESS.get(job_id) or {})
+
+
+def job_is_active(job: Optional[Dict[str, Any]]) -> bool:
+    return bool(job) and job["status"] in ACTIVE_STATUSES
+
+
+def poll_interval_s() -> float:
+    return float(_profile()["poll_interval_s"])
+
+
+def job_snapshot(conn, job_id: int) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """One non-blocking read for pollers: (job row, progress)."""
+    return get_job(conn, job_id), job_progress(job_id)
@@ -0,0 +1,373 @@
+# logic/resolution.py
+"""
+Round resolution as a persisted, resumable pipeline.
+
+Steps (checkpointed in round_resolution_steps):
+  1) resolve    LLM and/or rules engine: deltas     -> output stored, reused on retry
+  2) summary    LLM: round chronicle               -> output stored, reused on retry
+  3) apply      EU state, deltas, history, summary  \
+  4) snapshot   dashboard snapshots                  } one DB transaction, checkpoints
+  5) win_check  game over / next round               /  written inside it
+
+The LLM steps run outside the write lock. If anything fails, the GM clicks again and the
+pipeline resumes at the failed step: completed LLM calls are not re-issued and deltas
+cannot be applied twice (the "apply" checkpoint commits together with the deltas).
+
+How the resolve step computes the deltas is set by RESOLVE_MODE (logic/rules_resolve.py):
+LLM only, LLM with the local rules engine as fallback (default) or as a checked baseline,
+or the rules engine alone.
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from db import (
+    get_external_events,
+    get_domestic_events,
+    get_recent_round_summaries,
+    get_eu_state,
+    set_eu_state,
+    set_game_meta,
+    get_policy_locks,
+    get_policy_candidates,
+    load_all_country_metrics,
+    apply_country_deltas_bulk,
+    insert_turn_history_bulk,
+    upsert_round_summary,
+    upsert_country_snapshot,
+    get_max_snapshot_round,
+    clear_round_data,
+    set_game_over,
+    transaction,
+    save_resolution_step,
+    get_resolution_steps,
+)
+from logic.game_logic import clamp_eu_state, decay_pressures
+from logic.helpers import progress_from_conditions
+from logic.jobs import job_handler
+from logic.rules_resolve import check_against_baseline, count as count_rules, resolve_by_rules, resolve_mode
+from ai_round import resolve_round_all_countries, generate_round_summary
+from llm_resilience import is_transient
+from llm_routing import route
+from countries import COUNTRY_DEFS
+
+try:
+    from win import evaluate_all_countries as _evaluate_all_countries
+except Exception:
+    _evaluate_all_countries = None
+
+RESOLVE_STEPS = ("resolve", "summary", "apply", "snapshot", "win_check")
+
+RESOLVE_STEP_LABELS = {
+    "resolve": "Resolve",
+    "summary": "Zusammenfassung",
+    "apply": "Deltas anwenden",
+    "snapshot": "Snapshots",
+    "win_check": "Siegprüfung",
+}
+
+
+def next_resolution_step(done: Dict[str, Any]) -> Optional[str]:
+    """First step without checkpoint (None == round fully resolved)."""
+    return next((s for s in RESOLVE_STEPS if s not in done), None)
+
+
+def _collect_inputs(conn, *, round_no: int, countries: List[str], countries_display: Dict[str, str]) -> Dict[str, Any]:
+    """Everything the round is resolved from. Nothing is written before the final transaction,
+    so on a retry these reads return the same state as on the first attempt."""
+    locks_now = get_policy_locks(conn, round_no=round_no)
+
+    actions_texts: Dict[str, Dict[str, str]] = {}
+    locked_choices: Dict[str, str] = {}
+    chosen_actions_lines: List[str] = []
+    impacts: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def _get_candidate(country: str, domain: str, slot: int) -> Dict[str, Any]:
+        candidates = get_policy_candidates(conn, round_no=round_no, country=country, domain=domain)
+        return next((x for x in candidates if int(x.get("slot")) == int(slot)), None) or {}
+
+    for c in countries:
+        ls = locks_now.get(c) or {}
+        f_slot = int(ls.get("foreign") or 0)
+        d_slot = int(ls.get("domestic") or 0)
+
+        f_cand = _get_candidate(c, "foreign", f_slot)
+        d_cand = _get_candidate(c, "domestic", d_slot)
+        f_text = str(f_cand.get("action_text", ""))
+        d_text = str(d_cand.get("action_text", ""))
+        impacts[c] = {"foreign": f_cand.get("impact") or {}, "domestic": d_cand.get("impact") or {}}
+
+        combined = f"[Außenpolitik | Option {f_slot}]\n{f_text}\n\n[Innenpolitik | Option {d_slot}]\n{d_text}".strip()
+
+        actions_texts[c] = {"chosen": combined}
+        locked_choices[c] = "chosen"
+        chosen_actions_lines.append(f"- {countries_display.get(c, c)}: Außen {f_slot} / Innen {d_slot}")
+
+    return {
+        "recent_summaries": get_recent_round_summaries(conn, limit=3),
+        "eu_before": get_eu_state(conn),
+        "ext_events": get_external_events(conn, round_no),
+        "dom_events": get_domestic_events(conn, round_no),
+        "all_metrics": load_all_country_metrics(conn, countries),
+        "actions_texts": actions_texts,
+        "locked_choices": locked_choices,
+        "impacts": impacts,
+        "chosen_actions_str": "\n".join(chosen_actions_lines),
+    }
+
+
+def _resolve(*, api_key: str, round_no: int, inp: Dict[str, Any], countries_display: Dict[str, str]) -> Dict[str, Any]:
+    """Resolve step according to resolve_mode(): LLM, rules engine, or LLM with rules fallback/baseline."""
+    mode = resolve_mode()
+
+    def _rules() -> Dict[str, Any]:
+        return resolve_by_rules(
+            eu_state=inp["eu_before"],
+            countries_metrics=inp["all_metrics"],
+            impacts=inp["impacts"],
+            external_events=inp["ext_events"],
+            domestic_events=inp["dom_events"],
+        )
+
+    if mode == "rules":
+        count_rules("rules")
+        return _rules()
+
+    r = route("resolve")
+    try:
+        result = resolve_round_all_countries(
+            api_key=api_key,
+            model=r["model"],
+            round_no=round_no,
+            eu_state=inp["eu_before"],
+            countries_metrics=inp["all_metrics"],
+            countries_display=countries_display,
+            actions_texts=inp["actions_texts"],
+            locked_choices=inp["locked_choices"],
+            recent_round_summaries=inp["recent_summaries"],
+            external_events=inp["ext_events"],
+            domestic_events=inp["dom_events"],
+            temperature=r["temperature"],
+            top_p=0.95,
+            max_tokens=r["max_tokens"],
+            allow_partial=mode != "llm",
+        )
+    except Exception as e:
+        if mode == "llm" or not is_transient(e):
+            raise
+        count_rules("fallback")  # LLM timed out / unavailable: the round goes on with the rules result
+        return _rules()
+
+    count_rules("llm")
+    missing = [c for c in inp["all_metrics"] if not isinstance(result["länder"].get(c), dict)]
+    baseline = _rules() if missing or mode == "checked" else None
+    if missing:
+        # countries the LLM (and its fill) left out get the rules result, the rest of the answer stays
+        result["länder"].update({c: baseline["länder"][c] for c in missing})
+        count_rules("partial", len(missing))
+    if mode == "checked":
+        result = check_against_baseline(result, baseline)
+    return result
+
+
+def _write_snapshots(
+    conn,
+    *,
+    round_no: int,
+    countries: List[str],
+    eu_state: Dict[str, Any],
+    country_defs: Dict[str, Dict[str, Any]],
+    evaluate_all_countries,
+) -> List[str]:
+    """Snapshot of the current metrics for `round_no`; returns winners."""
+    winners: List[str] = []
+    all_metrics_now = load_all_country_metrics(conn, countries)
+
+    if evaluate_all_countries is None:
+        for c in countries:
+            upsert_country_snapshot(
+                conn,
+                round_no=round_no,
+                country=c,
+                metrics=all_metrics_now[c],
+                victory_progress=0.0,
+                is_winner=False,
+            )
+        return winners
+
+    win_eval = evaluate_all_countries(
+        all_country_metrics=all_metrics_now,
+        eu_state=eu_state,
+        country_defs=country_defs,
+    )
+    for c in countries:
+        res = win_eval.get(c, {})
+        is_winner_now = bool(res.get("is_winner"))
+        upsert_country_snapshot(
+            conn,
+            round_no=round_no,
+            country=c,
+            metrics=all_metrics_now[c],
+            victory_progress=progress_from_conditions(res.get("results") or []),
+            is_winner=is_winner_now,
+        )
+        if is_winner_now:
+            winners.append(c)
+    return winners
+
+
+def run_round_resolution(
+    *,
+    conn,
+    api_key: str,
+    round_no: int,
+    countries: List[str],
+    countries_display: Dict[str, str],
+    country_defs: Dict[str, Dict[str, Any]],
+    evaluate_all_countries,  # may be None
+    on_step: Optional[Callable[[str, bool], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Runs (or resumes) the resolution of `round_no`.
+    on_step(step, reused) is called before each step (for progress display).
+
+    returns: {"winners": [...], "reused": [steps taken from checkpoints], "already_done": bool}
+    """
+    done = get_resolution_steps(conn, round_no=round_no)
+    if "apply" in done:
+        # a concurrent/previous attempt already committed the round
+        return {"winners": list((done.get("win_check") or {}).get("winners") or []), "reused": list(done), "already_done": True}
+
+    reused: List[str] = []
+
+    def _step(name: str) -> bool:
+        is_reused = name in done
+        if is_reused:
+            reused.append(name)
+        if on_step is not None:
+            on_step(name, is_reused)
+        return is_reused
+
+    inp = _collect_inputs(conn, round_no=round_no, countries=countries, countries_display=countries_display)
+    eu_before = inp["eu_before"]
+
+    # 1) resolve (LLM and/or rules, see RESOLVE_MODE)
+    if _step("resolve"):
+        result = done["resolve"]
+    else:
+        result = _resolve(api_key=api_key, round_no=round_no, inp=inp, countries_display=countries_display)
+        save_resolution_step(conn, round_no=round_no, step="resolve", output=result)
+
+    eu_after = dict(eu_before)
+    eu_after["cohesion"] = eu_before["cohesion"] + int(result["eu"].get("kohäsion_delta", 0))
+    eu_after["global_context"] = str(result["eu"].get("global_context", eu_before["global_context"]))
+    eu_after = clamp_eu_state(decay_pressures(eu_after))
+
+    # 2) summary (LLM)
+    if _step("summary"):
+        summary_text = str((done["summary"] or {}).get("summary", ""))
+    else:
+        r = route("summary")
+        summary_text = generate_round_summary(
+            api_key=api_key,
+            model=r["model"],
+            round_no=round_no,
+            memory_in=inp["recent_summaries"],
+            eu_before=eu_before,
+            eu_after=eu_after,
+            external_events=inp["ext_events"],
+            domestic_events=inp["dom_events"],
+            chosen_actions_str=inp["chosen_actions_str"],
+            result_obj=result,
+            temperature=r["temperature"],
+            top_p=0.95,
+            max_tokens=r["max_tokens"],
+        )
+        save_resolution_step(conn, round_no=round_no, step="summary", output={"summary": summary_text})
+
+    # 3-5) all writes of the round: one transaction, checkpoints included
+    with transaction(conn):
+        if "apply" in get_resolution_steps(conn, round_no=round_no):
+            # lost the race against another GM session while waiting for the write lock
+            return {"winners": [], "reused": reused, "already_done": True}
+
+        _step("apply")
+        set_eu_state(
+            conn,
+            cohesion=eu_after["cohesion"],
+            global_context=eu_after["global_context"],
+            threat_level=eu_after["threat_level"],
+            frontline_pressure=eu_after["frontline_pressure"],
+            energy_pressure=eu_after["energy_pressure"],
+            migration_pressure=eu_after["migration_pressure"],
+            disinfo_pressure=eu_after["disinfo_pressure"],
+            trade_war_pressure=eu_after["trade_war_pressure"],
+        )
+
+        # Baseline snapshot (round_no-1) before the deltas, if the dashboard is still empty
+        if get_max_snapshot_round(conn) is None and round_no >= 1:
+            _write_snapshots(
+                conn,
+                round_no=round_no - 1,
+                countries=countries,
+                eu_state=eu_after,
+                country_defs=country_defs,
+                evaluate_all_countries=evaluate_all_countries,
+            )
+
+        deltas_by_country = {c: (result["länder"].get(c) or {}) for c in countries}
+        apply_country_deltas_bulk(conn, deltas_by_country)
+        insert_turn_history_bulk(
+            conn,
+            round_no=round_no,
+            global_context=eu_after["global_context"],
+            entries=[(c, inp["actions_texts"][c]["chosen"], deltas_by_country[c]) for c in countries],
+        )
+        upsert_round_summary(conn, round_no, summary_text)
+        save_resolution_step(conn, round_no=round_no, step="apply", output={"deltas": deltas_by_country})
+
+        _step("snapshot")
+        winners = _write_snapshots(
+            conn,
+            round_no=round_no,
+            countries=countries,
+            eu_state=eu_after,
+            country_defs=country_defs,
+            evaluate_all_countries=evaluate_all_countries,
+        )
+        save_resolution_step(conn, round_no=round_no, step="snapshot", output={"countries": countries})
+
+        _step("win_check")
+        # Clean round-specific choice data (candidates/locks) for this round
+        clear_round_data(conn, round_no)
+        if winners:
+            set_game_over(conn, winner_country=winners[0], winner_round=round_no, reason="win_conditions")
+        else:
+            set_game_meta(conn, round_no + 1, "setup")
+        save_resolution_step(conn, round_no=round_no, step="win_check", output={"winners": winners})
+
+    return {"winners": winners, "reused": reused, "already_done": False}
+
+
+def resolution_progress(conn, *, round_no: int) -> List[Tuple[str, bool]]:
+    """[(step, done), ...] for the GM status display."""
+    done = get_resolution_steps(conn, round_no=round_no)
+    return [(s, s in done) for s in RESOLVE_STEPS]
+
+
+@job_handler("round_resolution")
+def run_round_resolution_job(conn, payload: Dict[str, Any], ctx) -> Dict[str, Any]:
+    """
+    Background job (logic/jobs.py), payload {"round_no", "countries"}. Resolve and summary
+    are checkpointed steps, so a retried job continues where the last attempt stopped.
+    """
+    countries = list(payload["countries"])
+    return run_round_resolution(
+        conn=conn,
+        api_key=ctx.api_key,
+        round_no=int(payload["round_no"]),
+        countries=countries,
+        countries_display={c: COUNTRY_DEFS[c]["display_name"] for c in countries},
+        country_defs=COUNTRY_DEFS,
+        evaluate_all_countries=_evaluate_all_countries,
+        on_step=lambda step, reused: ctx.progress(step=step, reused=reused),
+    )
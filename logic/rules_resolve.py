@@ -0,0 +1,209 @@
+# logic/rules_resolve.py
+"""
+Deterministic, local resolve engine: round deltas without an LLM call.
+
+Every locked candidate already carries its impact ("folgen": per-metric deltas and an EU
+cohesion delta). resolve_by_rules() adds both locked impacts (foreign + domestic) per
+country and adjusts them for the situation:
+
+- security pressure (threat/frontline above the pivot): deterrence pays off (military
+  gains grow), but approval suffers
+- domestic pressure (energy/migration/disinfo/trade war above the pivot): stability and
+  approval suffer, a trade war costs economy and makes diplomatic gains worth more
+- this round's external moves (their modifiers) and the country's domestic headline
+  (craziness) hit economy, stability and approval
+- gains shrink near the top of a metric (diminishing returns), every delta is capped
+
+The result has the same shape as the LLM answer ({"eu", "länder", "notizen"}) and only
+depends on its inputs, so a retried resolution gets the same numbers.
+
+Modes (RESOLVE_MODE, see resolve_mode()):
+- llm       LLM only (errors fail the step, the GM retries)
+- fallback  LLM; if it times out or the provider is unavailable, the rules result is used;
+            countries still missing from the LLM answer after its fill get their rules deltas
+- checked   like fallback, and every LLM delta further than max_deviation from the rules
+            baseline is pulled back to baseline +/- max_deviation
+- rules     rules only, no LLM call for the resolve step
+
+Every profile key can be overridden via env (RULES_RESOLVE_MAX_DELTA=10, ...).
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Optional
+import os
+import threading
+import time
+
+from llm_schemas import COUNTRY_DELTA_KEYS
+
+RESOLVE_MODES = ("llm", "fallback", "checked", "rules")
+DEFAULT_RESOLVE_MODE = "fallback"
+
+RULES_RESOLVE_PROFILE: Dict[str, float] = {
+    "pivot": 50.0,  # pressures above this start to bite
+    "security_military": 3.0,  # extra military gain at full security pressure (if the actions build military)
+    "security_approval": 2.0,  # approval cost at full security pressure
+    "domestic_stability": 3.0,  # stability cost at full domestic pressure
+    "domestic_approval": 3.0,
+    "trade_war_economy": 3.0,
+    "trade_war_diplomacy": 2.0,  # extra diplomatic gain at full trade-war pressure (if the actions build diplomacy)
+    "external_per_point": 0.15,  # per point of this round's external pressure modifiers
+    "headline_stability": 3.0,  # at craziness 100
+    "headline_approval": 2.0,
+    "saturation_from": 85.0,  # gains above this metric value are halved
+    "max_delta": 12.0,
+    "max_cohesion_delta": 6.0,
+    "max_deviation": 6.0,  # "checked" mode: allowed distance of an LLM delta from the baseline
+}
+
+# delta key -> metric key (db.load_all_country_metrics)
+METRIC_FOR_DELTA = {
+    "militär": "military",
+    "stabilität": "stability",
+    "wirtschaft": "economy",
+    "diplomatie": "diplomatic_influence",
+    "öffentliche_zustimmung": "public_approval",
+}
+
+_STAT_KEYS = ("llm", "rules", "fallback", "partial", "checked", "clamped")
+_STATS: Dict[str, Any] = {**{k: 0 for k in _STAT_KEYS}, "last_ms": None}
+_LOCK = threading.Lock()
+
+
+def _profile() -> Dict[str, float]:
+    out = dict(RULES_RESOLVE_PROFILE)
+    for key in out:
+        raw = (os.getenv(f"RULES_RESOLVE_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = float(raw)
+    return out
+
+
+def resolve_mode() -> str:
+    """RESOLVE_MODE=llm|fallback|checked|rules (unknown values -> default)."""
+    mode = (os.getenv("RESOLVE_MODE") or DEFAULT_RESOLVE_MODE).strip().lower()
+    return mode if mode in RESOLVE_MODES else DEFAULT_RESOLVE_MODE
+
+
+def count(key: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[key] += n
+
+
+def rules_stats() -> Dict[str, Any]:
+    """{"mode", "llm", "rules", "fallback", "partial", "checked", "clamped", "last_ms"} for the GM panel."""
+    with _LOCK:
+        out = dict(_STATS)
+    out["mode"] = resolve_mode()
+    return out
+
+
+def _pressure(value: Any, pivot: float) -> float:
+    """0..1: how far a 0..100 pressure is above the pivot."""
+    return max(0.0, float(value or 0) - pivot) / max(1.0, 100.0 - pivot)
+
+
+def _clamp(value: float, limit: float) -> int:
+    return int(max(-limit, min(limit, round(value))))
+
+
+def resolve_by_rules(
+    *,
+    eu_state: Dict[str, Any],
+    countries_metrics: Dict[str, Dict[str, Any]],
+    impacts: Dict[str, Dict[str, Dict[str, Any]]],
+    external_events: Optional[List[Dict[str, Any]]] = None,
+    domestic_events: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    impacts: {country: {"foreign": folgen, "domestic": folgen}} of the locked candidates
+    (folgen = {"land": {...}, "eu": {"kohäsion": n}, "global_context": "..."}).
+    Returns {"eu": {"kohäsion_delta", "global_context"}, "länder": {...}, "notizen"}.
+    """
+    t0 = time.perf_counter()
+    p = _profile()
+    pivot = p["pivot"]
+
+    security = _pressure((float(eu_state["threat_level"]) + float(eu_state["frontline_pressure"])) / 2.0, pivot)
+    domestic = _pressure(sum(float(eu_state[k]) for k in (
+        "energy_pressure", "migration_pressure", "disinfo_pressure", "trade_war_pressure",
+    )) / 4.0, pivot)
+    trade_war = _pressure(eu_state["trade_war_pressure"], pivot)
+
+    ext: Dict[str, int] = {}
+    for e in external_events or []:
+        for k, v in (e.get("modifiers") or {}).items():
+            ext[k] = ext.get(k, 0) + int(v or 0)
+    per_point = p["external_per_point"]
+    ext_economy = (ext.get("energy_delta", 0) + ext.get("trade_war_delta", 0)) * per_point
+    ext_stability = (ext.get("migration_delta", 0) + ext.get("disinfo_delta", 0)) * per_point
+    ext_security = (ext.get("threat_delta", 0) + ext.get("frontline_delta", 0)) * per_point
+
+    craziness = {str(e.get("country")): int(e.get("craziness", 0) or 0) for e in domestic_events or []}
+
+    laender: Dict[str, Dict[str, int]] = {}
+    cohesion_sum = 0.0
+    context_by_weight: List[tuple] = []
+    for i, (c, metrics) in enumerate(countries_metrics.items()):
+        folgen = [f or {} for f in (impacts.get(c) or {}).values()]
+        d = {k: float(sum(int((f.get("land") or {}).get(k, 0) or 0) for f in folgen)) for k in COUNTRY_DELTA_KEYS}
+        cohesion_sum += sum(int((f.get("eu") or {}).get("kohäsion", 0) or 0) for f in folgen)
+
+        if d["militär"] > 0:
+            d["militär"] += security * p["security_military"] + max(0.0, ext_security)
+        d["öffentliche_zustimmung"] -= security * p["security_approval"]
+        d["stabilität"] -= domestic * p["domestic_stability"] + ext_stability
+        d["öffentliche_zustimmung"] -= domestic * p["domestic_approval"]
+        d["wirtschaft"] -= trade_war * p["trade_war_economy"] + ext_economy
+        if d["diplomatie"] > 0:
+            d["diplomatie"] += trade_war * p["trade_war_diplomacy"]
+        crazy = craziness.get(c, 0) / 100.0
+        d["stabilität"] -= crazy * p["headline_stability"]
+        d["öffentliche_zustimmung"] -= crazy * p["headline_approval"]
+
+        out: Dict[str, int] = {}
+        for k in COUNTRY_DELTA_KEYS:
+            value = d[k]
+            if value > 0 and float(metrics.get(METRIC_FOR_DELTA[k], 0) or 0) >= p["saturation_from"]:
+                value /= 2.0
+            out[k] = _clamp(value, p["max_delta"])
+        laender[c] = out
+
+        weight = sum(abs(v) for v in out.values())
+        for f in folgen:
+            if str(f.get("global_context") or "").strip():
+                context_by_weight.append((-weight, i, str(f["global_context"]).strip()))
+                break
+
+    n = max(1, len(countries_metrics))
+    cohesion = cohesion_sum / n + security * 1.0  # outside threat pulls the EU together a little
+    global_context = min(context_by_weight)[2] if context_by_weight else str(eu_state.get("global_context", ""))
+
+    with _LOCK:
+        _STATS["last_ms"] = (time.perf_counter() - t0) * 1000.0
+    return {
+        "eu": {"kohäsion_delta": _clamp(cohesion, p["max_cohesion_delta"]), "global_context": global_context},
+        "länder": laender,
+        "notizen": "Regelbasiert: Impacts der gelockten Optionen, angepasst an Druck, Außenmächte und Headlines.",
+    }
+
+
+def check_against_baseline(result: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """LLM deltas further than max_deviation from the rules baseline are pulled back to its edge."""
+    limit = _profile()["max_deviation"]
+    clamped = 0
+    laender: Dict[str, Dict[str, Any]] = {}
+    for c, deltas in (result.get("länder") or {}).items():
+        base = (baseline.get("länder") or {}).get(c)
+        out = dict(deltas or {})
+        if base:
+            for k in COUNTRY_DELTA_KEYS:
+                v = int(out.get(k, 0) or 0)
+                lo, hi = int(base[k] - limit), int(base[k] + limit)
+                if not lo <= v <= hi:
+                    out[k] = max(lo, min(hi, v))
+                    clamped += 1
+        laender[c] = out
+    count("checked")
+    if clamped:
+        count("clamped", clamped)
+    return {**result, "länder": laender}
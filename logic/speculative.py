@@ -0,0 +1,359 @@
+# logic/speculative.py
+"""
+Policy candidate generation as background jobs (logic/jobs.py), including speculative
+pre-generation of the players' first option.
+
+Player click: enqueue_policy_candidate(...) for the next free slot; the job builds the
+prompt, generates (streamed; the action text so far is published as progress
+{"aktion": ...}) and stores the candidate through upsert_policy_candidate.
+
+Speculative: when the GM publishes a round (phase actions_published) one candidate per
+country and domain is enqueued at the default aggressiveness for slot 1, so a player's
+first option is usually there before they click "KI generieren".
+
+- both use the same idempotency key per slot, so a player clicking while the speculative
+  job for slot 1 is still running simply waits for that job
+- a speculative result never overwrites a candidate the player stored in the meantime
+  (upsert_policy_candidate(..., overwrite=False))
+- every speculative call is taken from a per-game budget (game_meta.speculative_calls,
+  reset with the game); once it is used up nothing is generated speculatively anymore
+- generation queues in the country's rate-limit lane (llm_limits.lane_scope), so one
+  country's clicks do not delay the other players
+
+Batch mode: enqueue_policy_batch(...) generates POLICY_BATCH_PROFILE["size"] candidates at
+aggressiveness levels spread around the slider value in ONE call (the context is sent once
+instead of per candidate) and stores them into slots 1..size. The one-at-a-time flow above
+stays available; with POLICY_BATCH_SPECULATIVE=1 the speculative pre-generation fills all
+slots through one batch call per country and domain instead of slot 1 only.
+
+Every profile key can be overridden via env (SPECULATIVE_ENABLED, SPECULATIVE_BUDGET_PER_GAME,
+POLICY_BATCH_SIZE, ...).
+"""
+from __future__ import annotations
+from typing import Dict, Any, List
+import os
+import threading
+
+from db import (
+    get_eu_state,
+    get_external_events,
+    get_domestic_events,
+    load_country_metrics,
+    load_recent_history,
+    count_policy_candidates,
+    upsert_policy_candidate,
+    reserve_speculative_calls,
+    get_speculative_calls,
+    get_job_by_key,
+)
+from logic.helpers import summarize_recent_actions
+from logic.jobs import enqueue_job, job_handler, job_is_active
+from ai_policy import (
+    batch_aggressiveness,
+    build_policy_batch_prompt,
+    build_policy_prompt,
+    generate_policy_candidate,
+    generate_policy_candidates,
+)
+from llm_limits import lane_scope
+from llm_routing import route
+from countries import COUNTRY_DEFS
+
+SPECULATIVE_PROFILE: Dict[str, int] = {
+    "enabled": 1,
+    "budget_per_game": 240,  # e.g. 12 rounds x 10 countries x 2 domains
+}
+
+POLICY_BATCH_PROFILE: Dict[str, int] = {
+    "size": 3,  # candidates per batch call = slots 1..size (max. 3 slots per domain)
+    "spread": 25,  # aggressiveness levels: slider value -spread .. +spread
+    "speculative": 0,  # 1: speculative pre-generation uses one batch call per country/domain
+}
+
+# slider defaults in the player view (ui/panels.py)
+DEFAULT_AGGRESSIVENESS: Dict[str, int] = {"foreign": 55, "domestic": 45}
+
+MAX_SLOTS = 3
+
+_COUNTER_KEYS = ("enqueued", "stored", "kept_player", "failed", "over_budget", "batch_calls", "batch_stored")
+_COUNTERS: Dict[str, int] = {k: 0 for k in _COUNTER_KEYS}
+_LOCK = threading.Lock()
+
+
+def _profile() -> Dict[str, int]:
+    out = dict(SPECULATIVE_PROFILE)
+    for key in out:
+        raw = (os.getenv(f"SPECULATIVE_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = int(raw)
+    return out
+
+
+def batch_profile() -> Dict[str, int]:
+    out = dict(POLICY_BATCH_PROFILE)
+    for key in out:
+        raw = (os.getenv(f"POLICY_BATCH_{key.upper()}") or "").strip()
+        if raw:
+            out[key] = int(raw)
+    out["size"] = max(1, min(MAX_SLOTS, out["size"]))
+    return out
+
+
+def _count(key: str, n: int = 1) -> None:
+    with _LOCK:
+        _COUNTERS[key] += n
+
+
+def candidate_job_key(*, round_no: int, country: str, domain: str, slot: int) -> str:
+    return f"policy_candidate:{int(round_no)}:{country}:{domain}:{int(slot)}"
+
+
+def batch_job_key(*, round_no: int, country: str, domain: str) -> str:
+    return f"policy_batch:{int(round_no)}:{country}:{domain}"
+
+
+def enqueue_policy_candidate(
+    conn,
+    *,
+    api_key: str,
+    round_no: int,
+    country: str,
+    domain: str,
+    slot: int,
+    aggressiveness: int,
+    speculative: bool = False,
+) -> int:
+    return enqueue_job(
+        conn,
+        kind="policy_candidate",
+        idem_key=candidate_job_key(round_no=round_no, country=country, domain=domain, slot=slot),
+        payload={
+            "round_no": int(round_no),
+            "country": country,
+            "domain": domain,
+            "slot": int(slot),
+            "aggressiveness": int(aggressiveness),
+            "speculative": bool(speculative),
+        },
+        api_key=api_key,
+        max_attempts=1 if speculative else None,  # the budget counts calls, not jobs
+    )
+
+
+def _prompt_inputs(conn, *, round_no: int, country: str) -> Dict[str, Any]:
+    """Game state a policy prompt is built from (single and batch mode)."""
+    metrics = load_country_metrics(conn, country)
+    if not metrics:
+        raise ValueError(f"Konnte Länderwerte nicht laden: {country}")
+    dom_map = {e["country"]: e for e in get_domestic_events(conn, round_no)}
+    return {
+        "country_display": COUNTRY_DEFS.get(country, {}).get("display_name", country),
+        "metrics": metrics,
+        "eu_state": get_eu_state(conn),
+        "external_events": get_external_events(conn, round_no),
+        "domestic_headline": (dom_map.get(country) or {}).get("headline") or "Keine auffälligen Ereignisse gemeldet.",
+        "recent_actions_summary": summarize_recent_actions(load_recent_history(conn, country, limit=12)),
+    }
+
+
+@job_handler("policy_candidate")
+def run_policy_candidate_job(conn, payload: Dict[str, Any], ctx) -> Dict[str, Any]:
+    round_no = int(payload["round_no"])
+    country = str(payload["country"])
+    domain = str(payload["domain"])
+    speculative = bool(payload.get("speculative"))
+
+    prompt = build_policy_prompt(
+        domain=domain,
+        aggressiveness=int(payload["aggressiveness"]),
+        **_prompt_inputs(conn, round_no=round_no, country=country),
+    )
+
+    def _on_text(_text: str, probe) -> None:
+        action_so_far = probe.partial_string("aktion")
+        if action_so_far:
+            ctx.progress(aktion=action_so_far)
+
+    r = route("policy_candidate")
+    try:
+        with lane_scope(country):
+            obj, _raw = generate_policy_candidate(
+                api_key=ctx.api_key,
+                model=r["model"],
+                prompt=prompt,
+                temperature=r["temperature"],
+                top_p=0.95,
+                max_tokens=r["max_tokens"],
+                stream=not speculative,
+                on_text=None if speculative else _on_text,
+            )
+    except Exception:
+        if speculative:
+            _count("failed")
+        raise
+
+    written = upsert_policy_candidate(
+        conn,
+        round_no=round_no,
+        country=country,
+        domain=domain,
+        slot=int(payload["slot"]),
+        aggressiveness=int(payload["aggressiveness"]),
+        action_text=str(obj.get("aktion", "")).strip(),
+        impact=obj.get("folgen", {}) or {},
+        overwrite=not speculative,
+    )
+    if speculative:
+        _count("stored" if written else "kept_player")
+    return {"written": bool(written), "slot": int(payload["slot"])}
+
+
+def enqueue_policy_batch(
+    conn,
+    *,
+    api_key: str,
+    round_no: int,
+    country: str,
+    domain: str,
+    aggressiveness: int,
+    speculative: bool = False,
+) -> int:
+    """One job (one LLM call) for slots 1..size at levels spread around `aggressiveness`."""
+    profile = batch_profile()
+    levels = batch_aggressiveness(aggressiveness, profile["size"], profile["spread"])
+    return enqueue_job(
+        conn,
+        kind="policy_batch",
+        idem_key=batch_job_key(round_no=round_no, country=country, domain=domain),
+        payload={
+            "round_no": int(round_no),
+            "country": country,
+            "domain": domain,
+            "levels": levels,
+            "speculative": bool(speculative),
+        },
+        api_key=api_key,
+        max_attempts=1 if speculative else None,
+    )
+
+
+@job_handler("policy_batch")
+def run_policy_batch_job(conn, payload: Dict[str, Any], ctx) -> Dict[str, Any]:
+    round_no = int(payload["round_no"])
+    country = str(payload["country"])
+    domain = str(payload["domain"])
+    levels = [int(a) for a in payload["levels"]][:MAX_SLOTS]
+    speculative = bool(payload.get("speculative"))
+
+    prompt = build_policy_batch_prompt(
+        domain=domain,
+        aggressiveness_levels=levels,
+        **_prompt_inputs(conn, round_no=round_no, country=country),
+    )
+    r = route("policy_batch")
+    _count("batch_calls")
+    try:
+        with lane_scope(country):
+            candidates, _raw = generate_policy_candidates(
+                api_key=ctx.api_key,
+                model=r["model"],
+                prompt=prompt,
+                aggressiveness_levels=levels,
+                temperature=r["temperature"],
+                top_p=0.95,
+                max_tokens=r["max_tokens"],
+            )
+    except Exception:
+        if speculative:
+            _count("failed")
+        raise
+
+    written = 0
+    for slot, obj in enumerate(candidates, start=1):
+        written += bool(upsert_policy_candidate(
+            conn,
+            round_no=round_no,
+            country=country,
+            domain=domain,
+            slot=slot,
+            aggressiveness=int(obj["aggressivität"]),
+            action_text=str(obj.get("aktion", "")).strip(),
+            impact=obj.get("folgen", {}) or {},
+            overwrite=not speculative,
+        ))
+    _count("batch_stored", written)
+    if speculative:
+        _count("stored" if written else "kept_player")
+    return {"written": written, "slots": len(candidates)}
+
+
+def start_speculative_candidates(conn, *, api_key: str, round_no: int, countries: List[str]) -> int:
+    """Enqueue slot-1 candidates for every country/domain that has none yet. Returns the number enqueued."""
+    profile = _profile()
+    if not profile["enabled"] or not api_key:
+        return 0
+    batch = bool(batch_profile()["speculative"])
+
+    todo = []
+    for domain in ("foreign", "domestic"):
+        for c in countries:
+            key = candidate_job_key(round_no=round_no, country=c, domain=domain, slot=1)
+            if get_job_by_key(conn, key) is not None:
+                continue
+            if get_job_by_key(conn, batch_job_key(round_no=round_no, country=c, domain=domain)) is not None:
+                continue
+            if count_policy_candidates(conn, round_no=round_no, country=c, domain=domain) > 0:
+                continue
+            todo.append((c, domain))
+
+    granted = reserve_speculative_calls(conn, wanted=len(todo), budget=profile["budget_per_game"])
+    if granted < len(todo):
+        _count("over_budget", len(todo) - granted)
+    for c, domain in todo[:granted]:
+        if batch:
+            enqueue_policy_batch(
+                conn,
+                api_key=api_key,
+                round_no=round_no,
+                country=c,
+                domain=domain,
+                aggressiveness=DEFAULT_AGGRESSIVENESS[domain],
+                speculative=True,
+            )
+            continue
+        enqueue_policy_candidate(
+            conn,
+            api_key=api_key,
+            round_no=round_no,
+            country=c,
+            domain=domain,
+            slot=1,
+            aggressiveness=DEFAULT_AGGRESSIVENESS[domain],
+            speculative=True,
+        )
+    _count("enqueued", granted)
+    return granted
+
+
+def active_candidate_job(conn, *, round_no: int, country: str, domain: str, slot: int):
+    """The queued/running job for this slot (player or speculative, single or batch), else None."""
+    job = get_job_by_key(conn, candidate_job_key(round_no=round_no, country=country, domain=domain, slot=slot))
+    if job_is_active(job):
+        return job
+    if slot <= batch_profile()["size"]:
+        job = get_job_by_key(conn, batch_job_key(round_no=round_no, country=country, domain=domain))
+        if job_is_active(job):
+            return job
+    return None
+
+
+def speculative_stats(conn) -> Dict[str, Any]:
+    """{"budget", "used", "batch", "counters": {...}} for the GM performance panel."""
+    with _LOCK:
+        counters = dict(_COUNTERS)
+    return {
+        "budget": _profile()["budget_per_game"],
+        "used": get_speculative_calls(conn),
+        "batch": batch_profile(),
+        "counters": counters,
+    }
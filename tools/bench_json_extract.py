@@ -0,0 +1,115 @@
+# tools/bench_json_extract.py
+"""
+JSON extraction from model output: utils.scan_json_value vs. the old greedy regex
+re.search(r"(\\{.*\\}|\\[.*\\])", s, re.DOTALL).
+
+    python tools/bench_json_extract.py [--fuzz 2000] [--seed 1]
+
+fuzz:       random JSON docs (braces/quotes/escapes inside strings) wrapped in prose,
+            stray braces and trailing second objects -> share of correctly extracted docs
+throughput: long outputs, with and without stray '{' and no closing brace (the regex
+            backtracks quadratically there)
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import scan_json_value  # noqa: E402
+
+_OLD_RE = re.compile(r"(\{.*\}|\[.*\])", flags=re.DOTALL)
+_ALPHABET = 'abc xyzÄÖü {}[]"\\:,\n'
+
+
+def _old_extract(s: str):
+    m = _OLD_RE.search(s)
+    return m.group(1) if m else None
+
+
+def _new_extract(s: str):
+    span = scan_json_value(s)
+    return s[span[0]:span[1]] if span else None
+
+
+def _rand_str(rng: random.Random) -> str:
+    return "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(0, 24)))
+
+
+def _rand_value(rng: random.Random, depth: int = 0):
+    kind = rng.randint(0, 5 if depth < 3 else 2)
+    if kind == 0:
+        return rng.randint(-50, 50)
+    if kind == 1:
+        return _rand_str(rng)
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind == 3:
+        return [_rand_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {_rand_str(rng): _rand_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+
+def _fuzz_case(rng: random.Random):
+    doc = {"k": _rand_value(rng)}
+    body = json.dumps(doc, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+    prefix = rng.choice(["", "Hier ist das JSON:\n", "Antwort (Format: siehe unten]):\n"])
+    suffix = rng.choice(["", "\nHinweis: Werte sind geschätzt.", "\n{\"zweites\": 1}", "\nEnde }"])
+    return prefix + body + suffix, doc
+
+
+def _fuzz(n: int, seed: int) -> None:
+    rng = random.Random(seed)
+    ok_old = ok_new = 0
+    for _ in range(n):
+        text, doc = _fuzz_case(rng)
+        for extract, name in ((_old_extract, "old"), (_new_extract, "new")):
+            got = extract(text)
+            try:
+                good = got is not None and json.loads(got) == doc
+            except json.JSONDecodeError:
+                good = False
+            if good and name == "old":
+                ok_old += 1
+            elif good:
+                ok_new += 1
+    print(f"fuzz n={n}: regex {ok_old / n * 100:5.1f}% correct | scanner {ok_new / n * 100:5.1f}% correct")
+
+
+def _time(fn, s: str, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(s)
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+
+def _throughput() -> None:
+    prose = json.dumps({"events": {f"C{i}": {"headline": "Regierung unter Druck " * 4, "details": "Proteste. " * 20} for i in range(40)}})
+    braces = json.dumps({"events": {f"C{i}": {"headline": "x" * 80, "details": "y {z} [w] " * 20} for i in range(40)}})
+    cases = {
+        f"prose strings {len(prose) // 1024} KB": "Antwort:\n" + prose + "\nEnde.",
+        f"braces in strings {len(braces) // 1024} KB": "Antwort:\n" + braces + "\nEnde.",
+        "stray '{' x2000, no '}'": "{ " * 2000 + "kein JSON",
+        "stray '{' x8000, no '}'": "{ " * 8000 + "kein JSON",
+    }
+    for name, s in cases.items():
+        repeat = 3 if "stray" in name else 50
+        t_old = _time(_old_extract, s, repeat)
+        t_new = _time(_new_extract, s, repeat)
+        print(f"{name:<28} len={len(s):>6}  regex {t_old:9.2f} ms | scanner {t_new:7.2f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fuzz", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    _fuzz(args.fuzz, args.seed)
+    _throughput()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# tools/bench_round.py
+"""
+Full game round without network: GM generation -> policy candidates -> resolve.
+
+    python tools/bench_round.py                                   # synthetic backend, 0 ms latency
+    python tools/bench_round.py --latency "resolve=2500,*=800" --jitter 150
+    LLM_BACKEND=replay LLM_FIXTURES=fixtures/llm_fixtures.jsonl python tools/bench_round.py --env-backend
+
+Record fixtures for replay by playing a round with LLM_BACKEND=record.
+Reports wall time per phase (LLM latency is whatever the backend simulates).
+The process-wide LLM rate limiter (llm_limits.py) is off unless --rate-limit is given.
+Per call site p50/p95 latency and average tokens come from the llm_calls telemetry.
+--resolve-mode sets RESOLVE_MODE (llm|fallback|checked|rules, see logic/rules_resolve.py).
+--batch N generates N candidates per country and domain in one call each (batch mode)
+instead of one candidate per call.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import llm_backends  # noqa: E402
+import llm_limits  # noqa: E402
+from llm_telemetry import round_scope, telemetry_summary  # noqa: E402
+from llm_routing import route  # noqa: E402
+from countries import COUNTRY_DEFS  # noqa: E402
+from logic.gm_generation import generate_gm_inputs, write_gm_inputs  # noqa: E402
+from logic.resolution import run_round_resolution  # noqa: E402
+from logic.helpers import summarize_recent_actions  # noqa: E402
+from ai_policy import (  # noqa: E402
+    batch_aggressiveness,
+    build_policy_batch_prompt,
+    build_policy_prompt,
+    generate_policy_candidate,
+    generate_policy_candidates,
+)
+from logic.speculative import DEFAULT_AGGRESSIVENESS, POLICY_BATCH_PROFILE  # noqa: E402
+
+try:
+    from win import evaluate_all_countries
+except Exception:
+    evaluate_all_countries = None
+
+API_KEY = "offline"
+
+
+def _candidates(conn, *, round_no: int, countries, workers: int, batch: int = 0) -> None:
+    """One candidate per country and domain (slot 1; batch: slots 1..batch), slot 1 locked right away."""
+    eu = db.get_eu_state(conn)
+    ext = db.get_external_events(conn, round_no)
+    dom_map = {e["country"]: e for e in db.get_domestic_events(conn, round_no)}
+
+    jobs = []
+    for c in countries:
+        metrics = db.load_country_metrics(conn, c)
+        recent = summarize_recent_actions(db.load_recent_history(conn, c, limit=12))
+        for domain, aggr in DEFAULT_AGGRESSIVENESS.items():
+            inputs = dict(
+                domain=domain,
+                country_display=COUNTRY_DEFS[c]["display_name"],
+                metrics=metrics,
+                eu_state=eu,
+                external_events=ext,
+                domestic_headline=(dom_map.get(c) or {}).get("headline") or "Keine auffälligen Ereignisse gemeldet.",
+                recent_actions_summary=recent,
+            )
+            if batch:
+                levels = batch_aggressiveness(aggr, batch, POLICY_BATCH_PROFILE["spread"])
+                jobs.append((c, domain, levels, build_policy_batch_prompt(aggressiveness_levels=levels, **inputs)))
+            else:
+                jobs.append((c, domain, [aggr], build_policy_prompt(aggressiveness=aggr, **inputs)))
+
+    def _gen(job):
+        with round_scope(round_no):
+            if batch:
+                r = route("policy_batch")
+                objs, _raw = generate_policy_candidates(
+                    api_key=API_KEY, model=r["model"], prompt=job[3], aggressiveness_levels=job[2],
+                    temperature=r["temperature"], max_tokens=r["max_tokens"],
+                )
+            else:
+                r = route("policy_candidate")
+                obj, _raw = generate_policy_candidate(
+                    api_key=API_KEY, model=r["model"], prompt=job[3], temperature=r["temperature"], max_tokens=r["max_tokens"],
+                )
+                objs = [obj]
+        return job, objs
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(_gen, jobs))
+
+    with db.transaction(conn):
+        for (c, domain, levels, _prompt), objs in results:
+            for slot, (aggr, obj) in enumerate(zip(levels, objs), start=1):
+                db.upsert_policy_candidate(
+                    conn,
+                    round_no=round_no,
+                    country=c,
+                    domain=domain,
+                    slot=slot,
+                    aggressiveness=aggr,
+                    action_text=str(obj.get("aktion", "")).strip(),
+                    impact=obj.get("folgen", {}) or {},
+                )
+            db.lock_policy_slot(conn, round_no=round_no, country=c, domain=domain, slot=1)
+
+
+def _round(conn, *, round_no: int, countries, concurrent: bool, workers: int, batch: int = 0):
+    timings = {}
+
+    t0 = time.perf_counter()
+    gen = generate_gm_inputs(
+        conn=conn,
+        api_key=API_KEY,
+        round_no=round_no,
+        eu_before=db.get_eu_state(conn),
+        countries=countries,
+        craziness_by_actor={"USA": 60, "Russia": 70, "China": 50},
+        dom_baseline=55,
+        concurrent=concurrent,
+    )
+    write_gm_inputs(conn, round_no=round_no, countries=countries, gen=gen)
+    db.set_game_meta(conn, round_no, "actions_published")
+    timings["gm_generate"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _candidates(conn, round_no=round_no, countries=countries, workers=workers, batch=batch)
+    timings["candidates"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    run_round_resolution(
+        conn=conn,
+        api_key=API_KEY,
+        round_no=round_no,
+        countries=countries,
+        countries_display={c: d["display_name"] for c, d in COUNTRY_DEFS.items()},
+        country_defs=COUNTRY_DEFS,
+        evaluate_all_countries=evaluate_all_countries,
+    )
+    timings["resolve"] = time.perf_counter() - t0
+    timings["total"] = sum(timings.values())
+    return timings
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--latency", default="0", help='ms, e.g. "800" or "resolve=2500,*=800"')
+    ap.add_argument("--jitter", type=float, default=0.0, help="ms, uniform +/-")
+    ap.add_argument("--workers", type=int, default=4, help="parallel candidate generations (players)")
+    ap.add_argument("--sequential", action="store_true", help="GM generation without concurrency")
+    ap.add_argument("--env-backend", action="store_true", help="use LLM_BACKEND from env instead of synthetic")
+    ap.add_argument("--batch", type=int, default=0, help="candidates per country/domain in one call (0 = single mode)")
+    ap.add_argument("--resolve-mode", default="", help="RESOLVE_MODE for the resolve step (default: env / fallback)")
+    ap.add_argument("--rate-limit", action="store_true", help="keep the LLM rate limiter on (LLM_RATE_* from env)")
+    args = ap.parse_args()
+
+    if not args.rate_limit:
+        os.environ["LLM_RATE_LIMIT"] = "off"
+    if args.resolve_mode:
+        os.environ["RESOLVE_MODE"] = args.resolve_mode
+
+    if not args.env_backend:
+        llm_backends.set_backend(llm_backends.SyntheticBackend(
+            latency_ms=llm_backends.parse_latency_spec(args.latency),
+            jitter_ms=args.jitter,
+        ))
+    backend = llm_backends.get_backend()
+    countries = list(COUNTRY_DEFS.keys())
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure_db(os.path.join(tmp, "bench_round.db"))
+        conn = db.get_conn()
+        db.ensure_schema(conn)
+        db.seed_countries_if_missing(conn, COUNTRY_DEFS)
+        for r in range(1, args.rounds + 1):
+            with round_scope(r):
+                rows.append(_round(conn, round_no=r, countries=countries, concurrent=not args.sequential, workers=args.workers,
+                                   batch=max(0, min(3, args.batch))))
+        telemetry = telemetry_summary(conn)
+        db.get_db_manager().close_all()
+
+    print(f"backend={backend.name} rounds={args.rounds} countries={len(countries)} "
+          f"gm={'sequential' if args.sequential else 'concurrent'} workers={args.workers} batch={args.batch}")
+    for phase in ("gm_generate", "candidates", "resolve", "total"):
+        xs = [row[phase] * 1000.0 for row in rows]
+        print(f"{phase:<12} median={statistics.median(xs):9.1f} ms  max={max(xs):9.1f} ms")
+    for site, t in telemetry["by_call_site"].items():
+        if t["live"]:
+            print(f"  {site:<16} n={t['live']:3d}  p50={t['p50_ms']:8.1f} ms  p95={t['p95_ms']:8.1f} ms  "
+                  f"tokens in/out={t['avg_prompt_tokens']:.0f}/{t['avg_completion_tokens']:.0f}")
+    if isinstance(backend, llm_backends.ReplayBackend):
+        print(f"replay: {backend.stats}")
+    if args.rate_limit:
+        limits = llm_limits.limits_stats()
+        waited = sum(s["waited_s"] for s in limits["lanes"].values())
+        print(f"rate limit: waited {waited:.1f}s total over {len(limits['lanes'])} lanes, coalesced={limits['coalesced']}")
+
+
+if __name__ == "__main__":
+    main()
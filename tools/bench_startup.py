@@ -0,0 +1,61 @@
+# tools/bench_startup.py
+"""
+Startup cost of the per-rerun DB bootstrap (ensure_schema + seed_countries_if_missing).
+
+    python tools/bench_startup.py [--reruns 200]
+
+- cold:    new DB file, new process (all migrations + seeding)
+- restart: existing DB at current version, new process (one PRAGMA user_version read)
+- warm:    same process, subsequent Streamlit reruns (no schema work)
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from countries import COUNTRY_DEFS  # noqa: E402
+
+
+def _bootstrap() -> float:
+    t0 = time.perf_counter()
+    conn = db.get_conn()
+    db.ensure_schema(conn)
+    db.seed_countries_if_missing(conn, COUNTRY_DEFS)
+    db.release_conn(conn)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reruns", type=int, default=200)
+    ap.add_argument("--samples", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold, restart = [], []
+        for i in range(args.samples):
+            path = os.path.join(tmp, f"cold_{i}.db")
+            db.configure_db(path)
+            cold.append(_bootstrap())
+            db.configure_db(path)  # simulate a process restart on the same file
+            restart.append(_bootstrap())
+
+        warm = [_bootstrap() for _ in range(args.reruns)]
+        db.get_db_manager().close_all()
+
+    def _fmt(name: str, xs) -> str:
+        return f"{name:<8} n={len(xs):<4} median={statistics.median(xs):8.3f} ms  max={max(xs):8.3f} ms"
+
+    print(f"schema version {db.SCHEMA_VERSION}, {len(COUNTRY_DEFS)} countries")
+    print(_fmt("cold", cold))
+    print(_fmt("restart", restart))
+    print(_fmt("warm", warm))
+
+
+if __name__ == "__main__":
+    main()
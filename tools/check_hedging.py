@@ -0,0 +1,96 @@
+# tools/check_hedging.py
+"""
+Fails (exit 1) if a hedged LLM call crashes on, or prefers, an unparsable answer.
+
+    python tools/check_hedging.py
+
+Runs llm.chat for the resolve call site (hedging on) against a scripted synthetic backend:
+
+- slow malformed primary, valid hedge   -> the hedge's JSON wins
+- fast malformed primary (no hedge)     -> the text comes back, no exception
+- malformed primary and hedge           -> the text comes back, no exception
+"""
+import json
+import os
+import sys
+import threading
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["LLM_CACHE"] = "off"
+os.environ["LLM_RATE_LIMIT"] = "off"
+os.environ["LLM_TELEMETRY"] = "off"
+os.environ["LLM_POLICY_RESOLVE_HEDGE_MIN_S"] = "0.05"
+
+import llm  # noqa: E402
+import llm_backends  # noqa: E402
+from llm_resilience import resilience_stats  # noqa: E402
+from llm_schemas import resolve_schema  # noqa: E402
+
+CALL_SITE = "resolve"
+VALID = json.dumps({"eu": {"kohäsion_delta": 0, "global_context": "ok"}, "länder": {}, "notizen": ""})
+MALFORMED = '{"eu": {"kohäsion_delta": 0, "global_co'
+
+
+class _ScriptedBackend(llm_backends.SyntheticBackend):
+    """Answers (delay_s, text) from a script, one entry per request in arrival order."""
+
+    def __init__(self):
+        super().__init__()
+        self.script: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def complete(self, **kwargs) -> str:
+        with self._lock:
+            delay, text = self.script.pop(0) if self.script else (0.0, VALID)
+        time.sleep(delay)
+        return text
+
+
+def _chat() -> str:
+    return llm.chat(
+        api_key="offline", model="mistral-small", messages=[{"role": "user", "content": "Runde auflösen."}],
+        temperature=0.2, top_p=1.0, max_tokens=200, call_site=CALL_SITE, schema=resolve_schema(["Germany"]),
+    )
+
+
+def _hedge_won() -> int:
+    return resilience_stats().get(CALL_SITE, {}).get("hedge_won", 0)
+
+
+def main() -> None:
+    backend = _ScriptedBackend()
+    llm_backends.set_backend(backend)
+    for _ in range(llm.HEDGE_MIN_SAMPLES):  # p95 history, hedging needs it
+        _chat()
+
+    cases = [
+        ("slow malformed primary, valid hedge", [(0.5, MALFORMED), (0.0, VALID)], VALID, 1),
+        ("fast malformed primary", [(0.0, MALFORMED)], MALFORMED, 0),
+        ("malformed primary and hedge", [(0.3, MALFORMED), (0.0, MALFORMED)], MALFORMED, 0),
+    ]
+    failed = []
+    for name, script, expected, hedge_wins in cases:
+        backend.script = list(script)
+        before = _hedge_won()
+        try:
+            text = _chat()
+            ok = text == expected and _hedge_won() - before == hedge_wins
+            detail = "" if ok else f" (got {text[:40]!r})"
+        except Exception as e:  # noqa: BLE001
+            ok, detail = False, f" ({type(e).__name__}: {e})"
+        print(f"{'OK  ' if ok else 'FAIL'} {name}{detail}")
+        if not ok:
+            failed.append(name)
+        time.sleep(0.6)  # let the losing request finish before the next script
+
+    if failed:
+        print(f"\nHEDGING FAILED: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\nOK: {len(cases)} hedging cases.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# tools/check_prompt_prefixes.py
+"""
+Fails (exit 1) if the static prefix (system message) of an LLM prompt template changes
+with the game state. Providers can only reuse a cached prefix if it is byte-identical.
+
+    python tools/check_prompt_prefixes.py
+
+Every template is rendered for two different game states (round, metrics, events,
+aggressiveness, ...) through the synthetic backend; the system messages must match and
+the state must only show up in the user message. Prints the prefix share of the prompt.
+"""
+import os
+import sys
+import tempfile
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["LLM_CACHE"] = "off"
+os.environ["LLM_RATE_LIMIT"] = "off"
+os.environ["LLM_TELEMETRY"] = "off"
+
+import db  # noqa: E402
+import llm_backends  # noqa: E402
+from llm_prompt import count_tokens  # noqa: E402
+from ai_external import generate_external_moves, generate_domestic_events  # noqa: E402
+from ai_policy import build_policy_batch_prompt, build_policy_prompt, generate_policy_candidate, generate_policy_candidates  # noqa: E402
+from ai_round import resolve_round_all_countries, generate_round_summary  # noqa: E402
+
+API_KEY = "offline"
+MODEL = "mistral-small"
+COUNTRIES = ["Germany", "France", "Hungary"]
+
+
+class _CapturingBackend(llm_backends.SyntheticBackend):
+    def __init__(self):
+        super().__init__()
+        self.calls: List[Dict[str, Any]] = []
+
+    def complete(self, *, call_site, messages, **kwargs) -> str:
+        self.calls.append({"call_site": call_site, "messages": messages})
+        return super().complete(call_site=call_site, messages=messages, **kwargs)
+
+    def stream(self, *, call_site, messages, **kwargs):
+        self.calls.append({"call_site": call_site, "messages": messages})
+        return super().stream(call_site=call_site, messages=messages, **kwargs)
+
+
+def _state(variant: int) -> Dict[str, Any]:
+    """Two clearly different game states."""
+    v = variant
+    eu = {
+        "cohesion": 70 - 20 * v, "threat_level": 30 + 40 * v, "frontline_pressure": 20 + 30 * v,
+        "energy_pressure": 40 + 10 * v, "migration_pressure": 35 + 25 * v, "disinfo_pressure": 25 + 35 * v,
+        "trade_war_pressure": 15 + 45 * v, "global_context": ["Ruhige Lage.", "Krise an der Ostflanke."][v],
+    }
+    metrics = {
+        c: {"military": 50 + 5 * i + 10 * v, "stability": 60 - 10 * v, "economy": 55 + i, "diplomatic_influence": 50,
+            "public_approval": 45 + 15 * v, "ambition": ["Führungsrolle in Europa.", "Strategische Autonomie."][v]}
+        for i, c in enumerate(COUNTRIES)
+    }
+    external = [
+        {"actor": a, "headline": f"{a} Zug {v}", "modifiers": {"threat_delta": 3 * v}}
+        for a in ("USA", "China", "Russia")
+    ]
+    domestic = [{"country": c, "headline": f"Headline {c} {v}", "craziness": 20 + 50 * v} for c in COUNTRIES]
+    return {
+        "round_no": 2 + 5 * v,
+        "eu": eu,
+        "metrics": metrics,
+        "external": external,
+        "domestic": domestic,
+        "memory": [(1 + v, "- Runde ruhig.")] if v else [],
+        "aggressiveness": 25 + 60 * v,
+        "craziness": {"USA": 10 + 70 * v, "Russia": 40 + 50 * v, "China": 30 + 20 * v},
+    }
+
+
+def _templates() -> Dict[str, Callable[[Dict[str, Any]], None]]:
+    def external(s):
+        generate_external_moves(api_key=API_KEY, model=MODEL, round_no=s["round_no"], eu_state=s["eu"],
+                                recent_round_summaries=s["memory"], craziness_by_actor=s["craziness"])
+
+    def domestic(s):
+        generate_domestic_events(api_key=API_KEY, model=MODEL, round_no=s["round_no"], eu_state=s["eu"],
+                                 countries=COUNTRIES, countries_metrics=s["metrics"], recent_round_summaries=s["memory"],
+                                 recent_actions_by_country={c: [] for c in COUNTRIES})
+
+    def policy(domain):
+        def _run(s):
+            prompt = build_policy_prompt(
+                domain=domain, aggressiveness=s["aggressiveness"], country_display=COUNTRIES[s["round_no"] % 3],
+                metrics=s["metrics"][COUNTRIES[0]], eu_state=s["eu"], external_events=s["external"],
+                domestic_headline=s["domestic"][0]["headline"], recent_actions_summary="Keine.",
+            )
+            generate_policy_candidate(api_key=API_KEY, model=MODEL, prompt=prompt)
+        return _run
+
+    def batch(s):
+        levels = [s["aggressiveness"] - 20, s["aggressiveness"], s["aggressiveness"] + 10]
+        prompt = build_policy_batch_prompt(
+            domain="foreign", aggressiveness_levels=levels, country_display=COUNTRIES[s["round_no"] % 3],
+            metrics=s["metrics"][COUNTRIES[0]], eu_state=s["eu"], external_events=s["external"],
+            domestic_headline=s["domestic"][0]["headline"], recent_actions_summary="Keine.",
+        )
+        generate_policy_candidates(api_key=API_KEY, model=MODEL, prompt=prompt, aggressiveness_levels=levels)
+
+    def resolve(s):
+        resolve_round_all_countries(
+            api_key=API_KEY, model=MODEL, round_no=s["round_no"], eu_state=s["eu"], countries_metrics=s["metrics"],
+            countries_display={c: c for c in COUNTRIES},
+            actions_texts={c: {"1": f"Aktion {c} {s['round_no']}"} for c in COUNTRIES},
+            locked_choices={c: "1" for c in COUNTRIES}, recent_round_summaries=s["memory"],
+            external_events=s["external"], domestic_events=s["domestic"],
+        )
+
+    def summary(s):
+        generate_round_summary(
+            api_key=API_KEY, model=MODEL, round_no=s["round_no"], memory_in=s["memory"], eu_before=s["eu"],
+            eu_after=s["eu"], external_events=s["external"], domestic_events=s["domestic"],
+            chosen_actions_str="\n".join(f"- {c}: Aktion {s['round_no']}" for c in COUNTRIES),
+            result_obj={"länder": {c: {"militär": s["round_no"]} for c in COUNTRIES}},
+        )
+
+    return {
+        "external_moves": external,
+        "domestic_events": domestic,
+        "policy_candidate/foreign": policy("foreign"),
+        "policy_candidate/domestic": policy("domestic"),
+        "policy_batch": batch,
+        "resolve": resolve,
+        "summary": summary,
+    }
+
+
+def _render(backend: _CapturingBackend, run: Callable[[Dict[str, Any]], None], s: Dict[str, Any]) -> List[Dict[str, str]]:
+    backend.calls.clear()
+    run(s)
+    return backend.calls[0]["messages"]
+
+
+def main() -> None:
+    backend = _CapturingBackend()
+    llm_backends.set_backend(backend)
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure_db(os.path.join(tmp, "prefixes.db"))
+        db.ensure_schema(db.get_conn())
+        for name, run in _templates().items():
+            a = _render(backend, run, _state(0))
+            b = _render(backend, run, _state(1))
+            system_a, system_b = a[0]["content"], b[0]["content"]
+            ok = system_a == system_b and a[1]["content"] != b[1]["content"]
+            prefix = count_tokens(system_a)
+            total = prefix + count_tokens(a[1]["content"])
+            print(f"{'OK  ' if ok else 'FAIL'} {name}: prefix {prefix} of {total} tokens ({100.0 * prefix / total:.0f}%)")
+            if not ok:
+                failed.append(name)
+        db.get_db_manager().close_all()
+
+    if failed:
+        print(f"\nPREFIX CHANGES WITH STATE: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\nOK: {len(_templates())} templates have a stable static prefix.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# tools/check_query_plans.py
+"""
+Fails (exit 1) if a hot query from db.HOT_QUERIES falls back to a full table or index scan
+(SCAN in the plan) on a table it does not explicitly allow.
+
+    python tools/check_query_plans.py            # fresh temp DB at the current schema version
+    python tools/check_query_plans.py game.db    # check an existing DB (migrates it first)
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+def _check(path: str) -> int:
+    db.configure_db(path)
+    conn = db.get_conn()
+    db.ensure_schema(conn)
+
+    for name, (sql, params, _allowed) in db.HOT_QUERIES.items():
+        print(f"{name}:")
+        for line in db.explain_query_plan(conn, sql, params):
+            print(f"    {line}")
+
+    bad = db.find_full_scans(conn)
+    db.get_db_manager().close_all()
+
+    if bad:
+        print("\nFULL SCANS:")
+        for name, lines in bad.items():
+            print(f"- {name}: {'; '.join(lines)}")
+        return 1
+    print(f"\nOK: {len(db.HOT_QUERIES)} hot queries use index searches (schema v{db.SCHEMA_VERSION}).")
+    return 0
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        sys.exit(_check(sys.argv[1]))
+    with tempfile.TemporaryDirectory() as tmp:
+        sys.exit(_check(os.path.join(tmp, "plans.db")))
+
+
+if __name__ == "__main__":
+    main()
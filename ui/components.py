@@ -1,4 +1,5 @@
 import html
+import time
 from typing import Any, Dict, List
 
 import streamlit as st
@@ -125,3 +126,21 @@ def metric_with_info(label: str, value: Any, help_text: str) -> None:
 """,
             unsafe_allow_html=True,
         )
+
+
+_RERUN_KEY = "_rerun_after_s"
+
+
+def schedule_rerun(delay_s: float) -> None:
+    """Rerun once the page is rendered (job polling); the shortest requested delay wins."""
+    current = st.session_state.get(_RERUN_KEY)
+    st.session_state[_RERUN_KEY] = delay_s if current is None else min(current, delay_s)
+
+
+def run_scheduled_rerun() -> None:
+    """Last call of the script: sleep for the scheduled delay, then rerun."""
+    delay_s = st.session_state.pop(_RERUN_KEY, None)
+    if delay_s is None:
+        return
+    time.sleep(delay_s)
+    st.rerun()
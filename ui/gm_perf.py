@@ -0,0 +1,240 @@
+from typing import Any, Dict
+
+import streamlit as st
+
+from db import db_pool_stats, clear_llm_cache, clear_llm_calls
+from llm_cache import cache_stats, reset_cache_counters
+from llm import latency_stats, partial_stats, repair_stats, structured_stats
+from llm_limits import limits_stats
+from llm_resilience import resilience_stats
+from llm_telemetry import telemetry_summary
+from llm_routing import routing_stats
+from llm_prompt import prompt_stats
+from logic.rules_resolve import rules_stats
+from logic.speculative import speculative_stats
+
+
+def _render_db_pool(stats: Dict[str, Any]) -> None:
+    st.markdown("**🗄️ SQLite Pool**")
+    st.caption(f"{stats['path']} • journal_mode={stats['journal_mode']}")
+    st.caption(
+        f"offen: {stats['in_use']} | idle: {stats['idle']} | neu geöffnet: {stats['opened']} | "
+        f"wiederverwendet: {stats['reused']} | reclaimed: {stats['reclaimed']} | geschlossen: {stats['closed']}"
+    )
+
+
+def _render_llm_cache(conn, stats: Dict[str, Any]) -> None:
+    st.markdown("**🧠 LLM-Cache**")
+    table = stats["table"]
+    st.caption(
+        f"Modus: {stats['mode']} • aktiv für: {', '.join(stats['enabled_sites']) or '—'} • "
+        f"{table['entries']} Einträge, {table['bytes'] / 1024:.0f} KiB, {table['hits']} Treffer gesamt"
+    )
+    counters = stats["counters"]
+    for site, c in counters.items():
+        lookups = c["hit"] + c["miss"]
+        rate = (c["hit"] / lookups * 100) if lookups else 0.0
+        st.caption(
+            f"{site}: {c['hit']} Hits / {c['miss']} Misses ({rate:.0f}%) | "
+            f"gespeichert: {c['store']} | Fehler: {c['error']}"
+        )
+    if not counters:
+        st.caption("Noch keine Cache-Zugriffe in diesem Prozess.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Zähler zurücksetzen", use_container_width=True, key="gm_perf_cache_reset_counters"):
+            reset_cache_counters()
+            st.rerun()
+    with col2:
+        if st.button("Cache leeren", use_container_width=True, key="gm_perf_cache_clear"):
+            clear_llm_cache(conn)
+            st.rerun()
+
+
+def _render_llm_latency(stats: Dict[str, Dict[str, Any]]) -> None:
+    st.markdown("**⏱️ LLM-Latenz (TTFT / gesamt)**")
+    if not stats:
+        st.caption("Noch keine LLM-Aufrufe in diesem Prozess.")
+        return
+    for site, s in stats.items():
+        ttft = f"{s['avg_ttft_s']:.2f}s" if s["avg_ttft_s"] is not None else "—"
+        st.caption(
+            f"{site}: n={s['n']} | TTFT Ø {ttft} | gesamt Ø {s['avg_total_s']:.2f}s "
+            f"(zuletzt {s['last_total_s']:.2f}s)"
+        )
+
+
+def _render_json_repair(stats: Dict[str, Dict[str, int]]) -> None:
+    st.markdown("**🩹 JSON-Reparatur**")
+    if not stats:
+        st.caption("Noch keine Antworten geparst.")
+        return
+    saved = sum(c["local"] for c in stats.values())
+    st.caption(f"Gesparte LLM-Roundtrips (lokal repariert): {saved}")
+    for site, c in stats.items():
+        st.caption(f"{site}: direkt {c['clean']} | lokal {c['local']} | LLM {c['llm']} | fehlgeschlagen {c['failed']}")
+
+
+def _render_partial(stats: Dict[str, Dict[str, int]]) -> None:
+    st.markdown("**🧩 Fehlende Länder nachgefordert**")
+    if not stats:
+        st.caption("Noch keine Mehr-Länder-Antworten.")
+        return
+    for site, c in stats.items():
+        st.caption(
+            f"{site}: vollständig {c['complete']} | nachgefordert {c['filled']} "
+            f"({c['keys_filled']}/{c['keys_missing']} Länder) | Fallback {c['fallback']}"
+        )
+    st.caption("Tokens/Latenz der Nachforderungen: Call-Sites *_fill in der LLM-Telemetrie.")
+
+
+def _render_structured_output(stats: Dict[str, Any]) -> None:
+    st.markdown("**🧾 Structured Output**")
+    unsupported = ", ".join(stats["unsupported"]) or "—"
+    st.caption(f"Modus: {stats['mode']} • vom Provider abgelehnt: {unsupported}")
+    for site, c in stats["sites"].items():
+        st.caption(
+            f"{site}: json_schema {c['json_schema']} | json_object {c['json_object']} | "
+            f"Text {c['text']} | Fallbacks {c['fallback']}"
+        )
+
+
+def _render_rate_limit(stats: Dict[str, Any]) -> None:
+    st.markdown("**🚦 Rate-Limit**")
+    p = stats["profile"]
+    state = "aktiv" if stats["enabled"] else "aus"
+    st.caption(
+        f"{state} • {p['requests_per_s']:g} Anfragen/s (Burst {p['burst']:g}) • {p['tokens_per_min']:.0f} Tokens/min • "
+        f"wartend: {stats['queued']} | zusammengelegt: {stats['coalesced']}"
+    )
+    for lane, s in stats["lanes"].items():
+        st.caption(f"{lane}: n={s['n']} | Wartezeit Ø {s['waited_s'] / s['n']:.2f}s (max {s['max_wait_s']:.2f}s)")
+
+
+def _render_resilience(stats: Dict[str, Dict[str, int]]) -> None:
+    st.markdown("**🛟 Retries / Hedging**")
+    if not stats:
+        st.caption("Noch keine LLM-Aufrufe in diesem Prozess.")
+        return
+    for site, c in stats.items():
+        st.caption(
+            f"{site}: {c['calls']} Aufrufe | Retries {c['retries']} | Hedges {c['hedged']} "
+            f"(gewonnen {c['hedge_won']}) | Deadline {c['deadline']} | aufgegeben {c['failed']}"
+        )
+
+
+def _render_routing(stats: Dict[str, Dict[str, Any]]) -> None:
+    st.markdown("**🧭 Modell-Routing**")
+    for site, r in stats.items():
+        p95 = f"{r['p95_s']:.1f}s" if r["p95_s"] is not None else "—"
+        active = f"⬇️ {r['fallback_model']}" if r["downgraded"] else r["model"]
+        st.caption(
+            f"{site}: {active} | p95 {p95} / SLO {r['slo_p95_s']:.0f}s | "
+            f"Fallback {r['fallback_model'] or '—'} | Downgrades {r['downgrades']}"
+        )
+
+
+def _render_prompt_budget(stats: Dict[str, Dict[str, Any]]) -> None:
+    st.markdown("**✂️ Prompt-Budget (Tokens, geschätzt)**")
+    if not stats:
+        st.caption("Noch keine budgetierten Prompts gebaut.")
+        return
+    for site, s in stats.items():
+        last = ", ".join(s["last_compactions"]) or "—"
+        st.caption(
+            f"{site}: zuletzt {s['last_tokens']} / Budget {s['budget']} | Ø {s['avg_tokens']:.0f} | "
+            f"gekürzt {s['compacted']}/{s['n']} | über Budget {s['over_budget']} | letzte Kürzung: {last}"
+        )
+
+
+def _render_rules_resolve(stats: Dict[str, Any]) -> None:
+    st.markdown("**📐 Resolve-Engine**")
+    last = f"{stats['last_ms']:.1f} ms" if stats["last_ms"] is not None else "—"
+    st.caption(f"Modus: {stats['mode']} (RESOLVE_MODE) • Regel-Engine zuletzt {last}")
+    st.caption(
+        f"LLM {stats['llm']} | nur Regeln {stats['rules']} | Regeln als Fallback {stats['fallback']} "
+        f"(einzelne Länder: {stats['partial']}) | "
+        f"gegen Baseline geprüft {stats['checked']} (Werte begrenzt: {stats['clamped']})"
+    )
+
+
+def _render_speculative(stats: Dict[str, Any]) -> None:
+    st.markdown("**🔮 Vorab-Generierung**")
+    c = stats["counters"]
+    st.caption(f"Budget: {stats['used']}/{stats['budget']} Aufrufe (Spiel)")
+    st.caption(
+        f"eingereiht {c['enqueued']} | gespeichert {c['stored']} | Spieler war schneller {c['kept_player']} | "
+        f"fehlgeschlagen {c['failed']} | über Budget {c['over_budget']}"
+    )
+    b = stats["batch"]
+    st.caption(
+        f"Batch ({b['size']} Optionen/Aufruf, ±{b['spread']}, vorab: {'an' if b['speculative'] else 'aus'}): "
+        f"{c['batch_calls']} Aufrufe | {c['batch_stored']} Optionen gespeichert"
+    )
+
+
+TELEMETRY_ROUNDS_SHOWN = 5
+
+
+def _ms(value) -> str:
+    return f"{value / 1000.0:.2f}s" if value is not None else "—"
+
+
+def _telemetry_line(label: str, t: Dict[str, Any]) -> str:
+    return (
+        f"{label}: n={t['live']} | p50 {_ms(t['p50_ms'])} | p95 {_ms(t['p95_ms'])} | p99 {_ms(t['p99_ms'])} | "
+        f"TTFT p50 {_ms(t['ttft_p50_ms'])} | Tokens Ø {t['avg_prompt_tokens']:.0f}→{t['avg_completion_tokens']:.0f} "
+        f"(max {t['max_completion_tokens']}) | Reparatur {t['repairs']} | Fehler {t['errors']} | Cache {t['cached']}"
+    )
+
+
+def _render_llm_telemetry(conn, summary: Dict[str, Any]) -> None:
+    st.markdown("**Je Call-Site**")
+    if not summary["by_call_site"]:
+        st.caption("Noch keine LLM-Aufrufe aufgezeichnet.")
+        return
+    for site, t in summary["by_call_site"].items():
+        st.caption(_telemetry_line(site, t))
+
+    st.markdown("**Je Runde**")
+    for rnd, sites in list(summary["by_round"].items())[:TELEMETRY_ROUNDS_SHOWN]:
+        st.caption(f"Runde {rnd}")
+        for site, t in sites.items():
+            st.caption(_telemetry_line(f"· {site}", t))
+    if summary["db_errors"]:
+        st.caption(f"Schreibfehler Telemetrie: {summary['db_errors']}")
+
+    if st.button("Telemetrie löschen", use_container_width=True, key="gm_perf_telemetry_clear"):
+        clear_llm_calls(conn)
+        st.rerun()
+
+
+def render_gm_perf_panel(conn) -> None:
+    """GM-only: Laufzeit-/Performance-Kennzahlen (Sidebar)."""
+    with st.sidebar.expander("⚙️ Performance", expanded=False):
+        _render_db_pool(db_pool_stats())
+        st.write("---")
+        _render_llm_latency(latency_stats())
+        st.write("---")
+        _render_json_repair(repair_stats())
+        st.write("---")
+        _render_partial(partial_stats())
+        st.write("---")
+        _render_structured_output(structured_stats())
+        st.write("---")
+        _render_rate_limit(limits_stats())
+        st.write("---")
+        _render_resilience(resilience_stats())
+        st.write("---")
+        _render_routing(routing_stats())
+        st.write("---")
+        _render_rules_resolve(rules_stats())
+        st.write("---")
+        _render_prompt_budget(prompt_stats())
+        st.write("---")
+        _render_speculative(speculative_stats(conn))
+        st.write("---")
+        _render_llm_cache(conn, cache_stats())
+    with st.sidebar.expander("📈 LLM-Telemetrie", expanded=False):
+        _render_llm_telemetry(conn, telemetry_summary(conn))
@@ -1,24 +1,27 @@
 from cmath import phase
 import html
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional
 
 import streamlit as st
-from mistralai import Mistral
 
-from ui.components import VALUE_HELP, compact_kv, metric_with_info
-from logic.helpers import impact_preview_text, summarize_recent_actions, format_external_events
-from utils import content_to_text, parse_json_maybe
+from ui.components import VALUE_HELP, compact_kv, metric_with_info, schedule_rerun
+from logic.helpers import impact_preview_text
+from logic.jobs import job_is_active, job_snapshot, poll_interval_s
+from logic.speculative import (
+    DEFAULT_AGGRESSIVENESS,
+    active_candidate_job,
+    batch_profile,
+    enqueue_policy_batch,
+    enqueue_policy_candidate,
+)
 
 from db import (
-    load_country_metrics,
     load_recent_history,
     get_external_events,
     get_domestic_events,
     get_country_snapshots,
     # NEW policy flow
     get_policy_candidates,
-    count_policy_candidates,
-    upsert_policy_candidate,
     lock_policy_slot,
     get_policy_locks,
 )
@@ -32,190 +35,6 @@ except Exception:
     evaluate_country_win_conditions = None
 
 
-# -----------------------------
-# Small AI helpers (single-policy JSON)
-# -----------------------------
-def _chat(client: Mistral, model: str, messages, temperature: float, top_p: float, max_tokens: int) -> str:
-    resp = client.chat.complete(
-        model=model,
-        messages=messages,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        top_p=top_p,
-    )
-    return content_to_text(resp.choices[0].message.content)
-
-
-def _repair_to_valid_json(client: Mistral, model: str, bad_text: str, schema_hint: str) -> Dict[str, Any]:
-    repair_prompt = f"""
-Du bist ein Validator/Formatter. Wandle die folgende Ausgabe in **gültiges JSON** um.
-
-Wichtig:
-- Gib **NUR** JSON zurück (keine Erklärungen, kein Markdown).
-- Nutze **nur** doppelte Anführungszeichen.
-- Keine trailing commas.
-- Schema MUSS exakt passen.
-
-Schema:
-{schema_hint}
-
-Hier ist die zu reparierende Ausgabe:
-{bad_text}
-""".strip()
-
-    fixed_raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Du gibst ausschließlich gültiges JSON zurück. Kein Markdown."},
-            {"role": "user", "content": repair_prompt},
-        ],
-        temperature=0.2,
-        top_p=1.0,
-        max_tokens=1200,
-    )
-    return parse_json_maybe(fixed_raw)
-
-
-def _build_policy_prompt(
-    *,
-    domain: str,  # "foreign" | "domestic"
-    aggressiveness: int,
-    country_display: str,
-    metrics: Dict[str, Any],
-    eu_state: Dict[str, Any],
-    external_events: List[Dict[str, Any]],
-    domestic_headline: str,
-    recent_actions_summary: str,
-) -> str:
-    ext_str = format_external_events(external_events)
-
-    if domain == "foreign":
-        domain_label = "Außenpolitik / Geopolitik / Sicherheit / Diplomatie"
-        focus = """
-Fokus:
-- Abschreckung, Bündnisse, Sanktionen, Diplomatie, militärische Bereitschaft, internationale Kommunikation.
-- Berücksichtige Threat/Frontline/Energy/Migration/Disinfo/TradeWar-Druck.
-"""
-    else:
-        domain_label = "Innenpolitik / Gesellschaft / Wirtschaft / Stabilität"
-        focus = """
-Fokus:
-- Innenpolitische Stabilität, Zustimmung, Reformen, Wirtschaft, Medien, Krisenmanagement, gesellschaftliche Spannungen.
-- Berücksichtige innenpolitisches Event (Headline) stark.
-"""
-
-    scale = f"""
-Aggressivitätsskala ({aggressiveness}/100):
-- 0–20: extrem vorsichtig, deeskalierend, risikoscheu
-- 21–40: eher vorsichtig, defensive Politik
-- 41–60: ausgewogen, moderate Risiken
-- 61–80: offensiv, hoher Einsatz, spürbare Risiken
-- 81–100: maximal aggressiv, sehr risikoreich (kann Zustimmung/Stabilität kosten)
-"""
-
-    schema_hint = """
-{
-  "aktion": "...",
-  "folgen": {
-    "land": {"militär": 0, "stabilität": 0, "wirtschaft": 0, "diplomatie": 0, "öffentliche_zustimmung": 0},
-    "eu": {"kohäsion": 0},
-    "global_context": "..."
-  }
-}
-""".strip()
-
-    return f"""
-Du bist eine Simulations-Engine in einem EU-Geopolitik-Spiel.
-
-Erzeuge GENAU EINE öffentliche Aktion für {country_display}.
-Domain: {domain_label}
-
-{focus}
-
-{scale}
-
-Kontext:
-- {country_display} Metriken: Militär={metrics["military"]}, Stabilität={metrics["stability"]}, Wirtschaft={metrics["economy"]},
-  Diplomatie={metrics["diplomatic_influence"]}, Öffentliche Zustimmung={metrics["public_approval"]}.
-- Ambition: {metrics["ambition"]}.
-
-EU-/Weltlage:
-- EU-Kohäsion={eu_state["cohesion"]}%
-- Threat Level={eu_state["threat_level"]}/100, Frontline Pressure={eu_state["frontline_pressure"]}/100
-- Energy={eu_state["energy_pressure"]}/100, Migration={eu_state["migration_pressure"]}/100
-- Disinfo={eu_state["disinfo_pressure"]}/100, TradeWar={eu_state["trade_war_pressure"]}/100
-- Globaler Kontext: {eu_state["global_context"]}
-
-Außenmächte-Moves dieser Runde:
-{ext_str}
-
-Innenpolitisches Event (diese Runde, Land):
-- {domestic_headline}
-
-Letzte Aktionen (für Variation, nicht wiederholen):
-{recent_actions_summary}
-
-Output Regeln:
-- Gib NUR gültiges JSON zurück (kein Markdown, keine Erklärungen).
-- Folgen sind kleine realistische Ganzzahlen (typisch -12..+12).
-- global_context ist ein kurzer Satz (max 1 Zeile).
-- Achte darauf, dass die Aktion zur Domain passt.
-
-Schema:
-{schema_hint}
-""".strip()
-
-
-def _generate_policy_candidate(
-    *,
-    api_key: str,
-    model: str,
-    prompt: str,
-    temperature: float = 0.85,
-    top_p: float = 0.95,
-    max_tokens: int = 900,
-) -> Tuple[Dict[str, Any], str]:
-    client = Mistral(api_key=api_key)
-
-    raw = _chat(
-        client,
-        model,
-        messages=[
-            {"role": "system", "content": "Antworte ausschließlich mit gültigem JSON. Kein Markdown."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        top_p=top_p,
-        max_tokens=max_tokens,
-    )
-
-    schema_hint = """
-{
-  "aktion": "...",
-  "folgen": {
-    "land": {"militär": 0, "stabilität": 0, "wirtschaft": 0, "diplomatie": 0, "öffentliche_zustimmung": 0},
-    "eu": {"kohäsion": 0},
-    "global_context": "..."
-  }
-}
-""".strip()
-
-    try:
-        obj = parse_json_maybe(raw)
-    except Exception:
-        obj = _repair_to_valid_json(client, model, raw, schema_hint)
-
-    # validate minimal keys
-    if "aktion" not in obj or "folgen" not in obj:
-        raise ValueError("Policy-JSON muss 'aktion' und 'folgen' enthalten.")
-    folgen = obj.get("folgen") or {}
-    if "land" not in folgen or "eu" not in folgen or "global_context" not in folgen:
-        raise ValueError("'folgen' muss land/eu/global_context enthalten.")
-
-    return obj, raw
-
-
 # -----------------------------
 # UI panels
 # -----------------------------
@@ -232,17 +51,6 @@ def render_my_metrics_panel(metrics: Dict[str, Any], country_display_name: str)
             st.write(metrics["ambition"])
 
 
-def _progress_from_conditions(cond_results) -> float:
-    try:
-        total = len(cond_results)
-        if total <= 0:
-            return 0.0
-        ok = sum(1 for r in cond_results if getattr(r, "ok", False))
-        return round(ok / total * 100.0, 2)
-    except Exception:
-        return 0.0
-
-
 def render_news_panel(
     conn,
     *,
@@ -366,7 +174,7 @@ def _render_domain_block(
     count = len(candidates)
 
     # slider defaults: keep last used aggressiveness if any
-    last_aggr = candidates[-1]["aggressiveness"] if candidates else (55 if domain == "foreign" else 45)
+    last_aggr = candidates[-1]["aggressiveness"] if candidates else DEFAULT_AGGRESSIVENESS[domain]
     aggressiveness = st.slider(
         f"Aggressivität ({domain_title})",
         0, 100,
@@ -387,61 +195,66 @@ def _render_domain_block(
     if not api_key:
         st.error("API Key fehlt (GM muss api_key an render_player_view übergeben).")
 
-    if st.button(gen_label, disabled=gen_disabled, use_container_width=True, key=f"gen_{domain}_{round_no}_{my_country}"):
-        with st.spinner("KI generiert Option..."):
-            metrics = load_country_metrics(conn, my_country)
-            if not metrics:
-                st.error("Konnte Länderwerte nicht laden.")
-                return
-
-            ext = get_external_events(conn, round_no)
-            dom_events = get_domestic_events(conn, round_no)
-            dom_map = {e["country"]: e for e in dom_events}
-            domestic_headline = (dom_map.get(my_country) or {}).get("headline") or "Keine auffälligen Ereignisse gemeldet."
-
-            recent = load_recent_history(conn, my_country, limit=12)
-            recent_summary = summarize_recent_actions(recent)
-
-            prompt = _build_policy_prompt(
+    # the next slot is generated by a background job (a speculative one may already run for slot 1)
+    next_slot = count + 1
+    running = active_candidate_job(conn, round_no=round_no, country=my_country, domain=domain, slot=next_slot) if next_slot <= 3 else None
+
+    clicked = st.button(gen_label, disabled=gen_disabled or bool(running), use_container_width=True, key=f"gen_{domain}_{round_no}_{my_country}")
+
+    # batch: all options in one KI call, aggressiveness spread around the slider value
+    batch = batch_profile()
+    batch_clicked = False
+    if count == 0 and batch["size"] > 1:
+        batch_clicked = st.button(
+            f"⚡ {batch['size']} Optionen auf einmal (Aggressivität ±{batch['spread']})",
+            disabled=gen_disabled or bool(running),
+            use_container_width=True,
+            key=f"gen_batch_{domain}_{round_no}_{my_country}",
+        )
+
+    # the job this block polls, kept across reruns so a failure is still shown after it ended
+    watch_key = f"job_{domain}_{round_no}_{my_country}"
+    if clicked or batch_clicked or running:
+        if next_slot > 3:
+            st.warning("Du hast bereits 3 Optionen generiert.")
+            return
+        if running:
+            job_id = running["id"]
+        elif batch_clicked:
+            job_id = enqueue_policy_batch(
+                conn,
+                api_key=api_key,
+                round_no=round_no,
+                country=my_country,
                 domain=domain,
                 aggressiveness=int(aggressiveness),
-                country_display=countries_display.get(my_country, my_country),
-                metrics=metrics,
-                eu_state=eu,
-                external_events=ext,
-                domestic_headline=domestic_headline,
-                recent_actions_summary=recent_summary,
-            )
-
-            slot = count_policy_candidates(conn, round_no=round_no, country=my_country, domain=domain) + 1
-            if slot > 3:
-                st.warning("Du hast bereits 3 Optionen generiert.")
-                return
-
-            obj, _raw = _generate_policy_candidate(
-                api_key=api_key,
-                model="mistral-small",
-                prompt=prompt,
-                temperature=0.85,
-                top_p=0.95,
-                max_tokens=900,
             )
-
-            action_text = str(obj.get("aktion", "")).strip()
-            folgen = obj.get("folgen", {}) or {}
-
-            upsert_policy_candidate(
+        else:
+            job_id = enqueue_policy_candidate(
                 conn,
+                api_key=api_key,
                 round_no=round_no,
                 country=my_country,
                 domain=domain,
-                slot=int(slot),
+                slot=next_slot,
                 aggressiveness=int(aggressiveness),
-                action_text=action_text,
-                impact=folgen,
             )
-
-        st.rerun()
+        st.session_state[watch_key] = job_id
+    if watch_key in st.session_state:
+        job, progress = job_snapshot(conn, st.session_state[watch_key])
+        if job_is_active(job):
+            label = f"Optionen 1–{batch['size']}" if job["kind"] == "policy_batch" else f"Option {next_slot}"
+            st.caption(f"⏳ KI generiert {label}...")
+            action_so_far = progress.get("aktion")
+            if action_so_far:
+                st.info(action_so_far + " ▌")
+            schedule_rerun(poll_interval_s())
+        else:
+            del st.session_state[watch_key]
+            if job and job["status"] == "failed":
+                st.error(f"Generierung fehlgeschlagen: {job['error']}")
+                return
+            st.rerun()
 
     # show status
     if already_locked_slot:
@@ -525,6 +338,7 @@ def render_player_view(
     New player flow:
     - Only active in phase == actions_published
     - Players can generate up to 3 candidates per domain (foreign/domestic), each with its own aggressiveness slider value.
+      Or all 3 at once in one KI call (batch, aggressiveness spread around the slider value).
     - Then they choose 1 of the up to 3 and lock the slot.
     """
     if phase == "game_over":
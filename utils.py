@@ -1,7 +1,10 @@
 # utils.py
 import json
 import re
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
+
+# balanced candidates tried by parse_json_maybe before giving up
+JSON_SCAN_MAX_CANDIDATES = 8
 
 
 def content_to_text(content) -> str:
@@ -22,6 +25,51 @@ def content_to_text(content) -> str:
     return str(content)
 
 
+_JSON_STRUCT_RE = re.compile(r'["\\{}\[\]]')
+_JSON_OPEN_RE = re.compile(r"[{\[]")
+
+
+def scan_json_value(s: str, start: int = 0) -> Optional[Tuple[int, int]]:
+    """
+    (begin, end) of the first complete top-level {...} / [...] at or after `start`,
+    or None if there is none (e.g. truncated). One linear pass that only stops at
+    structural chars; braces inside strings and escaped quotes are ignored. A mismatched
+    closer ends the candidate and the scan continues after it.
+    """
+    find = _JSON_STRUCT_RE.search
+    m = _JSON_OPEN_RE.search(s, start)
+    while m is not None:
+        begin = m.start()
+        stack = ["}" if s[begin] == "{" else "]"]
+        in_string = False
+        i = begin + 1
+        while True:
+            m = find(s, i)
+            if m is None:
+                return None
+            i = m.start()
+            c = s[i]
+            if in_string:
+                if c == "\\":
+                    i += 2
+                    continue
+                if c == '"':
+                    in_string = False
+            elif c == '"':
+                in_string = True
+            elif c in "{[":
+                stack.append("}" if c == "{" else "]")
+            elif c in "}]":
+                if c != stack[-1]:
+                    break  # not JSON (e.g. "{x]" in prose) -> next opener after this point
+                stack.pop()
+                if not stack:
+                    return begin, i + 1
+            i += 1
+        m = _JSON_OPEN_RE.search(s, i + 1)
+    return None
+
+
 def parse_json_maybe(text: str) -> Any:
     """Parst JSON auch dann, wenn ```json ... ``` oder Text drumherum vorkommt."""
     s = (text or "").strip()
@@ -38,12 +86,275 @@ def parse_json_maybe(text: str) -> Any:
     except json.JSONDecodeError:
         pass
 
-    # Erstes JSON-Objekt/Array extrahieren
-    m = re.search(r"(\{.*\}|\[.*\])", s, flags=re.DOTALL)
-    if not m:
-        raise ValueError(f"Kein JSON gefunden. Anfang der Antwort: {s[:200]!r}")
-    return json.loads(m.group(1))
+    # Erstes vollständiges JSON-Objekt/Array extrahieren (linear, string-/escape-aware)
+    # Retries start at the next opener: "{Platzhalter}" or an unclosed "{" in prose before the real JSON
+    pos = 0
+    for _ in range(JSON_SCAN_MAX_CANDIDATES):
+        span = scan_json_value(s, pos)
+        if span is not None:
+            try:
+                return json.loads(s[span[0]:span[1]])
+            except json.JSONDecodeError:
+                pass
+        nxt = min((k for k in (s.find("{", pos), s.find("[", pos)) if k >= 0), default=-1)
+        if nxt < 0:
+            break
+        pos = nxt + 1
+    raise ValueError(f"Kein JSON gefunden. Anfang der Antwort: {s[:200]!r}")
+
+
+# -----------------------
+# Local JSON repair (no LLM round-trip)
+# -----------------------
+_DQ_OPEN = '"\u201c\u201d\u201e\u201f'       # " “ ” „ ‟
+_DQ_SMART_CLOSE = '\u201c\u201d\u201f"'       # „...“ / “...” / "..."
+_SQ_OPEN = "'\u2018\u2019\u201a"             # ' ‘ ’ ‚
+_SQ_CLOSE = "'\u2018\u2019"
+_VALUE_END = ",:}]"
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?$")
+_WORD_RE = re.compile(r"[A-Za-z0-9_.+\-\u00c0-\u024f]+")
+_WORD_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+
+
+def _closes_here(s: str, i: int) -> bool:
+    """A quote only closes a string if the next significant char can follow a JSON string."""
+    j = i + 1
+    while j < len(s) and s[j] in " \t\r\n":
+        j += 1
+    return j >= len(s) or s[j] in _VALUE_END
+
+
+def _read_string(s: str, i: int, closers: str):
+    """Reads a string body starting after the opening quote. Returns (next_index, text, closed)."""
+    buf = []
+    n = len(s)
+    while i < n:
+        c = s[i]
+        if c == "\\" and i + 1 < n:
+            nxt = s[i + 1]
+            if nxt == "u" and re.match(r"[0-9a-fA-F]{4}", s[i + 2:i + 6]):
+                buf.append(chr(int(s[i + 2:i + 6], 16)))
+                i += 6
+                continue
+            buf.append({"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}.get(nxt, nxt))
+            i += 2
+            continue
+        if c in closers and _closes_here(s, i):
+            return i + 1, "".join(buf), True
+        buf.append(c)
+        i += 1
+    return n, "".join(buf), False
+
+
+def repair_json_locally(text: str) -> Any:
+    """
+    Deterministic repair of typical model JSON defects, one pass over the text:
+    code fences / text around the JSON, trailing commas, single or typographic quotes as
+    string delimiters, unescaped quotes and newlines inside strings, Python literals
+    (True/False/None), unquoted keys, and truncated output (open strings and containers
+    are closed, a dangling key is dropped). Raises ValueError if the result still
+    isn't valid JSON.
+    """
+    s = (text or "").strip()
+    s = re.sub(r"^```(?:json)?\s*", "", s, flags=re.IGNORECASE)
+    s = re.sub(r"\s*```$", "", s)
+    starts = [k for k in (s.find("{"), s.find("[")) if k >= 0]
+    if not starts:
+        raise ValueError("Lokale Reparatur: kein JSON-Anfang gefunden.")
+
+    tokens: List[str] = []
+    stack: List[str] = []
+    i = min(starts)
+    n = len(s)
+
+    def _drop_trailing_comma() -> None:
+        while tokens and tokens[-1] == ",":
+            tokens.pop()
+
+    while i < n:
+        ch = s[i]
+        if ch in _DQ_OPEN or ch in _SQ_OPEN:
+            closers = _DQ_SMART_CLOSE if ch in _DQ_OPEN else _SQ_CLOSE
+            i, body, closed = _read_string(s, i + 1, closers)
+            tokens.append(json.dumps(body, ensure_ascii=False))
+            if not closed:
+                break
+            continue
+        if ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            tokens.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma()
+            if stack:
+                tokens.append(stack.pop())
+            if not stack:
+                break  # first complete top-level value; ignore the rest
+        elif ch in ",:":
+            tokens.append(ch)
+        elif not ch.isspace():
+            m = _WORD_RE.match(s, i)
+            if not m:
+                i += 1  # stray char (backtick, ellipsis, ...)
+                continue
+            word = m.group(0)
+            in_key_position = bool(stack) and stack[-1] == "}" and (tokens[-1] in ("{", ","))
+            if in_key_position:
+                tokens.append(json.dumps(word))
+            elif word in _WORD_LITERALS:
+                tokens.append(_WORD_LITERALS[word])
+            elif _NUMBER_RE.match(word.lstrip("+")):
+                tokens.append(word.lstrip("+"))
+            else:
+                tokens.append(json.dumps(word, ensure_ascii=False))
+            i = m.end()
+            continue
+        i += 1
+
+    # truncated output: drop dangling separators / keys, then close what is still open
+    while stack:
+        if tokens and tokens[-1] == ",":
+            tokens.pop()
+        elif tokens and tokens[-1] == ":":
+            tokens.pop()
+            if tokens and tokens[-1].startswith('"'):
+                tokens.pop()  # the key
+        elif stack[-1] == "}" and len(tokens) >= 2 and tokens[-1].startswith('"') and tokens[-2] in ("{", ","):
+            tokens.pop()  # key without value
+        else:
+            tokens.append(stack.pop())
+
+    try:
+        return json.loads("".join(tokens))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Lokale Reparatur fehlgeschlagen: {e}") from e
 
 
 def clamp_int(x: int, lo: int = 0, hi: int = 100) -> int:
     return max(lo, min(hi, int(x)))
+
+
+class JSONStreamProbe:
+    """
+    Single-pass check of a streamed JSON object while it arrives.
+
+    expected: top-level key -> first char of its value ('{', '[', '"'; '' = any type).
+    feed() raises ValueError as soon as the stream can no longer match: no object start
+    after max_preamble chars, an unknown top-level key, or a value of the wrong type.
+    partial_string(key) returns the decoded (possibly unfinished) string value of a
+    top-level key, e.g. for progressive rendering of "aktion".
+    """
+
+    def __init__(self, expected: Dict[str, str], max_preamble: int = 200):
+        self.expected = dict(expected)
+        self.max_preamble = int(max_preamble)
+        self.text = ""
+        self.done = False
+        self.keys: List[str] = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"          # at depth 1: "key" | "colon" | "value" | "comma"
+        self._key_start = -1
+        self._current_key = ""
+        self._value_starts: Dict[str, int] = {}
+
+    def feed(self, chunk: str) -> None:
+        start = len(self.text)
+        self.text += chunk
+        for i in range(start, len(self.text)):
+            if self.done:
+                return
+            self._step(i, self.text[i])
+
+    def _step(self, i: int, ch: str) -> None:
+        if not self._started:
+            if ch == "{":
+                self._started = True
+                self._depth = 1
+                self._expect = "key"
+            elif ch == "[":
+                raise ValueError("Stream: JSON-Objekt erwartet, Array erhalten.")
+            elif i >= self.max_preamble:
+                raise ValueError(f"Stream: kein JSON-Objekt nach {self.max_preamble} Zeichen.")
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 1 and self._expect == "key_string":
+                    self._current_key = json.loads(self.text[self._key_start:i + 1])
+                    if self._current_key not in self.expected:
+                        raise ValueError(f"Stream: unerwarteter Key {self._current_key!r}.")
+                    self.keys.append(self._current_key)
+                    self._expect = "colon"
+            return
+
+        if ch in " \t\r\n":
+            return
+
+        if self._depth == 1:
+            if self._expect == "key":
+                if ch == "}":
+                    self._close()
+                    return
+                if ch != '"':
+                    raise ValueError(f"Stream: Key erwartet, {ch!r} erhalten.")
+                self._in_string = True
+                self._key_start = i
+                self._expect = "key_string"
+                return
+            if self._expect == "colon":
+                if ch != ":":
+                    raise ValueError(f"Stream: ':' erwartet, {ch!r} erhalten.")
+                self._expect = "value"
+                return
+            if self._expect == "value":
+                want = self.expected.get(self._current_key, "")
+                if want and ch != want:
+                    raise ValueError(f"Stream: {self._current_key!r} hat falschen Typ ({ch!r} statt {want!r}).")
+                self._value_starts[self._current_key] = i
+                self._expect = "comma"
+                # fall through: the value char itself opens a string/container
+            elif ch == ",":
+                self._expect = "key"
+                return
+            elif ch == "}":
+                self._close()
+                return
+
+        if ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+
+    def _close(self) -> None:
+        self._depth = 0
+        self.done = True
+
+    def partial_string(self, key: str) -> str:
+        start = self._value_starts.get(key)
+        if start is None or self.text[start] != '"':
+            return ""
+        frag = []
+        escape = False
+        for ch in self.text[start + 1:]:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                break
+            frag.append(ch)
+        raw = "".join(frag[:-1] if escape else frag)
+        try:
+            return json.loads('"' + raw + '"')
+        except json.JSONDecodeError:
+            # unfinished \uXXXX escape at the end
+            return json.loads('"' + raw[: raw.rfind("\\")] + '"') if "\\" in raw else raw